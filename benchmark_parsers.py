@@ -0,0 +1,114 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+from parsel.utils import extract_regex
+from scrapy.http import HtmlResponse
+
+from pararius_all.extractors import definition_terms, properties_table, table_text, term_values
+from pararius_all.spiders.pararius import FEATURE_FIELDS
+from pararius_all.spiders.rotsvast import PROPERTY_FIELDS
+
+'''
+Benchmark of the detail page parsers over saved HTML pages.
+Save fixture pages with e.g.
+    scrapy fetch --nolog https://www.pararius.com/apartment-for-rent/... > fixtures/pararius/1.html
+and run: python benchmark_parsers.py --fixtures fixtures
+The old and new extractions of a spider must give the same values on every
+page, the run fails before timing anything otherwise.
+'''
+
+def load_fixtures(directory):
+    responses = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(path, 'rb') as f:
+            response = HtmlResponse(url=f'file://{os.path.abspath(path)}', body=f.read(), encoding='utf-8')
+        # Parse the HTML once up front, only the extraction is timed
+        response.selector
+        responses.append(response)
+    return responses
+
+# Both variants return {field: values}; building the ItemLoader costs the same for both and is left out
+def pararius_selectors(response):
+    """The previous extraction: one dt:contains() selector over the whole page per field."""
+    values = {}
+    for field, label, part, regex in FEATURE_FIELDS:
+        selected = response.css(f'dt:contains("{label}") + dd {part}')
+        values[field] = selected.re(regex) if regex else selected.getall()
+    return values
+
+def pararius_single_pass(response):
+    """The extraction of ParariusSpider.parse_listing: one walk over the dt/dd pairs."""
+    values = {}
+    terms = definition_terms(response)
+    for field, label, part, regex in FEATURE_FIELDS:
+        found = term_values(terms, label, part)
+        values[field] = [v for value in found for v in extract_regex(regex, value)] if regex else found
+    return values
+
+def rotsvast_xpaths(response):
+    """The previous extraction: one //div[@id="properties"] query over the whole page per field."""
+    values = {}
+    for field, label, part, convert in PROPERTY_FIELDS:
+        xpath = f'//div[@id="properties"]//div[contains(text(), "{label}")]/following-sibling::div[last()]'
+        if part:
+            xpath += f'/{part}'
+        texts = response.xpath(f'({xpath})[1]//text()').getall()
+        values[field] = convert(' '.join(texts) if texts else None)
+    return values
+
+def rotsvast_single_pass(response):
+    """The extraction of RotsvastSpider.parse_listing: the #properties block parsed once."""
+    values = {}
+    table = properties_table(response.xpath('//div[@id="properties"]'))
+    for field, label, part, convert in PROPERTY_FIELDS:
+        values[field] = convert(table_text(table, label, part))
+    return values
+
+def time_parser(parser, responses, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for response in responses:
+            parser(response)
+    return (time.perf_counter() - start) / (repeat * len(responses)) * 1000
+
+def differences(reference, candidate, responses):
+    """(page, field, reference values, candidate values) where both parsers disagree."""
+    found = []
+    for response in responses:
+        expected, actual = reference(response), candidate(response)
+        for field in expected.keys() | actual.keys():
+            if expected.get(field) != actual.get(field):
+                found.append((response.url, field, expected.get(field), actual.get(field)))
+    return found
+
+def benchmark(name, parsers, responses, repeat, check=False):
+    if not responses:
+        print(f'{name}: no fixture pages found')
+        return
+    if check:
+        found = differences(parsers[0][1], parsers[1][1], responses)
+        for url, field, expected, actual in found:
+            print(f'{name}: {field} differs on {url}: {expected!r} != {actual!r}')
+        if found:
+            sys.exit(1)
+    print(f'{name}: {len(responses)} pages, {repeat} runs')
+    for label, parser in parsers:
+        print(f'    {label:<12} {time_parser(parser, responses, repeat):8.2f} ms/page')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the detail page parsers over saved HTML pages.")
+    parser.add_argument('--fixtures', default='fixtures', help='Directory with one sub-directory of .html pages per spider')
+    parser.add_argument('--repeat', type=int, default=20, help='Number of runs over the pages')
+    args = parser.parse_args()
+
+    benchmark('pararius', [
+        ('selectors', pararius_selectors),
+        ('single pass', pararius_single_pass),
+    ], load_fixtures(os.path.join(args.fixtures, 'pararius')), args.repeat, check=True)
+    benchmark('rotsvast', [
+        ('xpaths', rotsvast_xpaths),
+        ('single pass', rotsvast_single_pass),
+    ], load_fixtures(os.path.join(args.fixtures, 'rotsvast')), args.repeat, check=True)
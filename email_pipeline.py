@@ -24,8 +24,8 @@ def install_reactor():
 # Install the reactor BEFORE any other imports
 install_reactor()
 
-from twisted.internet import reactor
-from twisted.internet.defer import DeferredList
+from twisted.internet import reactor, threads
+from twisted.internet.defer import DeferredList, succeed
 
 from scrapy.crawler import CrawlerRunner
 from scrapy.utils.log import configure_logging
@@ -37,6 +37,10 @@ import pandas as pd
 import logging
 from pd_helpers import clean_data_par, clean_data_ex, clean_data_friend, clean_data_hunting, clean_data_rot, clean_data_light, filter_listings, filter_listings_par
 from email_sender import send_listing_email, SMTP_CONFIG
+from pararius_all.jsonl_store import JsonLinesStore
+from pararius_all.parquet_store import dataset_parts, read_new_parts
+from pararius_all.pipelines import new_listings as realtime_listings
+from pararius_all.url_index import SeenUrlIndex, last_rowid, load_seen_urls
 
 pd.options.mode.chained_assignment = None  # Disable the warning
 
@@ -46,61 +50,106 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Columns read from the typed listing store (None: all of them) and cleaning function of each
+# source. The emails of the other sources only show the columns below; the Pararius rows also
+# fill your own email and motivation templates, so they are read whole.
+SOURCES = {
+    'pararius': (None, clean_data_par),
+    'hunting': (['url', 'title', 'price', 'surface', 'rooms'], clean_data_hunting),
+    'friendlyhousing': (['URL', 'Title', 'Price', 'Surface_area', 'Number_of_rooms'], clean_data_friend),
+    'rotsvast': (['URL', 'Title', 'Rent_Price', 'Floor_Area', 'Rooms'], clean_data_rot),
+    'extate': (None, clean_data_ex),
+    'lightcity': (None, clean_data_light),
+}
+
+# Sources kept as JSON Lines archives instead of CSV exports
+JSONL_SOURCES = ('extate', 'lightcity')
+
+def take_watermarks():
+    """Record the parts of the listing store and the extent of the seen-URL index before crawling."""
+    for source in SOURCES:
+        # Import the legacy history now so it is not mistaken for new listings later
+        if source in JSONL_SOURCES:
+            JsonLinesStore(source)
+        else:
+            load_seen_urls(source)
+    parts = {source: dataset_parts(source) for source in SOURCES}
+    return parts, last_rowid()
+
+def read_new_listings(source, watermarks):
+    """Read the listings a crawl wrote to the typed store since the watermarks and clean them."""
+    parts, rowid = watermarks
+    columns, cleaner = SOURCES[source]
+    # Only URLs the index saw for the first time are new; the rest are updated records
+    df = read_new_parts(source, parts[source], SeenUrlIndex(source).added_since(rowid), columns=columns)
+    if df.empty:
+        return df
+    return cleaner(df)
+
+# URLs already emailed by notify_new_listing during the crawl, per source
+notified_urls = {}
+
+def notify_new_listing(entry, debug=False):
+    """Email a match found by NewListingPipeline while its spider is still crawling."""
+    source, url, record = entry
+    notified = notified_urls.setdefault(source, set())
+    if url not in notified:
+        notified.add(url)
+        print(f'New matching listing in {source}: {url} Proceeding to send email...')
+        # Cleaning and sending run in a thread so the crawl is not blocked by pandas or SMTP
+        d = threads.deferToThread(send_new_listing, source, record, debug=debug)
+        d.addErrback(lambda failure: print(f'Sending email for {url} failed: {failure.getErrorMessage()}'))
+
+    # Wait for the next match
+    realtime_listings.get().addCallback(notify_new_listing, debug)
+
+def send_new_listing(source, record, debug=False):
+    """Clean a typed record like the listings read back from the store and email it."""
+    pararius = source == 'pararius'
+    listing_filter = filter_listings_par if pararius else filter_listings
+    listings = listing_filter(SOURCES[source][1](pd.DataFrame([record], dtype=object)))
+    for _, row in listings.iterrows():
+        send_listing_email(row=row, config=SMTP_CONFIG, debug=debug, pararius=pararius)
+
+def skip_notified(filtered_listings, source):
+    """Drop the listings already emailed during the crawl of the source."""
+    already_notified = filtered_listings['URL'].isin(notified_urls.get(source, ()))
+    if already_notified.any():
+        print(f'{already_notified.sum()} of them were already emailed during the crawl.')
+    return filtered_listings[~already_notified]
+
 def spider_closed(spider, reason):
     print(f'{spider.name} has finished crawling. Reason: {reason}')
 
-def process_listings(df_new, df_old, df_name, debug=False):
-    if 'URL' in df_new.columns and 'URL' in df_old.columns:
-        # Find new listings by comparing URLs
-        new_listings = df_new[~df_new['URL'].isin(df_old['URL'])]
+def send_emails(listings, debug=False, pararius=False):
+    """Email the listings from a thread, so the crawls still running are not blocked
+    by SMTP. Returns a Deferred firing once all of them are sent."""
+    def send_all():
+        for _, row in listings.iterrows():
+            send_listing_email(row=row, config=SMTP_CONFIG, debug=debug, pararius=pararius)
+    d = threads.deferToThread(send_all)
+    d.addErrback(lambda failure: print(f'Sending emails failed: {failure.getErrorMessage()}'))
+    return d
+
+def process_listings(new_listings, df_name, debug=False):
+    """Filter the new listings of a source and email the matches.
+    Returns the Deferred of the sending, if there is anything to send."""
+    if new_listings.empty:
+        print(f'No new listings found in {df_name}.')
+    else:
+        print(f'Found {len(new_listings)} new listings in {df_name}!!! Proceeding to filter and send emails...')
         
-        if new_listings.empty:
-            print(f'No new listings found in {df_name}.')
+        # Apply filtering to new listings
+        filtered_listings = filter_listings(new_listings)
+        
+        if filtered_listings.empty:
+            print(f'No new listings in {df_name} meet the filtering criteria.')
         else:
-            print(f'Found {len(new_listings)} new listings in {df_name}!!! Proceeding to filter and send emails...')
-            
-            # Apply filtering to new listings
-            filtered_listings = filter_listings(new_listings)
+            print(f'Found {len(filtered_listings)} filtered listings in {df_name}. Proceeding to send emails...')
             
-            if filtered_listings.empty:
-                print(f'No new listings in {df_name} meet the filtering criteria.')
-            else:
-                print(f'Found {len(filtered_listings)} filtered listings in {df_name}. Proceeding to send emails...')
-                
-                for _, row in filtered_listings.iterrows():
-                    send_listing_email(row=row, config=SMTP_CONFIG, debug=debug)
-    else:
-        print(f'URL column missing in {df_name} DataFrames. Skipping...')
-
-def main():
-    # Set up argument parsing
-    parser = argparse.ArgumentParser(description="Run the email pipeline.")
-    parser.add_argument('--debug', action='store_true', help='Enable debug mode')
-    
-    # Parse the arguments
-    args = parser.parse_args()
-
-    print('readind and cleaning old data \n')
-    par_df_old = pd.read_csv('pararius_listings.csv')
-    par_df_old = clean_data_par(par_df_old)
-
-    hunt_df_old = pd.read_csv('hunting_listings.csv')
-    hunt_df_old = clean_data_hunting(hunt_df_old)
-
-    friend_df_old = pd.read_csv('friendlyhousing_listings.csv')
-    friend_df_old = clean_data_friend(friend_df_old)
-
-    rot_df_old = pd.read_csv('rotsvast_listings.csv')
-    rot_df_old = clean_data_rot(rot_df_old)
-
-    ex_df_old = pd.read_json('extate_listings.json')
-    ex_df_old = clean_data_ex(ex_df_old)
-
-    light_df_old = pd.read_json('lightcity_listings.json')
-    light_df_old = clean_data_light(light_df_old)
-
-    print('starting to scrape \n')
+            return send_emails(skip_notified(filtered_listings, df_name), debug=debug)
 
+def configure_loggers():
     # Disable Scrapy's logging
     logging.getLogger('scrapy').setLevel(logging.ERROR)
     logging.getLogger('selenium').setLevel(logging.WARNING)
@@ -129,90 +178,161 @@ def main():
     par_login_logger = logging.getLogger('par_login')
     par_login_logger.setLevel(logging.INFO)  # Set the desired logging level
     par_login_logger.propagate = True  # Ensure messages propagate to the root logger
-    
+
+def create_runner(debug_mode=False):
+    configure_loggers()
+
     # Get the project settings
     settings = get_project_settings()
 
+    # Email the matching listings as soon as NewListingPipeline finds them
+    settings.set('NEW_LISTING_NOTIFICATIONS', True)
+    realtime_listings.get().addCallback(notify_new_listing, debug_mode)
+
     # Create a CrawlerRunner
     runner = CrawlerRunner(settings)
 
     # Connect the spider_closed function to the spider_closed signal
     dispatcher.connect(spider_closed, signal=signals.spider_closed)
-
-    # Start the initial spiders
-    deferred_list = [
-        runner.crawl('pararius'),
-        runner.crawl('friendlyhousing'),
-        runner.crawl('rotsvast'),
-        runner.crawl('hunting'),
-        runner.crawl('extate'),
-        runner.crawl('lightcity')
-    ]
-
-    # Wait for all initial spiders to finish
+    return runner
+
+def process_pararius(runner, new_listings, debug=False):
+    """Notify the new Pararius listings and start 'par_login' for the matching ones.
+    Returns a Deferred firing once the emails are sent and the 'par_login' crawl is
+    done, if there were matches."""
+    if new_listings.empty:
+        print('No new listings found in Pararius.')
+        return None
+    print(f'Found {len(new_listings)} new listings in Pararius!!! Proceeding to send emails...')
+    filtered_listings = filter_listings_par(new_listings)
+
+    if filtered_listings.empty:
+        print(f'No new listings in Pararius meet the filtering criteria.')
+        return None
+    print(f'Found {len(filtered_listings)} filtered listings with matching criteria. Proceeding to send emails...')
+    sending = send_emails(skip_notified(filtered_listings, 'pararius'), debug=debug, pararius=True)
+
+    # Start the 'par_login' spider for all the filtered listings, emailed during the crawl or not,
+    # while the emails are being sent
+    crawl = runner.crawl('par_login', rows=filtered_listings.to_dict('records'))
+    return DeferredList([sending, crawl], fireOnOneErrback=True, consumeErrors=True)
+
+def run_cycle(runner, debug_mode=False, sources=None):
+    """Crawl the given sources (default: all) once and notify their new listings.
+
+    Every source is diffed, filtered and notified as soon as its own crawl is
+    done, so fast spiders do not wait for the slow ones. Returns a Deferred
+    firing with the number of new listings per source."""
+    sources = list(sources or SOURCES)
+
+    print('Recording watermarks of the listing files \n')
+    watermarks = take_watermarks()
+
+    # Check if debug mode is enabled
+    if debug_mode:
+        print("Debug mode is ON \n")
+    else:
+        print("Debug mode is OFF \n")
+
+    print(f'starting to scrape {", ".join(sources)} \n')
+
+    # Callback run when the crawl of one source is done
+    def process_source(_, source):
+        # The crawl Deferred fires after the listing store is closed, so its part is complete
+        print(f'Reading and cleaning new data of {source} \n')
+        try:
+            new_listings = read_new_listings(source, watermarks)
+            count = len(new_listings)
+            if source != 'pararius':
+                # The emails are sent from a thread, the other crawls go on meanwhile
+                d = process_listings(new_listings, source, debug=debug_mode)
+            else:
+                # par_login starts right away, without waiting for the other spiders
+                d = process_pararius(runner, new_listings, debug=debug_mode)
+        finally:
+            # The crawl is over: forget what it notified, whether it was read back or not
+            notified_urls.pop(source, None)
+        return d.addCallback(lambda _: count) if d else count
+
+    def source_failed(failure, source):
+        print(f'Processing {source} failed: {failure.getErrorMessage()}')
+        return 0
+
+    # Start the spiders
+    deferred_list = []
+    for source in sources:
+        d = runner.crawl(source)
+        d.addCallback(process_source, source)
+        d.addErrback(source_failed, source)
+        deferred_list.append(d)
+
+    # Fire once every source has been processed
     deferred_all = DeferredList(deferred_list)
-    
 
-    # Callback to process results and conditionally start the 'par_login' spider
-    def process_results_and_start_par_login(_):
+    def collect_counts(results):
         print('Scraping complete \n')
-        print('Reading and cleaning new data \n')
+        return {source: count for source, (_, count) in zip(sources, results)}
 
-        par_df_new = pd.read_csv('pararius_listings.csv')
-        par_df_new = clean_data_par(par_df_new)
+    deferred_all.addCallback(collect_counts)
+    return deferred_all
 
-        hunt_df_new = pd.read_csv('hunting_listings.csv')
-        hunt_df_new = clean_data_hunting(hunt_df_new)
+def run_daemon(debug_mode, next_delay, before_cycle=None):
+    """Run cycles forever inside one process.
 
-        friend_df_new = pd.read_csv('friendlyhousing_listings.csv')
-        friend_df_new = clean_data_friend(friend_df_new)
+    The reactor, project settings, spider modules and the seen-URL index
+    connections stay warm between cycles. `next_delay()` gives the seconds to
+    wait before the next cycle and `before_cycle` (e.g. VPN rotation) is a
+    blocking callable run in a worker thread before every cycle."""
+    runner = create_runner(debug_mode)
 
-        rot_df_new = pd.read_csv('rotsvast_listings.csv')
-        rot_df_new = clean_data_rot(rot_df_new)
+    def cycle():
+        d = threads.deferToThread(before_cycle) if before_cycle else succeed(None)
+        d.addCallback(lambda _: run_cycle(runner, debug_mode))
+        d.addErrback(lambda failure: print(f'Pipeline cycle failed: {failure.getErrorMessage()}'))
+        d.addBoth(lambda _: schedule_next())
 
-        ex_df_new = pd.read_json('extate_listings.json')
-        ex_df_new = clean_data_ex(ex_df_new)
+    def schedule_next():
+        delay = next_delay()
+        print(f'Next pipeline cycle in {delay} seconds \n')
+        reactor.callLater(delay, cycle)
 
-        light_df_new = pd.read_json('lightcity_listings.json')
-        light_df_new = clean_data_light(light_df_new)
+    reactor.callWhenRunning(cycle)
+    reactor.run()
 
-        # Check if debug mode is enabled
-        if args.debug:
-            print("Debug mode is ON \n")
-            debug_mode = True
-        else:
-            print("Debug mode is OFF \n")
-            debug_mode = False
-
-        # Process Pararius listings
-        if 'URL' in par_df_new.columns and 'URL' in par_df_old.columns:
-            new_listings = par_df_new[~par_df_new['URL'].isin(par_df_old['URL'])]
-            if new_listings.empty:
-                print('No new listings found in Pararius.')
-            else:
-                print(f'Found {len(new_listings)} new listings in Pararius!!! Proceeding to send emails...')
-                filtered_listings = filter_listings_par(new_listings)
-
-                if filtered_listings.empty:
-                    print(f'No new listings in Pararius meet the filtering criteria.')
-                else:
-                    print(f'Found {len(filtered_listings)} filtered listings with matching criteria. Proceeding to send emails...')
-                    for _, row in filtered_listings.iterrows():
-                        send_listing_email(row=row, config=SMTP_CONFIG, debug=debug_mode, pararius=True)
-
-                    # Start the 'par_login' spider if there are filtered listings
-                    if not filtered_listings.empty:
-                        return runner.crawl('par_login', rows=filtered_listings.to_dict('records'))
-
-        # Process listings for other DataFrames
-        process_listings(hunt_df_new, hunt_df_old, 'hunt_df', debug=debug_mode)
-        process_listings(friend_df_new, friend_df_old, 'friend_df', debug=debug_mode)
-        process_listings(rot_df_new, rot_df_old, 'rot_df', debug=debug_mode)
-        process_listings(ex_df_new, ex_df_old, 'ex_df', debug=debug_mode)
-        process_listings(light_df_new, light_df_old, 'light_df', debug=debug_mode)
-
-    # Attach the callback to process results and start 'par_login' if needed
-    deferred_all.addCallback(process_results_and_start_par_login)
+def run_adaptive_daemon(debug_mode, scheduler, before_cycle=None, tick=60):
+    """Like run_daemon, but every `tick` seconds only the sources the
+    AdaptiveScheduler considers due are crawled, and their new-listing counts
+    are fed back into its arrival statistics."""
+    runner = create_runner(debug_mode)
+
+    def poll():
+        due = scheduler.due_sources()
+        if not due:
+            reactor.callLater(tick, poll)
+            return
+        d = threads.deferToThread(before_cycle) if before_cycle else succeed(None)
+        d.addCallback(lambda _: run_cycle(runner, debug_mode, sources=due))
+        d.addCallback(scheduler.record)
+
+        def failed(failure):
+            print(f'Pipeline cycle failed: {failure.getErrorMessage()}')
+            scheduler.record({source: 0 for source in due})
+        d.addErrback(failed)
+        d.addBoth(lambda _: reactor.callLater(tick, poll))
+
+    reactor.callWhenRunning(poll)
+    reactor.run()
+
+def main():
+    # Set up argument parsing
+    parser = argparse.ArgumentParser(description="Run the email pipeline.")
+    parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    
+    # Parse the arguments
+    args = parser.parse_args()
+
+    runner = create_runner(args.debug)
+    deferred_all = run_cycle(runner, debug_mode=args.debug)
 
     # Stop the reactor when everything is done
     deferred_all.addBoth(lambda _: reactor.stop())
@@ -1,10 +1,133 @@
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
+import atexit
 import smtplib
 import os
+import threading
+import time
 import pandas as pd
 
+# Loaded files (encoded attachment parts, body template) by path, kept for the
+# lifetime of the process and reloaded when the file's mtime or size changes
+_file_cache = {}
+_file_cache_lock = threading.Lock()
+
+def cached_file(file_path, load):
+    """Return load(file_path), computed again only when the file changed on disk."""
+    stat = os.stat(file_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _file_cache_lock:
+        cached = _file_cache.get((file_path, load))
+        if cached is None or cached[0] != version:
+            cached = _file_cache[(file_path, load)] = (version, load(file_path))
+    return cached[1]
+
+def load_attachment_part(file_path):
+    """Read and base64-encode a file into an attachment part."""
+    with open(file_path, 'rb') as f:
+        part = MIMEApplication(f.read(), Name=os.path.basename(file_path))
+    part['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
+    return part
+
+def load_text(file_path):
+    with open(file_path, 'r') as f:
+        return f.read()
+
+class DataTrackingSMTP(smtplib.SMTP):
+    """smtplib.SMTP remembering whether the last sendmail() got to the DATA command,
+    from which on the server may have accepted the message."""
+
+    data_started = False
+
+    def sendmail(self, *args, **kwargs):
+        self.data_started = False
+        return super().sendmail(*args, **kwargs)
+
+    def data(self, msg):
+        self.data_started = True
+        return super().data(msg)
+
+class SMTPSession:
+    """Authenticated SMTP connection kept open and reused for many messages.
+
+    After `check_after` idle seconds the connection is checked with NOOP
+    before sending, and opened again if the server dropped it. A message is
+    only sent again if the connection dropped before it was handed over.
+    Thread-safe."""
+
+    def __init__(self, config, check_after=30, timeout=30):
+        self.config = config
+        self.check_after = check_after
+        self.timeout = timeout
+        self.server = None
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+
+    def connect(self):
+        server = DataTrackingSMTP(self.config['server'], self.config['port'], timeout=self.timeout)
+        server.starttls()
+        server.login(self.config['sender_email'], self.config['password'])
+        self.server = server
+
+    def is_alive(self):
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        with self.lock:
+            idle = time.monotonic() - self.last_used
+            if self.server is None or (idle > self.check_after and not self.is_alive()):
+                self.close()
+                self.connect()
+            try:
+                self.server.sendmail(from_addr=from_addr, to_addrs=to_addrs, msg=msg)
+            except smtplib.SMTPServerDisconnected as e:
+                data_started = self.server.data_started
+                self.close()
+                if data_started:
+                    # The server may have accepted it before dropping: do not risk sending it twice
+                    raise smtplib.SMTPServerDisconnected(
+                        f'Connection lost while sending the message, not sent again as it may have been delivered: {e}')
+                # Dropped since the last check, before the message: send it once more on a new connection
+                self.connect()
+                self.server.sendmail(from_addr=from_addr, to_addrs=to_addrs, msg=msg)
+            self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.close()
+
+# One session per SMTP account, shared by every sender of the process
+_smtp_sessions = {}
+_smtp_sessions_lock = threading.Lock()
+
+def get_smtp_session(config):
+    key = (config['server'], config['port'], config['sender_email'])
+    with _smtp_sessions_lock:
+        if key not in _smtp_sessions:
+            _smtp_sessions[key] = SMTPSession(config)
+        return _smtp_sessions[key]
+
+@atexit.register
+def close_smtp_sessions():
+    for session in list(_smtp_sessions.values()):
+        with session.lock:
+            session.close()
+
 def get_attachments_from_directory(directory):
     """Get all files in a directory as attachments."""
     attachments = []
@@ -29,20 +152,16 @@ def create_message(subject, body, attachments=None, cc=None):
     if attachments:
         for file_path in attachments:
             try:
-                with open(file_path, 'rb') as f:
-                    part = MIMEApplication(f.read(), Name=os.path.basename(file_path))
-                    part['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
-                    msg.attach(part)
+                # The encoded part is shared by all the messages, it is never modified
+                msg.attach(cached_file(file_path, load_attachment_part))
             except Exception as e:
                 print(f"Failed to attach {file_path}: {str(e)}")
     return msg
 
-def send_listing_email(row, config, debug=False, pararius=False):
-    """Send email for a property listing using a configuration dictionary."""
-    smtp_server = config['server']
-    smtp_port = config['port']
+def send_listing_email(row, config, debug=False, pararius=False, session=None):
+    """Send email for a property listing using a configuration dictionary.
+    The message goes over `session`, by default the shared SMTPSession of the account."""
     sender_email = config['sender_email']
-    sender_password = config['password']
     default_receiver = config['default_receiver']
     body_template_file = config['body_template_file']
     attachment_directory = config['attachment_directory']
@@ -97,8 +216,7 @@ Check full details: {URL}"""
 
         else:
             subject = f"Interest in the rental offer: {row.get('Title', 'No Title')}"
-            with open(body_template_file, 'r') as f:
-                body_template = f.read()
+            body_template = cached_file(body_template_file, load_text)
 
 
     # Replace None values with empty strings in the row data
@@ -116,16 +234,13 @@ Check full details: {URL}"""
     msg = create_message(subject, body, attachments, cc)
     
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            
-            # Combine receiver and CC emails for sendmail
-            all_recipients = [receiver_email]
-            if cc:
-                all_recipients.extend(cc)
-            
-            server.sendmail(from_addr=sender_email, to_addrs=all_recipients, msg=msg.as_string())
+        # Combine receiver and CC emails for sendmail
+        all_recipients = [receiver_email]
+        if cc:
+            all_recipients.extend(cc)
+
+        session = session or get_smtp_session(config)
+        session.sendmail(from_addr=sender_email, to_addrs=all_recipients, msg=msg.as_string())
         print(f"Email sent to {receiver_email} with CC: {cc if cc else 'None'}")
         if attachments:
             print(f"Attachments: {', '.join(os.path.basename(f) for f in attachments)}")
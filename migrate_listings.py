@@ -0,0 +1,17 @@
+import os
+from pd_helpers import normalize_listing_csv
+
+'''
+One-shot migration of the listing CSVs written before the header-aware
+appending exporter: drops the repeated header rows and the "['...']"
+formatting so that the pd_helpers cleaning functions can skip those passes.
+'''
+
+csv_files = ['pararius_listings.csv', 'rotsvast_listings.csv', 'friendlyhousing_listings.csv', 'hunting_listings.csv']
+
+for csv_file in csv_files:
+    if os.path.exists(csv_file):
+        rows = normalize_listing_csv(csv_file)
+        print(f'{csv_file}: {rows} listings kept')
+    else:
+        print(f'{csv_file}: not found, skipping')
@@ -0,0 +1,171 @@
+import logging
+import time
+
+from scrapy.utils.defer import maybe_deferred_to_future
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+
+'''
+Condition-based waits for the Selenium spiders. Every wait returns as soon as
+its condition holds, gives up after a configurable upper bound, and records
+how long it actually took in the crawl stats (browser/wait/<name>/...).
+
+All WebDriver calls block, so they run in a dedicated thread pool: the reactor
+keeps downloading and parsing for the other spiders while Chrome works.
+
+The spiders only read the DOM, so the browser does not download the resource
+categories of BROWSER_BLOCKED_RESOURCES (images, fonts, trackers...), less the
+categories or patterns a spider allowlists in BROWSER_BLOCK_ALLOWLIST.
+'''
+
+BROWSER_WAIT_TIMEOUT = 10  # seconds, default upper bound of a wait
+BROWSER_THREADS = 2  # browser steps running at the same time, one driver each
+
+_thread_pool = None
+
+# URL patterns (Chrome DevTools wildcards) of the resource categories a page load can skip
+BLOCK_PROFILES = {
+    'image': ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*'],
+    'media': ['*.mp4*', '*.webm*', '*.mp3*', '*.ogg*', '*.m4a*', '*.mov*'],
+    'font': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*.eot*'],
+    'stylesheet': ['*.css*'],
+    'tracker': [
+        '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*googleadservices.com*',
+        '*connect.facebook.net*', '*hotjar.com*', '*clarity.ms*', '*bat.bing.com*', '*linkedin.com/px*',
+        '*visualwebsiteoptimizer.com*', '*tiktok.com/i18n/pixel*',
+    ],
+    'map': ['*tile.openstreetmap.org*', '*maps.googleapis.com*', '*maps.gstatic.com*', '*api.mapbox.com*'],
+}
+BROWSER_BLOCKED_RESOURCES = ['image', 'media', 'font', 'tracker', 'map']
+
+logger = logging.getLogger(__name__)
+
+
+def browser_thread_pool(size=BROWSER_THREADS):
+    """The browser thread pool, started on first use and stopped with the reactor."""
+    global _thread_pool
+    if _thread_pool is None:
+        from twisted.internet import reactor
+        _thread_pool = ThreadPool(minthreads=1, maxthreads=size, name='browser')
+        _thread_pool.start()
+        reactor.addSystemEventTrigger('during', 'shutdown', _thread_pool.stop)
+    elif size > _thread_pool.max:
+        _thread_pool.adjustPoolsize(maxthreads=size)
+    return _thread_pool
+
+
+def run_in_browser_thread(func, *args, **kwargs):
+    """Deferred firing with func(*args, **kwargs) run in the browser thread pool."""
+    from twisted.internet import reactor
+    return deferToThreadPool(reactor, browser_thread_pool(), func, *args, **kwargs)
+
+
+async def in_browser_thread(func, *args, **kwargs):
+    """Awaitable version of run_in_browser_thread, for async def callbacks."""
+    return await maybe_deferred_to_future(run_in_browser_thread(func, *args, **kwargs))
+
+
+def blocked_url_patterns(categories=BROWSER_BLOCKED_RESOURCES, allowlist=()):
+    """URL patterns to block: the patterns of the categories, less the allowlisted
+    categories and patterns. DevTools blocking has no exceptions, so a pattern can
+    only be allowlisted as written in BLOCK_PROFILES."""
+    allowlist = set(allowlist)
+    patterns = []
+    for category in categories:
+        if category not in BLOCK_PROFILES:
+            raise ValueError(f"Unknown resource category '{category}', expected one of {sorted(BLOCK_PROFILES)}")
+        if category not in allowlist:
+            patterns.extend(p for p in BLOCK_PROFILES[category] if p not in allowlist)
+    return patterns
+
+
+def block_urls(driver, patterns):
+    """Make the browser fail the requests matching the patterns (replacing any previous list)."""
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+
+
+def listing_count_changed(css, previous):
+    """Condition: the number of elements matching css differs from previous."""
+    def condition(driver):
+        count = len(driver.find_elements(By.CSS_SELECTOR, css))
+        return count if count != previous else False
+    return condition
+
+
+def document_ready(driver):
+    return driver.execute_script('return document.readyState') == 'complete'
+
+
+def in_viewport(element):
+    """Condition: the element has been scrolled inside the viewport."""
+    def condition(driver):
+        return driver.execute_script(
+            'const r = arguments[0].getBoundingClientRect();'
+            'return r.top >= 0 && r.bottom <= (window.innerHeight || document.documentElement.clientHeight);',
+            element)
+    return condition
+
+
+def network_idle(quiet=0.5):
+    """Condition: the page did not load any new resource for `quiet` seconds."""
+    state = {'count': None, 'since': time.monotonic()}
+
+    def condition(driver):
+        count = driver.execute_script("return performance.getEntriesByType('resource').length")
+        now = time.monotonic()
+        if count != state['count']:
+            state['count'], state['since'] = count, now
+            return False
+        return now - state['since'] >= quiet
+    return condition
+
+
+class BrowserWaits:
+    """Timed and instrumented WebDriverWait for one driver."""
+
+    def __init__(self, driver, stats=None, timeouts=None, default_timeout=BROWSER_WAIT_TIMEOUT, poll=0.2):
+        self.driver = driver
+        self.stats = stats
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.poll = poll
+
+    @classmethod
+    def from_spider(cls, spider, driver):
+        return cls(
+            driver,
+            stats=spider.crawler.stats,
+            timeouts=spider.settings.getdict('BROWSER_WAIT_TIMEOUTS'),
+            default_timeout=spider.settings.getfloat('BROWSER_WAIT_TIMEOUT', BROWSER_WAIT_TIMEOUT),
+        )
+
+    def until(self, name, condition, timeout=None):
+        """Wait for condition(driver) to be truthy and return its value.
+
+        The upper bound is BROWSER_WAIT_TIMEOUTS[name], else `timeout`, else
+        BROWSER_WAIT_TIMEOUT. Raises TimeoutException when it is reached."""
+        timeout = float(self.timeouts.get(name, timeout or self.default_timeout))
+        start = time.monotonic()
+        timed_out = False
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=self.poll).until(condition)
+        except TimeoutException:
+            timed_out = True
+            raise
+        finally:
+            self.record(name, time.monotonic() - start, timed_out)
+
+    def record(self, name, elapsed, timed_out):
+        logger.debug(f"Wait '{name}' took {elapsed:.2f}s{' (timed out)' if timed_out else ''}")
+        if self.stats is None:
+            return
+        prefix = f'browser/wait/{name}'
+        self.stats.inc_value(f'{prefix}/count')
+        self.stats.inc_value(f'{prefix}/seconds', round(elapsed, 3))
+        self.stats.max_value(f'{prefix}/max_seconds', round(elapsed, 3))
+        if timed_out:
+            self.stats.inc_value(f'{prefix}/timeouts')
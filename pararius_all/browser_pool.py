@@ -0,0 +1,257 @@
+import logging
+from collections import Counter, deque
+
+from scrapy.http import HtmlResponse
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.support.ui import WebDriverWait
+from twisted.internet.defer import Deferred, DeferredList
+
+from pararius_all.browser import run_in_browser_thread
+
+'''
+Pool of warm headless Chrome instances shared by the Selenium spiders of the
+process, across crawls and daemon cycles. Browsers are health-checked when
+leased, reset when given back, and recycled after BROWSER_POOL_MAX_USES
+requests or once their memory grew by BROWSER_POOL_MAX_MEMORY_GROWTH MB.
+All WebDriver calls run in the browser thread pool.
+'''
+
+BROWSER_POOL_SIZE = 2
+BROWSER_POOL_MAX_USES = 50  # requests served before a browser is replaced
+BROWSER_POOL_MAX_MEMORY_GROWTH = 512  # MB over the memory of the fresh browser
+BROWSER_POOL_IDLE_TIMEOUT = 1800  # seconds an unused browser is kept warm
+SELENIUM_DRIVER_ARGUMENTS = ["--headless=new"]
+
+logger = logging.getLogger(__name__)
+
+_shared_pool = None
+
+
+def process_tree_memory(pid):
+    """Resident memory (MB) of a process and its descendants, None without /proc."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])  # kB
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            if current == pid:
+                return None
+    return total / 1024
+
+
+def start_driver(arguments, executable_path=None):
+    """A new Chrome WebDriver, the driver binary being resolved by Selenium Manager if not given."""
+    options = ChromeOptions()
+    for argument in arguments:
+        options.add_argument(argument)
+    service = ChromeService(executable_path) if executable_path else ChromeService()
+    return webdriver.Chrome(options=options, service=service)
+
+
+def load_page(driver, request):
+    """Load a SeleniumRequest in the driver and return its HtmlResponse."""
+    driver.get(request.url)
+    for cookie_name, cookie_value in request.cookies.items():
+        driver.add_cookie({'name': cookie_name, 'value': cookie_value})
+    if request.wait_until:
+        WebDriverWait(driver, request.wait_time).until(request.wait_until)
+    if request.screenshot:
+        request.meta['screenshot'] = driver.get_screenshot_as_png()
+    if request.script:
+        driver.execute_script(request.script)
+
+    # Expose the driver to the callbacks via the "meta" attribute
+    request.meta['driver'] = driver
+    return HtmlResponse(driver.current_url, body=driver.page_source.encode('utf-8'),
+                        encoding='utf-8', request=request)
+
+
+class PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.memory = self.start_memory = self.read_memory()
+        self.expiry = None  # DelayedCall quitting the browser while idle
+
+    def read_memory(self):
+        process = getattr(self.driver.service, 'process', None)
+        return process_tree_memory(process.pid) if process else None
+
+    # A dead chromedriver raises urllib3 and socket errors or times out, not only
+    # WebDriverException: any error means the browser is unusable
+
+    def is_healthy(self):
+        try:
+            return self.driver.execute_script('return 1') == 1
+        except Exception:
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Browser did not quit cleanly: {e}")
+
+    def reset(self, max_uses, max_memory_growth):
+        """Clear the browser for the next lease. Returns False (after quitting) when it is worn out."""
+        try:
+            self.memory = self.read_memory()
+            grown = self.memory is not None and self.start_memory is not None and \
+                self.memory - self.start_memory > max_memory_growth
+            if self.uses < max_uses and not grown and self.is_healthy():
+                self.driver.get('about:blank')
+                self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+                return True
+        except Exception as e:
+            logger.warning(f"Browser could not be reset: {e}")
+        self.quit()
+        return False
+
+
+class BrowserPool:
+    """At most `size` Chrome instances, leased with acquire() and given back with release()."""
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_uses=BROWSER_POOL_MAX_USES,
+                 max_memory_growth=BROWSER_POOL_MAX_MEMORY_GROWTH, idle_timeout=BROWSER_POOL_IDLE_TIMEOUT,
+                 driver_arguments=SELENIUM_DRIVER_ARGUMENTS, driver_executable_path=None):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_growth = max_memory_growth
+        self.idle_timeout = idle_timeout
+        self.driver_arguments = list(driver_arguments)
+        self.driver_executable_path = driver_executable_path
+        self.idle = []
+        self.leased = 0  # browsers leased or being started
+        self.waiting = deque()
+        self.counters = Counter()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            size=settings.getint('BROWSER_POOL_SIZE', BROWSER_POOL_SIZE),
+            max_uses=settings.getint('BROWSER_POOL_MAX_USES', BROWSER_POOL_MAX_USES),
+            max_memory_growth=settings.getfloat('BROWSER_POOL_MAX_MEMORY_GROWTH', BROWSER_POOL_MAX_MEMORY_GROWTH),
+            idle_timeout=settings.getfloat('BROWSER_POOL_IDLE_TIMEOUT', BROWSER_POOL_IDLE_TIMEOUT),
+            driver_arguments=settings.getlist('SELENIUM_DRIVER_ARGUMENTS', SELENIUM_DRIVER_ARGUMENTS),
+            driver_executable_path=settings.get('SELENIUM_DRIVER_EXECUTABLE_PATH'),
+        )
+
+    def acquire(self):
+        """Deferred firing with a healthy browser, warm if one is idle."""
+        self.counters['leases'] += 1
+        if self.idle:
+            browser = self.idle.pop()
+            if browser.expiry is not None and browser.expiry.active():
+                browser.expiry.cancel()
+            self.leased += 1
+            d = run_in_browser_thread(browser.is_healthy)
+            # A failing health check means a replacement, never a lost slot
+            d.addErrback(lambda failure: False)
+            d.addCallback(lambda healthy: browser if healthy else self._replace(browser))
+            return d
+        if self.leased < self.size:
+            self.leased += 1
+            return self._start()
+        self.counters['waits'] += 1
+        d = Deferred()
+        self.waiting.append(d)
+        return d
+
+    def release(self, browser):
+        """Give a browser back, recycling it when worn out. Returns a Deferred."""
+        d = run_in_browser_thread(browser.reset, self.max_uses, self.max_memory_growth)
+        # Whatever happens, the slot of the browser is freed or handed over
+        d.addErrback(self._reset_failed, browser)
+        d.addCallback(self._released, browser)
+        return d
+
+    def utilization(self):
+        return {
+            'size': self.size,
+            'leased': self.leased,
+            'idle': len(self.idle),
+            'waiting': len(self.waiting),
+            **self.counters,
+        }
+
+    def close(self):
+        """Quit the idle browsers, e.g. at reactor shutdown."""
+        browsers, self.idle = self.idle, []
+        for browser in browsers:
+            if browser.expiry is not None and browser.expiry.active():
+                browser.expiry.cancel()
+        return DeferredList([run_in_browser_thread(browser.quit) for browser in browsers])
+
+    def _start(self):
+        d = run_in_browser_thread(self._new_browser)
+        d.addCallbacks(self._started, self._start_failed)
+        return d
+
+    def _new_browser(self):
+        return PooledBrowser(start_driver(self.driver_arguments, self.driver_executable_path))
+
+    def _started(self, browser):
+        self.counters['started'] += 1
+        return browser
+
+    def _start_failed(self, failure):
+        self.leased -= 1
+        self.counters['start_failures'] += 1
+        self._start_for_waiter()
+        return failure
+
+    def _start_for_waiter(self):
+        """Start a browser for the first waiting lease, if a slot is free."""
+        if self.waiting and self.leased < self.size:
+            waiter = self.waiting.popleft()
+            self.leased += 1
+            self._start().chainDeferred(waiter)
+
+    def _reset_failed(self, failure, browser):
+        logger.warning(f"Browser reset failed: {failure.getErrorMessage()}")
+        run_in_browser_thread(browser.quit)
+        return False
+
+    def _replace(self, browser):
+        self.counters['unhealthy'] += 1
+        run_in_browser_thread(browser.quit)
+        return self._start()  # keeps the lease count of the replaced browser
+
+    def _released(self, kept, browser):
+        if not kept:
+            self.counters['recycled'] += 1
+            logger.info(f"Recycled a browser after {browser.uses} uses ({browser.memory or 0:.0f} MB)")
+            self.leased -= 1
+            self._start_for_waiter()
+        elif self.waiting:
+            self.waiting.popleft().callback(browser)
+        else:
+            from twisted.internet import reactor
+            self.leased -= 1
+            browser.expiry = reactor.callLater(self.idle_timeout, self._expire, browser)
+            self.idle.append(browser)
+
+    def _expire(self, browser):
+        if browser in self.idle:
+            self.idle.remove(browser)
+            self.counters['expired'] += 1
+            run_in_browser_thread(browser.quit)
+
+
+def shared_pool(settings):
+    """The browser pool of the process, created from the settings of its first user."""
+    global _shared_pool
+    if _shared_pool is None:
+        from twisted.internet import reactor
+        _shared_pool = BrowserPool.from_settings(settings)
+        reactor.addSystemEventTrigger('before', 'shutdown', _shared_pool.close)
+    return _shared_pool
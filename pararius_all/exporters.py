@@ -0,0 +1,47 @@
+# Custom feed exporters
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/exporters.html
+
+import csv
+import logging
+import os
+
+from itemadapter import ItemAdapter
+from scrapy.exporters import CsvItemExporter
+
+logger = logging.getLogger(__name__)
+
+
+def existing_header(path):
+    """Return the header of a non-empty CSV file, or None."""
+    if not path or not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'r', encoding='utf8', newline='') as f:
+        return next(csv.reader(f), None)
+
+
+class AppendingCsvItemExporter(CsvItemExporter):
+    """CSV exporter for appending feeds: the header is written only once,
+    later runs reuse the columns of the existing header.
+
+    The columns are fixed by that header (or by the first item), so a field
+    an item gains later, like a new FriendlyHousing specification, cannot be
+    written: it is logged once per field instead of silently dropped."""
+
+    def __init__(self, file, **kwargs):
+        header = existing_header(getattr(file, 'name', None))
+        if header:
+            kwargs['include_headers_line'] = False
+            if not kwargs.get('fields_to_export'):
+                kwargs['fields_to_export'] = header
+        super().__init__(file, **kwargs)
+        self.dropped_fields = set()
+
+    def export_item(self, item):
+        super().export_item(item)
+        dropped = set(ItemAdapter(item).keys()) - set(self.fields_to_export) - self.dropped_fields
+        for field in sorted(dropped):
+            logger.warning(f"Field {field} is not a column of {getattr(self.stream, 'name', 'the CSV feed')}, "
+                           f"it is not exported (move the file away to start one with the new columns)")
+        self.dropped_fields |= dropped
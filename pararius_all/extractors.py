@@ -0,0 +1,146 @@
+import logging
+import re
+
+'''
+Single-pass extraction helpers shared by the spiders' detail page parsers.
+'''
+
+
+def definition_terms(selector):
+    """Walk every <dt>/<dd> pair of the page once.
+
+    Returns the (whitespace-normalized <dt> label, <dd> selector) pairs in
+    document order."""
+    terms = []
+    label = None
+    for node in selector.xpath('//dl/*[self::dt or self::dd]'):
+        if node.root.tag == 'dt':
+            label = ' '.join(''.join(node.xpath('.//text()').getall()).split())
+        elif label is not None:
+            terms.append((label, node))
+            label = None
+    return terms
+
+
+def term_values(terms, label, part):
+    """Values of `part` in the <dd> of every <dt> containing `label`, like
+    dt:contains("label") + dd part over the whole page."""
+    values = []
+    for term, dd in terms:
+        if label in term:
+            values.extend(dd.css(part).getall())
+    return values
+
+
+def normalize_label(text):
+    return ' '.join((text or '').split()).rstrip(':').lower()
+
+
+def properties_table(selector):
+    """Parse a block of label/value <div> rows once.
+
+    Returns a dict mapping each normalized label (the own text of a <div>) to
+    the selector of its last sibling <div>, which holds the value."""
+    table = {}
+    for label_div in selector.xpath('.//div[text()[normalize-space()]][following-sibling::div]'):
+        label = normalize_label(label_div.xpath('text()[normalize-space()]').get())
+        if label not in table:
+            table[label] = label_div.xpath('following-sibling::div[last()]')
+    return table
+
+
+def table_value(table, label):
+    """Value selector of a label, falling back to the first label containing it."""
+    label = normalize_label(label)
+    if label in table:
+        return table[label]
+    return next((value for key, value in table.items() if label in key), None)
+
+
+def table_text(table, label, part=None):
+    """Text of a label's value, of its `part` elements only if given, or None
+    when the label is missing."""
+    value = table_value(table, label)
+    if value is None:
+        return None
+    if part:
+        value = value.xpath(part)
+    return ' '.join(value.xpath('.//text()').getall())
+
+
+def regex_converter(pattern):
+    """Converter returning the first group of a precompiled pattern, or None."""
+    compiled = re.compile(pattern)
+
+    def convert(text):
+        match = compiled.search(text or '')
+        return match.group(1) if match else None
+    return convert
+
+
+def text_converter(text):
+    return ' '.join((text or '').split()) or None
+
+
+class DescriptionExtractor:
+    """Extract details from a listing description with precompiled patterns.
+
+    Every rule is (key, anchor, rest, convert): its pattern is the lowercase
+    anchor followed by the rest. The lowercased text is scanned once for the
+    positions where any anchor starts, with a zero-width lookahead so anchors
+    starting inside another one are seen too, and the rules still missing a
+    match are only tried there. Positions are visited left to right, so every
+    rule gets the same leftmost match as a re.search() of its pattern."""
+
+    def __init__(self, rules):
+        self.rules = [(key, re.compile(f'(?:{anchor}){rest}', re.IGNORECASE), convert)
+                      for key, anchor, rest, convert in rules]
+        self.anchors = re.compile('(?=' + '|'.join(f'(?:{anchor})' for _, anchor, _, _ in rules) + ')')
+
+    def extract(self, text):
+        results = {}
+        pending = list(self.rules)  # rules whose leftmost match is not found yet
+        text = (text or '').lower()
+        for hit in self.anchors.finditer(text):
+            for rule in list(pending):
+                key, pattern, convert = rule
+                match = pattern.match(text, hit.start())
+                if match:
+                    pending.remove(rule)
+                    try:
+                        results[key] = convert(match)
+                    except Exception as e:
+                        logging.error(f"Error processing {key}: {e}")
+            if not pending:
+                break
+        # Same key order as the rules
+        return {key: results[key] for key, _, _ in self.rules if key in results}
+
+
+HUNTING_DESCRIPTION = DescriptionExtractor([
+    ('gas_water_electricity_included', r'gas/water/electricity|g/w/e|utilities|gwe',
+     r'\s*(?:are|is)?\s*(not\s+included|excluding|excluded)?', lambda m: not m.group(1)),
+    ('service_costs', r'service\s*costs?|monthly\s+prepayment\s+service\s+cost',
+     r'[\s:]*€\s*([\d,.]+)', lambda m: int(float(m.group(1).replace(',', '')))),
+    ('minimum_income', r'income|salary',
+     r'.*?(?:requires?|requirement).*?(\d+)\s*(?:times|months?)', lambda m: int(m.group(1))),
+    ('minimal_rent_period', r'rental period minimal', r' (\d+) months?', lambda m: int(m.group(1))),
+    ('pets', r'no pets allowed', '', lambda m: False),
+    ('smoking', r'no smoking allowed', '', lambda m: False),
+])
+
+AMOUNT = r'\s*[€\$]\s*([\d,.]+)'
+
+FRIENDLYHOUSING_DESCRIPTION = DescriptionExtractor([
+    ('minimum_rental_period', r'minimum|min',
+     r'(?: rental)? period(?: is)?\s*(\d+)\s*(?:calendar\s*)?months?', lambda m: int(m.group(1))),
+    ('utilities_included', r'utilities|gas|water|electricity', r'.*(?:included|includes|including)', lambda m: True),
+    ('furnished', r'\b(?:furnished|unfurnished)\b', '', lambda m: 'unfurnished' not in m.group(0).lower()),
+    # Amounts are kept as strings to retain the comma/dot formatting
+    ('base_rent', r'base rent', r'(?: is)?' + AMOUNT, lambda m: m.group(1)),
+    ('service_costs', r'service costs?', r'(?: is)?' + AMOUNT, lambda m: m.group(1)),
+    ('total_rent', r'total(?: monthly)? rent', r'(?: is)?' + AMOUNT, lambda m: m.group(1)),
+    ('energy_label', r'energy label', r'(?: is)?\s*([A-G][+-]?)', lambda m: m.group(1).upper()),
+    ('income_requirement', r'income (?:of|needs to be) at least', r'\s*(\d+)x?\s*the rent', lambda m: int(m.group(1))),
+    ('maximum_occupancy', r'occupancy', r' (?:of)?\s*by maximum\s*(\d+)\s*people', lambda m: int(m.group(1))),
+])
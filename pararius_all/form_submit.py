@@ -0,0 +1,68 @@
+from scrapy.http import FormRequest
+
+'''
+Plain HTTP submission of the Pararius contact form: the form page is fetched
+with the cookies of the logged-in session, the prefilled profile is checked
+and the form (CSRF token and hidden fields included) is posted back with the
+motivation, without a browser.
+'''
+
+FORM_PREFIX = 'contact_agent_huurprofiel_form'
+MOTIVATION_FIELD = f'{FORM_PREFIX}[motivation]'
+CONTACT_FORM_XPATH = f'//form[.//textarea[@name="{MOTIVATION_FIELD}"]]'
+CONFIRMATION_TEXT = 'Your request has been sent'
+
+
+def form_field(name):
+    return f'{FORM_PREFIX}[{name}]'
+
+
+def contact_form(response):
+    """The contact form of a form page, None when the page has none (e.g. the login page)."""
+    forms = response.xpath(CONTACT_FORM_XPATH)
+    return forms[0] if forms else None
+
+
+def prefilled_value(form, name):
+    """Value of a prefilled field: the text of the selected option for a select."""
+    field = form.xpath(f'.//*[@name="{form_field(name)}"]')
+    if not field:
+        return None
+    if field[0].root.tag == 'select':
+        return (field.xpath('.//option[@selected]/text()').get() or '').strip()
+    return field.attrib.get('value', '')
+
+
+def profile_mismatches(form, expected):
+    """[(field, expected, found)] for the prefilled fields that differ from the profile."""
+    mismatches = []
+    for name, value in expected.items():
+        found = prefilled_value(form, name)
+        if found != value:
+            mismatches.append((name, value, found))
+    return mismatches
+
+
+def contact_form_request(response, motivation, meta=None, **kwargs):
+    """POST of the contact form with its hidden fields and the motivation filled in.
+    Never retried: a POST that got no answer may still have reached Pararius."""
+    return FormRequest.from_response(
+        response,
+        formxpath=CONTACT_FORM_XPATH,
+        formdata={MOTIVATION_FIELD: motivation},
+        meta={**(meta or {}), 'dont_retry': True},
+        dont_filter=True,
+        **kwargs
+    )
+
+
+def is_confirmation(response):
+    return CONFIRMATION_TEXT in response.text
+
+
+def request_cookies(session):
+    """Cookies of a captured browser session in the form Scrapy requests take."""
+    return [
+        {key: cookie[key] for key in ('name', 'value', 'domain', 'path') if key in cookie}
+        for cookie in session['cookies']
+    ]
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+
+from pararius_all.url_index import SEEN_URL_INDEX_FILE, SeenUrlIndex, get_connection
+
+'''
+Append-only JSON Lines archive for the realtime-listings feeds (extate, lightcity).
+Every record is keyed by its URL (or id) and a hash of its content, kept in the
+seen-URL database, so a crawl only appends the records that are new or changed
+and never rewrites the history.
+'''
+
+
+def record_key(entry):
+    key = entry.get('url') or entry.get('id')
+    return str(key) if key is not None else None
+
+
+def record_hash(entry):
+    payload = json.dumps(entry, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class JsonLinesStore:
+    """Hash-keyed, append-only store of the listings of one source."""
+
+    def __init__(self, source, path=None, index_path=SEEN_URL_INDEX_FILE):
+        self.source = source
+        self.path = path or f'{source}_listings.jsonl'
+        self.conn = get_connection(index_path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS record_hashes ('
+            ' source TEXT NOT NULL,'
+            ' key TEXT NOT NULL,'
+            ' hash TEXT NOT NULL,'
+            ' PRIMARY KEY (source, key))'
+        )
+        self.conn.commit()
+        self.seen_urls = SeenUrlIndex(source, index_path)
+        if not os.path.exists(self.path):
+            self.import_json(f'{source}_listings.json')
+
+    def import_json(self, json_file):
+        """One-shot conversion of the old pretty-printed JSON array."""
+        entries = []
+        if os.path.exists(json_file):
+            with open(json_file, 'r') as file:
+                entries = json.load(file)
+        with open(self.path, 'a', encoding='utf-8') as file:
+            for entry in entries:
+                file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._remember([(record_key(entry) or record_hash(entry), record_hash(entry), entry) for entry in entries])
+
+    def append(self, entries):
+        """Append the new or changed entries and return them."""
+        pending = {}  # key -> (hash, entry) of this batch, a feed may list a record twice
+        for entry in entries:
+            digest = record_hash(entry)
+            key = record_key(entry) or digest
+            if key in pending:
+                known = pending[key][0]
+            else:
+                row = self.conn.execute(
+                    'SELECT hash FROM record_hashes WHERE source = ? AND key = ?', (self.source, key)
+                ).fetchone()
+                known = row[0] if row else None
+            if known != digest:
+                pending[key] = (digest, entry)
+        changed = [(key, digest, entry) for key, (digest, entry) in pending.items()]
+
+        if changed:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                for _, _, entry in changed:
+                    file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._remember(changed)
+        return [entry for _, _, entry in changed]
+
+    def _remember(self, records):
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO record_hashes (source, key, hash) VALUES (?, ?, ?)',
+            ((self.source, key, digest) for key, digest, _ in records)
+        )
+        self.conn.commit()
+        self.seen_urls.add_many(entry.get('url') for _, _, entry in records)
@@ -0,0 +1,40 @@
+import math
+
+'''
+Criteria a listing must meet to be emailed. is_match() is checked per listing:
+on the typed record of an item while its spider crawls (NewListingPipeline),
+and on every row of the cleaned frames by the pd_helpers filters.
+'''
+
+MAX_RENT = 700
+MIN_LIVING_AREA = 15
+MIN_LIVING_AREA_PARARIUS = 11
+
+# Spider -> rent and living area fields of its typed records (see parquet_store.SCHEMAS),
+# minimum living area
+RECORD_CRITERIA = {
+    'pararius': ('Rent_Price', 'Living_Area', MIN_LIVING_AREA_PARARIUS),
+    'hunting': ('price', 'surface', MIN_LIVING_AREA),
+    'friendlyhousing': ('Price', 'Surface_area', MIN_LIVING_AREA),
+    'rotsvast': ('Rent_Price', 'Floor_Area', MIN_LIVING_AREA),
+}
+
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def is_match(rent, living_area, min_living_area=MIN_LIVING_AREA, max_rent=MAX_RENT):
+    """Whether a listing is cheap and large enough; a missing rent or area is no match."""
+    rent, living_area = _number(rent), _number(living_area)
+    return rent is not None and living_area is not None and rent <= max_rent and living_area >= min_living_area
+
+
+def record_matches(spider, record):
+    """is_match() of a typed record of the spider."""
+    rent_field, area_field, min_living_area = RECORD_CRITERIA[spider]
+    return is_match(record.get(rent_field), record.get(area_field), min_living_area)
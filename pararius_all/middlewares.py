@@ -3,10 +3,20 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import time
+
 from scrapy import signals
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy_selenium import SeleniumRequest
+from twisted.internet.defer import DeferredLock
+
+from pararius_all.browser import (BROWSER_BLOCKED_RESOURCES, BROWSER_THREADS, block_urls, blocked_url_patterns,
+                                  browser_thread_pool, in_browser_thread)
+from pararius_all.browser_pool import load_page, shared_pool
+from pararius_all.ratelimit import FORM_SUBMIT_BURST, FORM_SUBMIT_RATE, get_bucket
 
 
 class ParariusAllSpiderMiddleware:
@@ -101,3 +111,91 @@ class ParariusAllDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class BrowserPoolMiddleware:
+    """Serve the SeleniumRequests with a Chrome leased from the shared warm pool.
+
+    A spider keeps its lease for the whole crawl, since its callbacks go on
+    driving response.meta['driver'], and gives it back when it closes. The
+    spider's resource blocking profile is applied to the browser it leases."""
+
+    def __init__(self, pool, stats, blocked_urls=()):
+        self.pool = pool
+        self.stats = stats
+        self.blocked_urls = list(blocked_urls)
+        self.browser = None
+        self.lock = DeferredLock()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        browser_thread_pool(crawler.settings.getint('BROWSER_THREADS', BROWSER_THREADS))
+        blocked_urls = blocked_url_patterns(
+            crawler.settings.getlist('BROWSER_BLOCKED_RESOURCES', BROWSER_BLOCKED_RESOURCES),
+            crawler.settings.getlist('BROWSER_BLOCK_ALLOWLIST'),
+        )
+        middleware = cls(shared_pool(crawler.settings), crawler.stats, blocked_urls)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    async def process_request(self, request, spider):
+        if not isinstance(request, SeleniumRequest):
+            return None
+        browser = await self.lease()
+        browser.uses += 1
+        self.stats.inc_value('browser_pool/requests')
+        return await in_browser_thread(load_page, browser.driver, request)
+
+    async def lease(self):
+        await maybe_deferred_to_future(self.lock.acquire())
+        try:
+            if self.browser is None:
+                start = time.monotonic()
+                browser = await maybe_deferred_to_future(self.pool.acquire())
+                self.stats.inc_value('browser_pool/lease_wait_seconds', round(time.monotonic() - start, 3))
+                # Pooled browsers carry the profile of their previous spider
+                try:
+                    await in_browser_thread(block_urls, browser.driver, self.blocked_urls)
+                except Exception:
+                    self.pool.release(browser)
+                    raise
+                self.stats.set_value('browser_pool/blocked_url_patterns', len(self.blocked_urls))
+                self.browser = browser
+            return self.browser
+        finally:
+            self.lock.release()
+
+    def spider_closed(self, spider):
+        for key, value in self.pool.utilization().items():
+            self.stats.set_value(f'browser_pool/{key}', value)
+        if self.browser is not None:
+            browser, self.browser = self.browser, None
+            return self.pool.release(browser)
+
+
+class TokenBucketMiddleware:
+    """Hold back the requests with a meta['rate_limit_key'] (an account) until the
+    token bucket of that key has a token. Waiting requests go by priority."""
+
+    def __init__(self, rate, burst, stats):
+        self.rate = rate
+        self.burst = burst
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            rate=crawler.settings.getfloat('FORM_SUBMIT_RATE', FORM_SUBMIT_RATE) / 60,
+            burst=crawler.settings.getint('FORM_SUBMIT_BURST', FORM_SUBMIT_BURST),
+            stats=crawler.stats,
+        )
+
+    async def process_request(self, request, spider):
+        key = request.meta.get('rate_limit_key')
+        if key is None:
+            return None
+        start = time.monotonic()
+        await maybe_deferred_to_future(get_bucket(key, self.rate, self.burst).take(request.priority))
+        self.stats.inc_value(f'ratelimit/{key}/requests')
+        self.stats.inc_value(f'ratelimit/{key}/wait_seconds', round(time.monotonic() - start, 3))
+        return None
@@ -0,0 +1,90 @@
+import re
+
+'''
+Early-stop policy for paginated search results sorted newest first: once
+EARLY_STOP_PAGES consecutive result pages contain only listings we already
+know, the following pages cannot contain new ones either. The start URLs of
+the spiders do not pin such a sort order, so it is off unless EARLY_STOP_PAGES
+is set for a spider whose results are known to be sorted newest first.
+PageFanOut requests the result pages ahead of their parsing, within a
+window, instead of chaining every page on the "next" link of the previous one.
+'''
+
+EARLY_STOP_PAGES = 0
+PAGE_FANOUT_WINDOW = 4
+
+
+class EarlyStopPolicy:
+    """Decide whether a list parser should follow the next results page."""
+
+    def __init__(self, patience=EARLY_STOP_PAGES, max_pages=None):
+        self.patience = patience  # 0 disables early stopping
+        self.max_pages = max_pages
+        self.pages = 0
+        self.known_streak = 0  # consecutive pages without unseen listings
+
+    @classmethod
+    def from_spider(cls, spider, max_pages=None):
+        return cls(spider.settings.getint('EARLY_STOP_PAGES', EARLY_STOP_PAGES), max_pages)
+
+    def record_page(self, unseen):
+        """Register a parsed results page with its number of unseen listings."""
+        self.pages += 1
+        self.known_streak = 0 if unseen else self.known_streak + 1
+
+    def stop_reason(self):
+        """Why no further page should be requested, or None to continue."""
+        if self.max_pages and self.pages >= self.max_pages:
+            return f"Reached maximum page limit: {self.max_pages}"
+        if self.patience and self.known_streak >= self.patience:
+            return f"Stopping early: {self.known_streak} consecutive pages without new listings"
+        return None
+
+
+def last_page_link(links, pattern):
+    """(highest page number, its link) among the pagination links, or (None, None).
+
+    `pattern` matches the page number of a link in its first group."""
+    numbered = [(int(match.group(1)), link) for link, match in ((link, re.search(pattern, link)) for link in links)
+                if match]
+    return max(numbered, key=lambda numbered_link: numbered_link[0]) if numbered else (None, None)
+
+
+def page_link(link, pattern, page):
+    """A pagination link with its page number replaced by `page`."""
+    match = re.search(pattern, link)
+    return f'{link[:match.start(1)]}{page}{link[match.end(1):]}'
+
+
+class PageFanOut:
+    """Keep up to `window` result pages requested ahead of the parsed ones.
+
+    Pages may be parsed out of order; they are fed to the early-stop policy in
+    page order, so early stopping only overshoots by at most `window` pages."""
+
+    def __init__(self, policy, last_page, window=PAGE_FANOUT_WINDOW):
+        self.policy = policy
+        self.last_page = min(last_page, policy.max_pages) if policy.max_pages else last_page
+        self.window = window
+        self.unseen = {}  # page -> unseen listings, for pages parsed ahead of the policy
+        self.recorded = 0  # pages 1..recorded have been fed to the policy
+        self.requested = 1  # pages 1..requested have been requested
+        self.stopped = False
+
+    @classmethod
+    def from_spider(cls, spider, policy, last_page):
+        return cls(policy, last_page, spider.settings.getint('PAGE_FANOUT_WINDOW', PAGE_FANOUT_WINDOW))
+
+    def page_parsed(self, page, unseen):
+        """Register a parsed page and return the page numbers to request next."""
+        self.unseen[page] = unseen
+        while not self.stopped and self.recorded + 1 in self.unseen:
+            self.recorded += 1
+            self.policy.record_page(self.unseen.pop(self.recorded))
+            self.stopped = self.policy.stop_reason() is not None
+        if self.stopped:
+            return []
+
+        pages = range(self.requested + 1, min(self.recorded + self.window, self.last_page) + 1)
+        self.requested = max(self.requested, pages[-1]) if pages else self.requested
+        return list(pages)
@@ -0,0 +1,281 @@
+import argparse
+import math
+import os
+import re
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pararius_all.url_index import clean_entry
+
+'''
+Columnar listing store: one Parquet dataset per source under LISTING_STORE_DIR,
+with a typed schema per source. Every crawl writes one part file, in row groups
+of LISTING_STORE_BATCH_SIZE listings, and readers load only the columns they
+need, already converted: email_pipeline reads the parts written by a crawl
+(see dataset_parts / read_new_parts) instead of reparsing the CSV exports.
+'''
+
+LISTING_STORE_DIR = 'listings'
+LISTING_STORE_BATCH_SIZE = 100
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    value = str(value).strip()
+    return value if value and value.lower() != 'nan' else None
+
+
+def to_str(value):
+    return _text(value)
+
+
+def to_int(value):
+    value = _text(value)
+    match = re.search(r'-?\d+', value) if value else None
+    return int(match.group(0)) if match else None
+
+
+def to_float(value):
+    value = _text(value)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def to_amount(value):
+    """Parse money/area amounts written either as 1,250.00 or as 1.250,00."""
+    value = re.sub(r'[^\d.,]', '', _text(value) or '')
+    if not any(c.isdigit() for c in value):
+        return None
+    if ',' in value and '.' in value:
+        decimal = ',' if value.rfind(',') > value.rfind('.') else '.'
+    elif re.search(r'[.,]\d{1,2}$', value):
+        decimal = value[-2] if value[-2] in '.,' else value[-3]
+    else:
+        decimal = None
+    for separator in {'.', ','} - {decimal}:
+        value = value.replace(separator, '')
+    return float(value.replace(',', '.'))
+
+
+def to_bool(value):
+    value = _text(value)
+    if value is None:
+        return None
+    return value.lower() in ('true', 'yes', '1')
+
+
+def to_included(value):
+    """Whether the service costs are in the rent, from the Pararius 'Includes: ...' /
+    'Excludes: ...' lines (flattened to 'Includes, service costs, Excludes, ...')."""
+    value = _text(value)
+    for kind, what in re.findall(r'(Includes|Excludes)[:,]?\s*(.*?)(?=,?\s*(?:Includes|Excludes)\b|$)', value or ''):
+        if 'service cost' in what.lower():
+            return kind == 'Includes'
+    return None
+
+
+def to_date(value):
+    value = _text(value)
+    match = re.search(r'(\d{2})-(\d{2})-(\d{4})', value) if value else None
+    if not match:
+        return None
+    day, month, year = (int(g) for g in match.groups())
+    try:
+        return datetime(year, month, day).date()
+    except ValueError:
+        return None
+
+
+def to_timestamp(value):
+    value = _text(value)
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+STRING = (pa.string(), to_str)
+INT = (pa.int64(), to_int)
+FLOAT = (pa.float64(), to_float)
+AMOUNT = (pa.float64(), to_amount)
+BOOL = (pa.bool_(), to_bool)
+DATE = (pa.date32(), to_date)
+INCLUDED = (pa.bool_(), to_included)
+TIMESTAMP = (pa.timestamp('us'), to_timestamp)
+
+# Column -> (arrow type, converter) for every source
+SCHEMAS = {
+    'pararius': {
+        'URL': STRING, 'Title': STRING, 'Location': STRING, 'Description': STRING,
+        'Agency_Link': STRING, 'Form_link': STRING, 'Latitude': FLOAT, 'Longitude': FLOAT,
+        'Rent_Price': AMOUNT, 'Offered_Since': DATE, 'Status': STRING, 'Available_From': DATE,
+        'Contract_Type': STRING, 'Deposit': AMOUNT, 'Interior': STRING, 'Upkeep': STRING,
+        'Service_Costs': INCLUDED, 'Living_Area': AMOUNT, 'House_Type': STRING,
+        'Construction_Type': STRING, 'Construction_Year': INT, 'Number_of_Rooms': INT,
+        'Number_of_Bathrooms': INT, 'Number_of_Floors': INT, 'Facilities': STRING,
+        'Balcony': STRING, 'Garden': STRING, 'Energy_Rating': STRING, 'Shed_Storeroom': STRING,
+        'Parking_Present': STRING, 'Parking_Type': STRING, 'Garage_Present': STRING,
+        'Smoking_Allowed': STRING, 'Pets_Allowed': STRING,
+    },
+    'rotsvast': {
+        'URL': STRING, 'Title': STRING, 'Location': STRING, 'Description': STRING,
+        'Agency_Link': STRING, 'Latitude': FLOAT, 'Longitude': FLOAT, 'Rent_Price': AMOUNT,
+        'Start_Date': DATE, 'Total_Rent': AMOUNT, 'Service_Costs': AMOUNT, 'Utilities': AMOUNT,
+        'Deposit': AMOUNT, 'Other_Costs': AMOUNT, 'Transfer_Costs': AMOUNT, 'Energy_Label': STRING,
+        'Type': STRING, 'Interior': STRING, 'Rooms': INT, 'Bedrooms': INT, 'Floor_Area': AMOUNT,
+        'Smoking': STRING, 'Pets': STRING,
+    },
+    'friendlyhousing': {
+        'URL': STRING, 'Title': STRING, 'Location': STRING, 'Description': STRING,
+        'Dwelling_type': STRING, 'Price': AMOUNT, 'Price_including_GWL': BOOL, 'Postal_code': STRING,
+        'City': STRING, 'Number_of_rooms': INT, 'Available_from': STRING, 'Surface_area': AMOUNT,
+        'Deposit': AMOUNT, 'Number_of_bedrooms': INT, 'Minimum_rental_period': INT,
+        'Utilities_included': BOOL, 'Furnished': BOOL, 'Base_rent': AMOUNT, 'Service_costs': AMOUNT,
+        'Total_rent': AMOUNT, 'Energy_label': STRING, 'Income_requirement': INT,
+        'Maximum_occupancy': INT,
+    },
+    'hunting': {
+        'title': STRING, 'price': INT, 'description': STRING, 'available_from': DATE,
+        'surface': INT, 'rooms': INT, 'bedrooms': INT, 'bathrooms': INT, 'toilets': INT,
+        'deposit': INT, 'energy_label': STRING, 'roof_terrace': STRING, 'interior': STRING,
+        'location': STRING, 'gas_water_electricity_included': BOOL, 'service_costs': INT,
+        'minimum_income': INT, 'minimal_rent_period': INT, 'pets': BOOL, 'smoking': BOOL,
+        'url': STRING, 'scraped_at': TIMESTAMP,
+    },
+    'extate': {
+        'url': STRING, 'address': STRING, 'zipcode': STRING, 'city': STRING, 'isRentals': BOOL,
+        'rentalsPrice': FLOAT, 'livingSurface': FLOAT, 'rooms': INT,
+    },
+}
+SCHEMAS['lightcity'] = SCHEMAS['extate']
+
+
+def url_column(source):
+    return 'URL' if 'URL' in SCHEMAS[source] else 'url'
+
+
+def arrow_schema(source):
+    return pa.schema([(column, arrow_type) for column, (arrow_type, _) in SCHEMAS[source].items()])
+
+
+def convert_record(source, record):
+    """Convert a scraped record to the native types of the source schema."""
+    return {column: convert(record.get(column)) for column, (_, convert) in SCHEMAS[source].items()}
+
+
+class ParquetListingStore:
+    """Writer of one part file of a source dataset, flushed in row groups."""
+
+    def __init__(self, source, root=LISTING_STORE_DIR, batch_size=LISTING_STORE_BATCH_SIZE):
+        self.source = source
+        self.directory = os.path.join(root, source)
+        self.batch_size = batch_size
+        self.schema = arrow_schema(source)
+        self.buffer = []
+        self.writer = None
+        self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, record):
+        self.buffer.append(convert_record(self.source, record))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def write(self, records):
+        for record in records:
+            self.add(record)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.writer is None:
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"part-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.parquet"
+            self.path = os.path.join(self.directory, name)
+            # Readers skip files starting with '_' until the part is complete
+            self.writer = pq.ParquetWriter(os.path.join(self.directory, '_' + name), self.schema)
+        self.writer.write_table(pa.Table.from_pylist(self.buffer, schema=self.schema))
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            os.replace(os.path.join(self.directory, '_' + os.path.basename(self.path)), self.path)
+
+
+def dataset_parts(source, root=LISTING_STORE_DIR):
+    """Names of the complete part files of a source: the watermark taken before a crawl."""
+    directory = os.path.join(root, source)
+    if not os.path.isdir(directory):
+        return set()
+    # Parts being written start with '_' and are not complete yet
+    return {name for name in os.listdir(directory) if name.startswith('part-') and name.endswith('.parquet')}
+
+
+def read_new_parts(source, known_parts, urls, columns=None, root=LISTING_STORE_DIR):
+    """Listings of the given URLs in the parts written after the dataset_parts() watermark,
+    with their native dtypes. A URL written more than once keeps its last version."""
+    directory = os.path.join(root, source)
+    schema = arrow_schema(source)
+    key = url_column(source)
+    wanted = list(columns) if columns else schema.names
+    paths = [os.path.join(directory, name) for name in sorted(dataset_parts(source, root) - set(known_parts))]
+    if not paths or not urls:
+        return schema.empty_table().select(wanted).to_pandas()
+    table = pq.read_table(paths, schema=schema, columns=wanted if key in wanted else wanted + [key],
+                          filters=[(key, 'in', sorted(urls))])
+    df = table.to_pandas().drop_duplicates(key, keep='last')
+    return df[wanted].reset_index(drop=True)
+
+
+def read_listings(source, columns=None, root=LISTING_STORE_DIR):
+    """Load the listings of a source with their native dtypes, optionally only some columns."""
+    directory = os.path.join(root, source)
+    if not os.path.isdir(directory) or not os.listdir(directory):
+        table = arrow_schema(source).empty_table()
+        return (table.select(columns) if columns else table).to_pandas()
+    return pd.read_parquet(directory, columns=columns)
+
+
+def import_history(source, root=LISTING_STORE_DIR):
+    """One-shot import of the CSV / JSON Lines history of a source, into an empty dataset only."""
+    if dataset_parts(source, root):
+        return 0
+    if source in ('extate', 'lightcity'):
+        path = f'{source}_listings.jsonl'
+        df = pd.read_json(path, lines=True, dtype=False) if os.path.exists(path) else pd.DataFrame()
+    else:
+        path = f'{source}_listings.csv'
+        df = pd.read_csv(path, dtype=str) if os.path.exists(path) else pd.DataFrame()
+        # Files not yet normalized still contain header rows and "['...']" values
+        df = df[~df.isin(df.columns).any(axis=1)].map(clean_entry)
+
+    with ParquetListingStore(source, root) as store:
+        store.write(df.to_dict('records'))
+    return len(df)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import the listing history into the Parquet store.")
+    parser.add_argument('--root', default=LISTING_STORE_DIR, help='Directory of the Parquet datasets')
+    parser.add_argument('sources', nargs='*', default=list(SCHEMAS), help='Sources to import')
+    args = parser.parse_args()
+
+    for source in args.sources:
+        if dataset_parts(source, args.root):
+            print(f'{source}: the dataset already exists, nothing imported')
+        else:
+            print(f'{source}: {import_history(source, args.root)} listings imported')
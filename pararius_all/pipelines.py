@@ -7,17 +7,111 @@
 # useful for handling different item types with a single interface
 import numpy as np
 from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+from twisted.internet.defer import DeferredQueue
+from pararius_all.matching import RECORD_CRITERIA, record_matches
+from pararius_all.parquet_store import LISTING_STORE_BATCH_SIZE, LISTING_STORE_DIR, SCHEMAS, ParquetListingStore, convert_record
+from pararius_all.url_index import SEEN_URL_INDEX_FILE, SeenUrlIndex, item_url
 
 class FormatCSVPipeline:
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
 
-        # Ensure all fields are strings for CSV export and replace None with NaN
+        # Ensure all fields are strings for CSV export and replace None with NaN.
+        # Loader lists are flattened so that no "['...']" ends up in the CSV.
         for field in adapter.field_names():
             value = adapter.get(field)
+            if isinstance(value, (list, tuple)):
+                value = ', '.join(str(v) for v in value) if value else None
             if value is None:
                 adapter[field] = np.nan
             else:
                 adapter[field] = str(value)
 
-        return item
\ No newline at end of file
+        return item
+
+
+# (spider name, URL, typed record) of the matches found while crawling, consumed by email_pipeline
+new_listings = DeferredQueue()
+
+
+class NewListingPipeline:
+    """Detect unseen listings that meet the filter criteria while the crawl runs
+    and put them on the new_listings queue. Must run before SeenUrlPipeline."""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.index = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('NEW_LISTING_NOTIFICATIONS'):
+            raise NotConfigured
+        return cls(crawler.settings.get('SEEN_URL_INDEX', SEEN_URL_INDEX_FILE))
+
+    def open_spider(self, spider):
+        if spider.name in RECORD_CRITERIA:
+            self.index = SeenUrlIndex(spider.name, self.index_path)
+
+    def process_item(self, item, spider):
+        if self.index is None:
+            return item
+        adapter = ItemAdapter(item)
+        url = item_url(adapter, spider.name)
+        if not url or url in self.index:
+            return item
+
+        # Same typed record as read back from the listing store, checked without pandas
+        record = convert_record(spider.name, adapter.asdict())
+        if record_matches(spider.name, record):
+            new_listings.put((spider.name, url, record))
+        return item
+
+
+class ParquetStorePipeline:
+    """Write every scraped listing, with native dtypes, to the Parquet store of its spider."""
+
+    def __init__(self, root, batch_size):
+        self.root = root
+        self.batch_size = batch_size
+        self.store = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            crawler.settings.get('LISTING_STORE_DIR', LISTING_STORE_DIR),
+            crawler.settings.getint('LISTING_STORE_BATCH_SIZE', LISTING_STORE_BATCH_SIZE),
+        )
+
+    def open_spider(self, spider):
+        if spider.name in SCHEMAS:
+            self.store = ParquetListingStore(spider.name, self.root, self.batch_size)
+
+    def process_item(self, item, spider):
+        if self.store is not None:
+            self.store.add(ItemAdapter(item).asdict())
+        return item
+
+    def close_spider(self, spider):
+        if self.store is not None:
+            self.store.close()
+
+
+class SeenUrlPipeline:
+    """Record the URL of every scraped listing in the shared seen-URL index."""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get('SEEN_URL_INDEX', SEEN_URL_INDEX_FILE))
+
+    def open_spider(self, spider):
+        self.index = SeenUrlIndex(spider.name, self.index_path)
+
+    def process_item(self, item, spider):
+        url = item_url(ItemAdapter(item), spider.name)
+        if url:
+            self.index.add(url)
+        return item
@@ -0,0 +1,72 @@
+import heapq
+import itertools
+import time
+
+from twisted.internet.defer import Deferred
+
+'''
+Token buckets limiting how fast requests are sent on behalf of one account,
+e.g. the Pararius contact form submissions. A bucket holds at most `capacity`
+tokens and gains `rate` tokens per second; each request takes one. Requests
+waiting for a token are served by priority, then in arrival order. Buckets are
+kept for the whole process, so the limit also holds across crawls.
+'''
+
+FORM_SUBMIT_RATE = 6  # submissions per minute and account
+FORM_SUBMIT_BURST = 3  # submissions sent at once after a quiet period
+
+_buckets = {}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+        self.waiters = []  # heap of (-priority, arrival, Deferred)
+        self.arrivals = itertools.count()
+        self.timer = None
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self):
+        """Take a token if one is available, without waiting."""
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self):
+        """Seconds until the next token is available."""
+        self.refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self, priority=0):
+        """Deferred firing once a token was taken for the caller."""
+        d = Deferred()
+        heapq.heappush(self.waiters, (-priority, next(self.arrivals), d))
+        if self.timer is None:
+            self.serve()
+        return d
+
+    def serve(self):
+        self.timer = None
+        while self.waiters and self.try_take():
+            heapq.heappop(self.waiters)[2].callback(None)
+        if self.waiters:
+            from twisted.internet import reactor
+            self.timer = reactor.callLater(self.delay(), self.serve)
+
+
+def get_bucket(key, rate, capacity):
+    """The bucket of a key (account), created with the given limits on first use."""
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = TokenBucket(rate, capacity)
+    return bucket
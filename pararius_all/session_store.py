@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import time
+
+from cryptography.fernet import Fernet, InvalidToken
+
+'''
+Encrypted on-disk store of the authenticated Pararius browser session (cookies
+and localStorage), so par_login can reuse it instead of logging in on every run.
+The Fernet key comes from the PARARIUS_SESSION_KEY environment variable, or from
+a key file created on first use and readable by its owner only.
+'''
+
+PARARIUS_SESSION_FILE = 'pararius_session.bin'
+PARARIUS_SESSION_KEY_FILE = 'pararius_session.key'
+PARARIUS_SESSION_MAX_AGE = 7 * 24 * 3600  # seconds a saved session is trusted
+
+logger = logging.getLogger(__name__)
+
+
+def load_key(key_file=PARARIUS_SESSION_KEY_FILE):
+    key = os.environ.get('PARARIUS_SESSION_KEY')
+    if key:
+        return key.encode()
+    if not os.path.exists(key_file):
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(Fernet.generate_key())
+    with open(key_file, 'rb') as f:
+        return f.read().strip()
+
+
+def capture_session(driver):
+    """Cookies and localStorage of the page currently loaded in the driver."""
+    return {
+        'url': driver.current_url,
+        'cookies': driver.get_cookies(),
+        'local_storage': driver.execute_script('return Object.assign({}, window.localStorage);'),
+    }
+
+
+def restore_session(driver, session):
+    """Put a captured session back in a driver that has a page of the same site loaded."""
+    now = time.time()
+    for cookie in session['cookies']:
+        if cookie.get('expiry') is not None and cookie['expiry'] <= now:
+            continue
+        driver.add_cookie(cookie)
+    driver.execute_script(
+        'for (const [k, v] of Object.entries(arguments[0])) { window.localStorage.setItem(k, v); }',
+        session.get('local_storage') or {})
+
+
+class SessionStore:
+    """One encrypted session file, trusted for at most max_age seconds."""
+
+    def __init__(self, path=PARARIUS_SESSION_FILE, key_file=PARARIUS_SESSION_KEY_FILE,
+                 max_age=PARARIUS_SESSION_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.fernet = Fernet(load_key(key_file))
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            path=settings.get('PARARIUS_SESSION_FILE', PARARIUS_SESSION_FILE),
+            key_file=settings.get('PARARIUS_SESSION_KEY_FILE', PARARIUS_SESSION_KEY_FILE),
+            max_age=settings.getint('PARARIUS_SESSION_MAX_AGE', PARARIUS_SESSION_MAX_AGE),
+        )
+
+    def load(self):
+        """The saved session, or None when missing, expired or not readable with our key."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            token = f.read()
+        try:
+            # The token timestamp is the save time, Fernet checks the age for us
+            return json.loads(self.fernet.decrypt(token, ttl=self.max_age))
+        except InvalidToken:
+            logger.info("Saved session expired or unreadable, a full login is needed")
+            return None
+
+    def save(self, session):
+        token = self.fernet.encrypt(json.dumps(session).encode('utf-8'))
+        # Write then rename, so a crash never leaves half a session behind
+        fd = os.open(self.path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(token)
+        os.replace(self.path + '.tmp', self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -94,6 +94,11 @@ CONCURRENT_REQUESTS_PER_DOMAIN = 1
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
 
+# Append-aware CSV exporter: the header is written once per file
+FEED_EXPORTERS = {
+    'csv': 'pararius_all.exporters.AppendingCsvItemExporter',
+}
+
 # Export to CSV
 FEEDS = {
     '%(name)s_listings.csv': {
@@ -106,4 +111,66 @@ FEEDS = {
 
 ITEM_PIPELINES = {
     'pararius_all.pipelines.FormatCSVPipeline': 300,
+    'pararius_all.pipelines.NewListingPipeline': 310,
+    'pararius_all.pipelines.ParquetStorePipeline': 400,
+    'pararius_all.pipelines.SeenUrlPipeline': 900,
 }
+
+# Shared index of already scraped listing URLs (see pararius_all/url_index.py)
+SEEN_URL_INDEX = 'seen_urls.db'
+
+# Typed columnar copy of the listings (see pararius_all/parquet_store.py)
+LISTING_STORE_DIR = 'listings'
+LISTING_STORE_BATCH_SIZE = 100
+
+# Stop following result pages after this many consecutive pages without unseen listings (0 disables).
+# Only safe when the results are sorted newest first, which the start URLs do not guarantee
+EARLY_STOP_PAGES = 0
+# Result pages requested ahead of the parsed ones (see pararius_all/pagination.py),
+# the downloader still applies CONCURRENT_REQUESTS_PER_DOMAIN and DOWNLOAD_DELAY
+PAGE_FANOUT_WINDOW = 4
+
+# Put matching unseen listings on pipelines.new_listings during the crawl (enabled by email_pipeline.py)
+NEW_LISTING_NOTIFICATIONS = False
+
+# How HousehuntingSpider discovers listings: 'http' calls the load-more backend directly
+# (falling back to Selenium when it cannot be found), 'selenium' always drives Chrome
+HUNTING_DISCOVERY = 'http'
+
+# Upper bound (seconds) of the condition-based browser waits (see pararius_all/browser.py),
+# per wait name in BROWSER_WAIT_TIMEOUTS, e.g. {'load_more': 10, 'confirmation': 20}
+BROWSER_WAIT_TIMEOUT = 10
+BROWSER_WAIT_TIMEOUTS = {}
+
+# Threads running the blocking Selenium work (page loads, clicks, waits) off the reactor
+BROWSER_THREADS = 2
+
+# Warm headless Chrome pool shared by the Selenium spiders (see pararius_all/browser_pool.py):
+# a browser is replaced after BROWSER_POOL_MAX_USES requests, once its memory grew by
+# BROWSER_POOL_MAX_MEMORY_GROWTH MB, or after BROWSER_POOL_IDLE_TIMEOUT seconds unused
+SELENIUM_DRIVER_ARGUMENTS = ["--headless=new"]
+BROWSER_POOL_SIZE = 2
+BROWSER_POOL_MAX_USES = 50
+BROWSER_POOL_MAX_MEMORY_GROWTH = 512
+BROWSER_POOL_IDLE_TIMEOUT = 1800
+
+# Resource categories of pararius_all.browser.BLOCK_PROFILES the browser does not download
+# ('stylesheet' too when a spider does not check visibility), and the categories or
+# patterns a spider still needs, e.g. 'BROWSER_BLOCK_ALLOWLIST': ['*.svg*'] in custom_settings
+BROWSER_BLOCKED_RESOURCES = ['image', 'media', 'font', 'tracker', 'map']
+BROWSER_BLOCK_ALLOWLIST = []
+
+# Encrypted Pararius login session reused by par_login (see pararius_all/session_store.py).
+# The key file is created on first use unless PARARIUS_SESSION_KEY is set in the environment
+PARARIUS_SESSION_FILE = 'pararius_session.bin'
+PARARIUS_SESSION_KEY_FILE = 'pararius_session.key'
+PARARIUS_SESSION_MAX_AGE = 7 * 24 * 3600
+
+# How par_login submits the contact forms: 'http' posts them with the session cookies and
+# falls back to the browser when a form page cannot be used, 'selenium' always uses Chrome
+PARARIUS_FORM_SUBMISSION = 'http'
+
+# Token bucket of the contact form submissions of the Pararius account (see pararius_all/ratelimit.py):
+# at most FORM_SUBMIT_RATE per minute, with bursts of FORM_SUBMIT_BURST after a quiet period
+FORM_SUBMIT_RATE = 6
+FORM_SUBMIT_BURST = 3
@@ -1,6 +1,8 @@
 import scrapy
 from scrapy import Request
-import json
+from pararius_all.jsonl_store import JsonLinesStore
+from pararius_all.parquet_store import LISTING_STORE_DIR, ParquetListingStore
+from pararius_all.url_index import SEEN_URL_INDEX_FILE
 
 class ExtateSpider(scrapy.Spider):
     name = "extate"
@@ -26,33 +28,14 @@ class ExtateSpider(scrapy.Spider):
 
         # Extract listings
         new_data = response.json()  # Parse the JSON content
-        file_path = "extate_listings.json" 
-        try:
-            with open(file_path, "r") as file:
-                existing_data = json.load(file)
-        except FileNotFoundError:
-            existing_data = []  # Initialize as an empty list if the file doesn't exist
-
-        new_entries = [entry for entry in new_data if entry not in existing_data]
-        if new_entries:
-            existing_data.extend(new_entries)
-
-        #Save the updated JSON file
-        with open(file_path, "w") as file:
-            json.dump(existing_data, file, indent=4)  # Save with pretty formatting
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        index_path = self.settings.get('SEEN_URL_INDEX', SEEN_URL_INDEX_FILE)
+        store = JsonLinesStore(self.name, index_path=index_path)
 
+        # Only new or changed listings are appended, the history is never rewritten
+        written = store.append(new_data)
+        self.logger.info(f"Appended {len(written)} new or changed listings to {store.path}")
 
+        # Keep the typed columnar copy in sync
+        root = self.settings.get('LISTING_STORE_DIR', LISTING_STORE_DIR)
+        with ParquetListingStore(self.name, root) as parquet_store:
+            parquet_store.write(written)
\ No newline at end of file
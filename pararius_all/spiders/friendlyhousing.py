@@ -2,16 +2,10 @@ import logging
 import scrapy
 from scrapy import Request
 from scrapy.loader import ItemLoader
-from scrapy.selector import Selector
+from pararius_all.extractors import FRIENDLYHOUSING_DESCRIPTION
 from pararius_all.items import FriendlyHousingItem
-import pandas as pd
+from pararius_all.url_index import SEEN_URL_INDEX_FILE, load_seen_urls
 import re
-import os
-
-def clean_entry(entry):
-    if isinstance(entry, str):
-        return entry.strip("[]'")  # Remove the square brackets and single quotes
-    return entry  # If it's not a string, return it as is
 
 class FriendlyhousingSpider(scrapy.Spider):
     name = "friendlyhousing"
@@ -25,21 +19,15 @@ class FriendlyhousingSpider(scrapy.Spider):
     }
     def __init__(self, *args, **kwargs):
         super(FriendlyhousingSpider, self).__init__(*args, **kwargs)
-        self.existing_urls = self.load_existing_urls()
-        self.logger.info(f"Loaded {len(self.existing_urls)} existing URLs from CSV")
 
     def load_existing_urls(self):
-        csv_file = 'friendlyhousing_listings.csv'
-        if os.path.exists(csv_file):
-            urls = set()
-            for chunk in pd.read_csv(csv_file, chunksize=1000, usecols=['URL']):
-                chunk['URL'] = chunk['URL'].apply(clean_entry)
-                urls.update(chunk['URL'].dropna().tolist())
-            return urls
-        return set()
+        index_path = self.settings.get('SEEN_URL_INDEX', SEEN_URL_INDEX_FILE)
+        return load_seen_urls(self.name, index_path)
     
 
     def start_requests(self):
+        self.existing_urls = self.load_existing_urls()
+        self.logger.info(f"Loaded {len(self.existing_urls)} existing URLs from the seen-URL index")
         headers = {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
@@ -83,10 +71,10 @@ class FriendlyhousingSpider(scrapy.Spider):
         price_incl_text = response.css('.price span::text').get(default='')
         loader.add_value('Price_including_GWL', '(Incl. GWL)' in price_incl_text)
         
-        # Process the description HTML.
-        description_html = response.css('.house-main__content__description__text').get()
-        if description_html:
-            parsed_description = parse_description(description_html)
+        # Process the description on the already parsed response.
+        description = response.css('.house-main__content__description__text')
+        if description:
+            parsed_description = parse_description(description[0])
             # Use the cleaned, multi-line text version for Description.
             loader.add_value('Description', parsed_description['full_description'])
             # Also add any extracted key details (e.g. minimum_rental_period) to the item.
@@ -116,19 +104,18 @@ class FriendlyhousingSpider(scrapy.Spider):
         yield loader.load_item()
 
 
-def parse_description(html_content):
+def parse_description(description):
         """
-        Parse the description HTML and return a dictionary with:
+        Parse the description subtree (a Selector of the response) and return a dictionary with:
         - full_description: a cleaned, multi-line string of the description
         - key_details: extracted numerical or boolean details based on regex patterns
         """
-        response = Selector(text=html_content)
         sections = {}
         order = []
         current_section = None
 
-        # Iterate over all elements in order
-        for element in response.css('h2, strong, p, ul'):
+        # Iterate over all elements in document order
+        for element in description.css('h2, strong, p, ul'):
             tag = element.root.tag
             if tag in ['h2', 'strong']:
                 # When a heading is found, set the current section (strip colon)
@@ -168,37 +155,8 @@ def parse_description(html_content):
             full_description_lines.append("")  # add a blank line between sections
         full_description = "\n".join(full_description_lines).strip()
 
-        # Updated regex patterns – adjust these as needed.
-        patterns = {
-            'minimum_rental_period': r'(?:minimum|min)(?: rental)? period(?: is)?\s*(\d+)\s*(?:calendar\s*)?months?',
-            'utilities_included': r'(?:utilities|gas|water|electricity).*(?:included|includes|including)',
-            'furnished': r'\b(furnished|unfurnished)\b',
-            'base_rent': r'base rent(?: is)?\s*[€\$]\s*([\d,.]+)',
-            'service_costs': r'service costs?(?: is)?\s*[€\$]\s*([\d,.]+)',
-            'total_rent': r'total(?: monthly)? rent(?: is)?\s*[€\$]\s*([\d,.]+)',
-            'energy_label': r'energy label(?: is)?\s*([A-G][+-]?)',
-            'income_requirement': r'income (?:of|needs to be) at least\s*(\d+)x?\s*the rent',
-            'maximum_occupancy': r'occupancy (?:of)?\s*by maximum\s*(\d+)\s*people'
-        }
-
-        key_details = {}
-        for key, pattern in patterns.items():
-            match = re.search(pattern, full_description, re.IGNORECASE)
-            if match:
-                try:
-                    if key in ['minimum_rental_period', 'income_requirement', 'maximum_occupancy']:
-                        key_details[key] = int(match.group(1))
-                    elif key in ['base_rent', 'service_costs', 'total_rent']:
-                        # Keep as string so you retain the comma/dot formatting.
-                        key_details[key] = match.group(1)
-                    elif key == 'utilities_included':
-                        key_details[key] = True
-                    elif key == 'furnished':
-                        key_details[key] = 'unfurnished' not in match.group(1).lower()
-                    elif key == 'energy_label':
-                        key_details[key] = match.group(1).upper()
-                except Exception as e:
-                    print(f"Error processing {key}: {e}")
+        # Precompiled rules, the description is scanned once (see pararius_all/extractors.py)
+        key_details = FRIENDLYHOUSING_DESCRIPTION.extract(full_description)
 
         return {
             'key_details': key_details,
@@ -7,15 +7,17 @@ from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, ElementClickInterceptedException
 from scrapy.loader import ItemLoader
+from pararius_all.browser import BrowserWaits, in_browser_thread, listing_count_changed, network_idle
+from pararius_all.extractors import HUNTING_DESCRIPTION
 from pararius_all.items import HuntingItem
-import time
+from pararius_all.url_index import SEEN_URL_INDEX_FILE, load_seen_urls
 import logging
 from itemloaders.processors import TakeFirst, MapCompose
 import re
+import json
 from datetime import datetime
-from scrapy import Request
-import os
-import pandas as pd
+from urllib.parse import urljoin
+from scrapy import FormRequest, Request
 from collections import Counter
 
 logging.getLogger("selenium.webdriver.remote.remote_connection").setLevel(logging.WARNING)
@@ -43,10 +45,67 @@ def parse_date(value):
             return None
     return None
 
-def clean_entry(entry):
-    if isinstance(entry, str):
-        return entry.strip("[]'")  # Remove the square brackets and single quotes
-    return entry  # If it's not a string, return it as is
+def extract_housing_id(url):
+    pattern = r"(?<=/)(h\d+-[a-zA-Z-]+)(?=/|$)"
+    match = re.search(pattern, url)
+    return match.group(0) if match else None
+
+def listing_detail_urls(hrefs):
+    """Detail page URLs of the listing links, without duplicates, in page order."""
+    unique_ids = []
+    seen = set()
+    for id in (extract_housing_id(url) for url in hrefs):
+        if id and id not in seen:
+            unique_ids.append(id)
+            seen.add(id)
+    return [f"https://househunting.nl/woningaanbod/{id}/" for id in unique_ids]
+
+# Form fields holding the page number in the load-more requests
+PAGE_KEYS = ('page', 'paged', 'current_page', 'currentpage')
+
+def load_more_endpoint(selector, page_url):
+    """Find the backend the 'Show more' button calls from its attributes.
+
+    Returns {'url': ..., 'formdata': {...} or None} for a POST to the AJAX
+    handler or a GET of the next page, or None if it cannot be determined."""
+    button = selector.css('.load_more')
+    if not button:
+        return None
+    attrs = button[0].attrib
+    href = attrs.get('href') or attrs.get('data-url') or attrs.get('data-href')
+    if href and not href.startswith(('#', 'javascript')):
+        return {'url': urljoin(page_url, href), 'formdata': None}
+
+    formdata = {key[5:]: value for key, value in attrs.items()
+                if key.startswith('data-') and key not in ('data-url', 'data-href')}
+    if 'action' not in formdata:
+        return None
+    # WordPress exposes its AJAX handler in an inline script, without it we do
+    # not guess and let the spider fall back to Selenium
+    scripts = ' '.join(selector.css('script::text').getall())
+    match = re.search(r'ajax_?url["\']?\s*[:=]\s*["\']([^"\']+)', scripts, re.IGNORECASE)
+    if not match:
+        return None
+    return {'url': urljoin(page_url, match.group(1).replace('\\/', '/')), 'formdata': formdata}
+
+def next_page_formdata(formdata, page):
+    formdata = dict(formdata)
+    keys = [key for key in PAGE_KEYS if key in formdata] or ['page']
+    for key in keys:
+        formdata[key] = str(page)
+    return formdata
+
+def fragment_selector(response):
+    """Selector of the listings HTML returned by the load-more backend (HTML or JSON)."""
+    try:
+        data = json.loads(response.text)
+    except ValueError:
+        return Selector(text=response.text)
+    if isinstance(data, dict):
+        data = data.get('data', data)
+    if isinstance(data, dict):
+        data = next((data[key] for key in ('html', 'content', 'posts', 'listings') if key in data), '')
+    return Selector(text=data if isinstance(data, str) else '')
 
 class HousehuntingSpider(scrapy.Spider):
     name = "hunting"
@@ -59,46 +118,128 @@ class HousehuntingSpider(scrapy.Spider):
         'AUTOTHROTTLE_START_DELAY': 1,
         'AUTOTHROTTLE_MAX_DELAY': 5,
         'DOWNLOADER_MIDDLEWARES': {
-        "scrapy_selenium.SeleniumMiddleware": 800
+        "pararius_all.middlewares.BrowserPoolMiddleware": 800
         },
-        'SELENIUM_DRIVER_NAME' : 'chrome',
-        'SELENIUM_DRIVER_ARGUMENTS' : ["--headless=new"],
+        # Only the listing links are read, the page does not even need its CSS
+        'BROWSER_BLOCKED_RESOURCES': ['image', 'media', 'font', 'stylesheet', 'tracker', 'map'],
     }
 
     def __init__(self, *args, **kwargs):
         super(HousehuntingSpider, self).__init__(*args, **kwargs)
-        self.existing_urls = self.load_existing_urls()
         self.max_pages = 50
         self.page_count = 0
-        self.logger.info(f"Loaded {len(self.existing_urls)} existing URLs from CSV")
 
 
     def load_existing_urls(self):
-        csv_file = 'hunting_listings.csv'
-        if os.path.exists(csv_file):
-            urls = set()
-            for chunk in pd.read_csv(csv_file, chunksize=1000, usecols=['url']):
-                chunk['url'] = chunk['url'].apply(clean_entry)
-                urls.update(chunk['url'].dropna().tolist())
-            return urls
-        return set()
-
-    # Start URLs now use SeleniumRequest to properly initialize Selenium
+        index_path = self.settings.get('SEEN_URL_INDEX', SEEN_URL_INDEX_FILE)
+        return load_seen_urls(self.name, index_path)
+
+    # Listings are discovered over plain HTTP through the load-more backend,
+    # Selenium is only used when that backend cannot be found
     def start_requests(self):
+        self.existing_urls = self.load_existing_urls()
+        self.logger.info(f"Loaded {len(self.existing_urls)} existing URLs from the seen-URL index")
+        self.discovered = set()
+        use_http = self.settings.get('HUNTING_DISCOVERY', 'http') == 'http'
         for url in self.start_urls:  # Replace with your actual URL
-            yield SeleniumRequest(
-                url=url,
-                callback=self.parse,
-                wait_time=2,  # Optional: default wait time for the Selenium middleware to wait for the initial page load
-                screenshot=False  # Set True if you want a screenshot saved in response meta
-            )
-
-    def parse(self, response):
+            if use_http:
+                yield Request(url, callback=self.parse_http, errback=self.discovery_failed)
+            else:
+                yield self.selenium_request(url)
+
+    def selenium_request(self, url):
+        return SeleniumRequest(
+            url=url,
+            callback=self.parse,
+            wait_time=2,  # Optional: default wait time for the Selenium middleware to wait for the initial page load
+            screenshot=False,  # Set True if you want a screenshot saved in response meta
+            dont_filter=True
+        )
+
+    def discovery_failed(self, failure):
+        self.logger.warning(f"Plain HTTP discovery failed ({failure.getErrorMessage()}), falling back to Selenium")
+        yield self.selenium_request(self.start_urls[0])
+
+    def new_listing_requests(self, hrefs):
+        """Requests for the detail pages not discovered or scraped before."""
+        requests = []
+        for url in listing_detail_urls(hrefs):
+            if url not in self.discovered:
+                self.discovered.add(url)
+                if url not in self.existing_urls:
+                    requests.append(Request(url, callback=self.parse_listing))
+        return requests
+
+    def load_more_request(self, endpoint, page):
+        if endpoint['formdata'] is None:
+            return Request(endpoint['url'], callback=self.parse_load_more, errback=self.discovery_failed,
+                           cb_kwargs={'endpoint': endpoint, 'page': page})
+        return FormRequest(endpoint['url'], formdata=next_page_formdata(endpoint['formdata'], page),
+                           callback=self.parse_load_more, errback=self.discovery_failed,
+                           cb_kwargs={'endpoint': endpoint, 'page': page}, dont_filter=True)
+
+    def parse_http(self, response):
+        hrefs = response.css("li.location a::attr(href)").getall()
+        endpoint = load_more_endpoint(response, response.url)
+        if not hrefs or (response.css('.load_more') and endpoint is None):
+            self.logger.info("Listings or load-more backend not found over plain HTTP, falling back to Selenium")
+            yield self.selenium_request(response.url)
+            return
+
+        self.logger.info(f"Found {len(hrefs)} listings on the first page")
+        yield from self.new_listing_requests(hrefs)
+        if endpoint:
+            yield self.load_more_request(endpoint, 2)
+
+    def parse_load_more(self, response, endpoint, page):
+        self.page_count = page
+        selector = fragment_selector(response)
+        discovered = len(self.discovered)
+        yield from self.new_listing_requests(selector.css("li.location a::attr(href)").getall())
+        self.logger.info(f"Load-more page {page}: {len(self.discovered) - discovered} more listings, {len(self.discovered)} in total")
+
+        # Stop once a page brings no listing we did not see yet, like the Selenium loop
+        if len(self.discovered) == discovered:
+            self.logger.info("No more listings returned by the load-more backend.")
+            return
+        if page >= self.max_pages:
+            self.logger.info(f"Reached maximum page limit: {self.max_pages}")
+            return
+        # A next page link comes with the fragment, an AJAX handler only needs the next page number
+        next_endpoint = load_more_endpoint(selector, response.url)
+        if next_endpoint is None and endpoint['formdata'] is None:
+            self.logger.info("No more 'Show more' link returned.")
+            return
+        yield self.load_more_request(next_endpoint or endpoint, page + 1)
+
+    async def parse(self, response):
         self.logger.info("Opening page with Selenium: %s", response.url)
         driver = response.meta["driver"]
 
+        # The clicks and waits block, keep them off the reactor thread
+        page_source = await in_browser_thread(self.load_all_listings, driver)
+
+        # Get final updated content
+        sel = Selector(text=page_source)
+        listings = sel.css("li.location a::attr(href)").getall()
+
+        # Unique housing IDs reformatted into the detail page URLs
+        formatted_urls = listing_detail_urls(listings)
+
+
+        print('\nNumber of Listings SCPY:', len(listings))
+        print('\nNumber of Listings Formatted:\n', len(formatted_urls))
+        for url in formatted_urls:
+            if url not in self.existing_urls:
+                yield Request(url, callback=self.parse_listing)
+
+    def load_all_listings(self, driver):
+        """Click 'Show more' until every listing is loaded and return the page source.
+        Runs in the browser thread pool."""
+        waits = BrowserWaits.from_spider(self, driver)
+
         consecutive_no_change = 0
-        previous_count = 0
+        previous_count = len(driver.find_elements(By.CSS_SELECTOR, "li.location a"))
 
         # Keep clicking until button disappears or no new listings are loaded
         while True:
@@ -111,13 +252,11 @@ class HousehuntingSpider(scrapy.Spider):
             driver.execute_script("arguments[0].click();", buttons[0])
             self.logger.info("Clicked 'Show more' via JS")
             
-            # Short wait for content to load
-            time.sleep(5)
-            
-            # Get updated content count
-            sel = Selector(text=driver.page_source)
-            listings_scpy = sel.css("li.location a::attr(href)").getall()
-            current_count = len(listings_scpy)
+            # Wait until the new listings are in the DOM
+            try:
+                current_count = waits.until('load_more', listing_count_changed("li.location a", previous_count))
+            except TimeoutException:
+                current_count = previous_count
             
             if current_count == previous_count:
                 consecutive_no_change += 1
@@ -132,37 +271,12 @@ class HousehuntingSpider(scrapy.Spider):
 
         # Final scroll to trigger any lazy-loaded content
         ActionChains(driver).scroll_by_amount(0, 3000).perform()
-        time.sleep(1)
-
-        # Get final updated content
-        sel = Selector(text=driver.page_source)
-        listings = sel.css("li.location a::attr(href)").getall()
-
-        def extract_housing_id(url):
-            pattern = r"(?<=/)(h\d+-[a-zA-Z-]+)(?=/|$)"
-            match = re.search(pattern, url)
-            return match.group(0) if match else None
-
-        # Apply the function to the list
-        housing_ids = [extract_housing_id(url) for url in listings]
-
-        # Remove duplicates while keeping the first occurrence
-        unique_ids = []
-        seen = set()
-        for id in housing_ids:
-            if id not in seen:
-                unique_ids.append(id)
-                seen.add(id)
-
-        # Reformat the unique IDs into the desired URL format
-        formatted_urls = [f"https://househunting.nl/woningaanbod/{id}/" for id in unique_ids]
-
+        try:
+            waits.until('scroll', network_idle(), timeout=2)
+        except TimeoutException:
+            self.logger.info("Page still loading after the final scroll, reading it anyway.")
 
-        print('\nNumber of Listings SCPY:', len(listings))
-        print('\nNumber of Listings Formatted:\n', len(formatted_urls))
-        for url in formatted_urls:
-            if url not in self.existing_urls:
-                yield Request(url, callback=self.parse_listing)
+        return driver.page_source
     
     # Dutch to English field mapping
     DETAILS_MAPPING = {
@@ -244,39 +358,5 @@ class HousehuntingSpider(scrapy.Spider):
         yield item
 
     def parse_description(self, text):
-        patterns = {
-            'gas_water_electricity_included': (
-                r'(gas/water/electricity|g/w/e|utilities|GWE)\s*(?:are|is)?\s*(not\s+included|excluding|excluded)?',
-                lambda m: False if m and m.group(2) else True
-            ),
-            'service_costs': (
-                r'(?:service\s*costs?|monthly\s+prepayment\s+service\s+cost)[\s:]*€\s*([\d,.]+)',
-                lambda m: int(float(m.group(1).replace(',', ''))) if m else None
-            ),
-            'minimum_income': (
-                r'(?:income|salary).*?(?:requires?|requirement).*?(\d+)\s*(?:times|months?)',
-                lambda m: int(m.group(1)) if m else None
-            ),
-            'minimal_rent_period': (
-                r'rental period minimal (\d+) months?',
-                lambda m: int(m.group(1)) if m else None
-            ),
-            'pets': (
-                r'no pets allowed',
-                lambda m: False if m else None
-            ),
-            'smoking': (
-                r'no smoking allowed',
-                lambda m: False if m else None
-            )
-        }
-
-        results = {}
-        for key, (pattern, processor) in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    results[key] = processor(match)
-                except Exception as e:
-                    logging.error(f"Error processing {key}: {e}")
-        return results
\ No newline at end of file
+        # Precompiled rules, the description is scanned once (see pararius_all/extractors.py)
+        return HUNTING_DESCRIPTION.extract(text)
\ No newline at end of file
@@ -1,12 +1,18 @@
-from httpcore import TimeoutException
 import scrapy
+from scrapy import Selector
 from scrapy_selenium import SeleniumRequest
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from pararius_all.browser import BrowserWaits, in_browser_thread, document_ready, in_viewport
+from pararius_all.form_submit import (contact_form, contact_form_request, is_confirmation, profile_mismatches,
+                                     request_cookies)
+from pararius_all.session_store import SessionStore, capture_session, restore_session
 import logging
-import time
 import random
+import re
+from datetime import date
 
 # Configure the root logger
 logging.basicConfig(
@@ -20,30 +26,74 @@ logging.getLogger('scrapy').propagate = False
 logging.getLogger('selenium').propagate = False
 logging.getLogger('urllib3').propagate = False
 
+# Values Pararius prefills in the contact form from your profile, checked before any
+# submission: the text of the selected option for the salutation, else the field value
+EXPECTED_PROFILE = {
+    'salutation': 'Select_Gender',  # Adjust these based on your form
+    'first_name': 'MY_FIRST_NAME',
+    'last_name': 'My_Last_Name',
+    'phone_number': '9999999',
+    'date_of_birth': 'AAAA-BB-CC',
+}
+
+# Token bucket of the submissions made with the Pararius account
+RATE_LIMIT_KEY = 'pararius_account'
+
+
+def offered_date(value):
+    """Date of an Offered_Since value (a date from the listing store, or dd-mm-yyyy text),
+    None when missing or unreadable."""
+    if isinstance(value, date):
+        return value
+    match = re.search(r'(\d{2})-(\d{2})-(\d{4})', str(value)) if value else None
+    if not match:
+        return None
+    day, month, year = (int(g) for g in match.groups())
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def by_freshness(rows):
+    """Rows sorted newest listing first: by offer date, then in crawl order."""
+    def offered(indexed):
+        index, row = indexed
+        day = offered_date(row.get('Offered_Since'))
+        return (-(day.toordinal() if day else 0), index)
+    return [row for _, row in sorted(enumerate(rows), key=offered)]
+
 class ParLoginSpider(scrapy.Spider):
     name = "par_login"
     allowed_domains = ["pararius.com"]
     start_urls = ['https://www.pararius.com/login-email']
 
+    # The forms are fetched concurrently, the submissions themselves are
+    # paced by the token bucket of the account (FORM_SUBMIT_RATE / _BURST)
     custom_settings = {
-        'DOWNLOAD_DELAY': 2,
-        'AUTOTHROTTLE_ENABLED': True,
-        'AUTOTHROTTLE_START_DELAY': 1,
-        'AUTOTHROTTLE_MAX_DELAY': 5,
+        'DOWNLOAD_DELAY': 0,
+        'AUTOTHROTTLE_ENABLED': False,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
         'DOWNLOADER_MIDDLEWARES': {
-        "scrapy_selenium.SeleniumMiddleware": 800
+        "pararius_all.middlewares.TokenBucketMiddleware": 700,
+        "pararius_all.middlewares.BrowserPoolMiddleware": 800
         },
-        'SELENIUM_DRIVER_NAME' : 'chrome',
-        'SELENIUM_DRIVER_ARGUMENTS' : ["--headless=new"],
+        # The visibility and clickability checks of the form need the stylesheets
+        'BROWSER_BLOCKED_RESOURCES': ['image', 'media', 'font', 'tracker', 'map'],
     }
 
     def __init__(self, rows=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.rows = rows or []
+        self.pending_rows = []
         self.processed_rows = []
+        self.browser_busy = False
+        self.driver = None
+        self.priorities = {}
 
     def start_requests(self):
         """Start the request using Selenium"""
+        self.sessions = SessionStore.from_settings(self.settings)
         for url in self.start_urls:
 
             yield SeleniumRequest(
@@ -54,11 +104,65 @@ class ParLoginSpider(scrapy.Spider):
             )
 
 
-    def handle_login(self, response):
+    async def handle_login(self, response):
         """Perform login with persistent session"""
 
         driver = response.request.meta['driver']
         rows = response.meta['rows']
+
+        # The browser steps block, keep them off the reactor thread
+        reused, session = await in_browser_thread(self.authenticate, driver)
+        self.crawler.stats.inc_value('par_login/session_reused' if reused else 'par_login/full_login')
+
+        self.driver = driver
+        # The newest listings are contacted first
+        rows = by_freshness(rows)
+        self.priorities = {row['Form_link']: len(rows) - rank for rank, row in enumerate(rows)}
+        if self.settings.get('PARARIUS_FORM_SUBMISSION', 'http') == 'http':
+            # Post the forms with the session cookies, the browser is only a fallback
+            cookies = request_cookies(session)
+            for row in rows:
+                yield self.form_http_request(row, cookies)
+            return
+
+        # Process the listing forms one after the other: each submission
+        # requests the next form once its confirmation (or failure) is in
+        self.pending_rows = rows
+        request = self.next_form_request(driver)
+        if request:
+            yield request
+
+    def authenticate(self, driver):
+        """Reuse the saved session while it is valid, else log in and save the new one.
+        Returns whether the saved session was reused, and the current session.
+        Runs in the browser thread pool."""
+        session = self.sessions.load()
+        if session is not None:
+            restore_session(driver, session)
+            if self.is_logged_in(driver):
+                self.logger.info("✅ Reusing the saved login session")
+                return True, capture_session(driver)
+            self.logger.info("Saved login session no longer valid, logging in again")
+            self.sessions.clear()
+            driver.get(self.start_urls[0])
+        self.login(driver)
+        session = capture_session(driver)
+        self.sessions.save(session)
+        return False, session
+
+    def is_logged_in(self, driver):
+        """Cheap session check: a logged-in user does not get the login form any more."""
+        waits = BrowserWaits.from_spider(self, driver)
+        driver.get(self.start_urls[0])
+        try:
+            waits.until('session_check', document_ready, timeout=5)
+        except TimeoutException:
+            return False
+        return not driver.find_elements(By.NAME, 'email')
+
+    def login(self, driver):
+        """Fill and submit the login form. Runs in the browser thread pool."""
+        waits = BrowserWaits.from_spider(self, driver)
         print('Handling login')
         try:
             # Try to dismiss any overlays/cookie banners first
@@ -114,35 +218,10 @@ class ParLoginSpider(scrapy.Spider):
 
             # Wait for successful login confirmation
             try:
-                WebDriverWait(driver, 15).until(
-                    lambda d: 'Almost done' in d.page_source or 
+                waits.until('login', lambda d: 'Almost done' in d.page_source or
                             'Welcome' in d.page_source or
-                            'Dashboard' in d.page_source
-                )
+                            'Dashboard' in d.page_source, timeout=15)
                 self.logger.info("✅ Login successful!")
-                
-                # Process each listing form
-                for row in rows:
-                    self.logger.info(f"Processing form for listing: {row['Title']}\n")
-                    self.logger.info(f"Processing form for listing: {row['Form_link']}")
-                    
-                    # Create the SeleniumRequest
-                    request = SeleniumRequest(
-                        url=row['Form_link'],
-                        callback=self.handle_form_submission,
-                        meta={
-                            'driver': driver,
-                            'row': row  # Pass both driver and row data
-                        },
-                        dont_filter=True
-                    )
-                    
-                    # Yield the request and wait for it to complete
-                    yield request
-                    
-                    # Add a 10-second delay before the next request
-                    self.logger.info("Waiting for 10 seconds before the next request...")
-                    time.sleep(10)
 
             except TimeoutException:
                 # Check if login actually failed
@@ -157,26 +236,147 @@ class ParLoginSpider(scrapy.Spider):
             self.logger.error(f"❌ Login process failed: {str(e)}")
             driver.save_screenshot('login_error.png')
             raise
-    def handle_form_submission(self, response):
+    def form_http_request(self, row, cookies):
+        self.logger.info(f"Processing form for listing over HTTP: {row['Form_link']}")
+        return scrapy.Request(
+            row['Form_link'],
+            cookies=cookies,
+            callback=self.submit_form_http,
+            errback=self.form_page_failed,
+            cb_kwargs={'row': row},
+            priority=self.priorities[row['Form_link']],
+            dont_filter=True
+        )
+
+    def submit_form_http(self, response, row):
+        """Check the prefilled profile of the form page and post the form with the motivation."""
+        form = contact_form(response)
+        if form is None:
+            # Login page or changed layout: nothing was posted, the browser can take over
+            self.logger.warning(f"No contact form over HTTP for {row['Title']}, using the browser")
+            yield from self.fall_back_to_browser(row)
+            return
+        if not self.profile_matches(form):
+            return
+        yield contact_form_request(
+            response,
+            self.motivation_text(row),
+            callback=self.form_http_submitted,
+            errback=self.form_post_failed,
+            cb_kwargs={'row': row},
+            priority=response.request.priority,
+            meta={'rate_limit_key': RATE_LIMIT_KEY}
+        )
+
+    def form_http_submitted(self, response, row):
+        if is_confirmation(response):
+            self.processed_rows.append(row['Title'])
+            self.crawler.stats.inc_value('par_login/http_submissions')
+            self.logger.info(f"Submission confirmation received for: {row['Title']}")
+        else:
+            self.crawler.stats.inc_value('par_login/http_unconfirmed')
+            self.logger.error(f"No submission confirmation for: {row['Title']}, see submission_error.html")
+            with open('submission_error.html', 'wb') as f:
+                f.write(response.body)
+
+    def form_page_failed(self, failure):
+        row = failure.request.cb_kwargs['row']
+        self.logger.warning(f"Form page failed over HTTP ({failure.getErrorMessage()}), using the browser")
+        yield from self.fall_back_to_browser(row)
+
+    def form_post_failed(self, failure):
+        # The post may have reached Pararius: do not submit it a second time
+        row = failure.request.cb_kwargs['row']
+        self.crawler.stats.inc_value('par_login/http_unconfirmed')
+        self.logger.error(f"Submission failed for {row['Title']}: {failure.getErrorMessage()}")
+
+    def fall_back_to_browser(self, row):
+        """Queue a form for the Selenium submitter, starting it if it is idle."""
+        self.crawler.stats.inc_value('par_login/browser_fallbacks')
+        self.pending_rows.append(row)
+        self.pending_rows.sort(key=lambda r: -self.priorities[r['Form_link']])
+        if not self.browser_busy:
+            request = self.next_form_request(self.driver)
+            if request:
+                yield request
+
+    def next_form_request(self, driver):
+        """SeleniumRequest of the next listing form, or None when all are done."""
+        self.browser_busy = bool(self.pending_rows)
+        if not self.pending_rows:
+            return None
+        row = self.pending_rows.pop(0)
+        self.logger.info(f"Processing form for listing: {row['Title']}\n")
+        self.logger.info(f"Processing form for listing: {row['Form_link']}")
+        return SeleniumRequest(
+            url=row['Form_link'],
+            callback=self.handle_form_submission,
+            meta={
+                'driver': driver,
+                'row': row,  # Pass both driver and row data
+                'rate_limit_key': RATE_LIMIT_KEY  # The browser submits the form it loads
+            },
+            priority=self.priorities.get(row['Form_link'], 0),
+            dont_filter=True
+        )
+
+    async def handle_form_submission(self, response):
         """Handle form interaction and submission"""
 
         driver = response.request.meta['driver']
         row = response.request.meta['row']
+
+        try:
+            await in_browser_thread(self.submit_form, driver, row)
+        finally:
+            # Store successful submission
+            self.processed_rows.append(row['Title'])
+            self.logger.info(f"Submitted form for listing {row['Title']}")
+
+            # Only now move on to the next listing form
+            request = self.next_form_request(driver)
+            if request:
+                yield request
+
+    def motivation_text(self, row):
         motivation_template_file = 'Your_Motivation_Template.txt' # Ensure the template file exists
+        with open(motivation_template_file, 'r') as f:
+            motivation_template = f.read()
+
+        row_data = {k: ("" if v is None else v) for k, v in row.items()}
+        return motivation_template.format(**row_data)
+
+    def profile_matches(self, form):
+        """Check the prefilled fields of a contact form against EXPECTED_PROFILE."""
+        if form is None:
+            self.logger.error("❌ Contact form not found on the page")
+            return False
+        mismatches = profile_mismatches(form, EXPECTED_PROFILE)
+        for name, expected, found in mismatches:
+            self.logger.error(f"❌ {name} is not set to '{expected}'. Found: {found}")
+        if not mismatches:
+            self.logger.info("✅ Prefilled profile fields are correct")
+        return not mismatches
+
+    def submit_form(self, driver, row):
+        """Fill, check and submit one listing form. Runs in the browser thread pool."""
+        waits = BrowserWaits.from_spider(self, driver)
 
         try:
-            with open(motivation_template_file, 'r') as f:
-                motivation_template = f.read()
+            if driver.find_elements(By.NAME, 'email'):
+                # The reused session expired since the start of the run
+                self.logger.info("Login session expired, logging in again")
+                self.sessions.clear()
+                self.login(driver)
+                self.sessions.save(capture_session(driver))
+                driver.get(row['Form_link'])
 
-            row_data = {k: ("" if v is None else v) for k, v in row.items()}
-            motivation_text = motivation_template.format(**row_data)
+            motivation_text = self.motivation_text(row)
 
             # Fill the motivation textarea
-            textarea = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.NAME, 'contact_agent_huurprofiel_form[motivation]')
-                )
-            )
+            textarea = waits.until('form_ready', EC.presence_of_element_located(
+                (By.NAME, 'contact_agent_huurprofiel_form[motivation]')
+            ))
             textarea.clear()  # Clear existing text
             textarea.send_keys(motivation_text)  # Add new text
 
@@ -187,53 +387,13 @@ class ParLoginSpider(scrapy.Spider):
                 self.logger.error("❌ Motivation text was not added.")
                 return
     	    
-            # Verify salutation (selected="selected">Sir</option>)
-            salutation_select = driver.find_element(By.NAME, 'contact_agent_huurprofiel_form[salutation]')
-            selected_option = salutation_select.find_element(By.CSS_SELECTOR, 'option[selected="selected"]')
-            if selected_option.text.strip() == 'Select_Gender': # Adjust this based on your form
-                self.logger.info("✅ Salutation is correctly set to 'Select_Gender'")
-            else:
-                self.logger.error(f"❌ Salutation is not set to 'Sir'. Found: {selected_option.text}")
+            # Verify the fields Pararius prefilled from the profile
+            if not self.profile_matches(contact_form(Selector(text=driver.page_source))):
                 return
 
-            # Verify first name (value='XXXXXX')
-            first_name_input = driver.find_element(By.NAME, 'contact_agent_huurprofiel_form[first_name]')
-            if first_name_input.get_attribute('value') == 'MY_FIRST_NAME': # Adjust this based on your form
-                self.logger.info("✅ First name is correctly set to 'MY_FIRST_NAME'")
-            else:
-                self.logger.error(f"❌ First name is not set to 'MY_FIRST_NAME'. Found: {first_name_input.get_attribute('value')}")
-                return
-
-            # Verify last name (value='XXXXXXX')
-            last_name_input = driver.find_element(By.NAME, 'contact_agent_huurprofiel_form[last_name]')
-            if last_name_input.get_attribute('value') == 'My_Last_Name': # Adjust this based on your form
-                self.logger.info("✅ Last name is correctly set to 'My_Last_Name'")
-            else:
-                self.logger.error(f"❌ Last name is not set to 'My_Last_Name'. Found: {last_name_input.get_attribute('value')}")
-                return
-
-            # Verify phone number (value='9999999')
-            phone_number_input = driver.find_element(By.NAME, 'contact_agent_huurprofiel_form[phone_number]')
-            if phone_number_input.get_attribute('value') == '9999999': # Adjust this based on your form
-                self.logger.info("✅ Phone number is correctly set to '9999999'")
-            else:
-                self.logger.error(f"❌ Phone number is not set to '9999999'. Found: {phone_number_input.get_attribute('value')}")
-                return
-
-            # Verify date of birth (value='AAAA-BB-CC')
-            date_of_birth_input = driver.find_element(By.NAME, 'contact_agent_huurprofiel_form[date_of_birth]')
-            if date_of_birth_input.get_attribute('value') == 'AAAA-BB-CC': # Adjust this based on your form
-                self.logger.info("✅ Date of birth is correctly set to 'AAAA-BB-CC'")
-            else:
-                self.logger.error(f"❌ Date of birth is not set to 'AAAA-BB-CC'. Found: {date_of_birth_input.get_attribute('value')}")
-                return
-            
-
-            submit_button = WebDriverWait(driver, 15).until(
-                EC.element_to_be_clickable(
-                    (By.CSS_SELECTOR, 'button.form__button--submit.form__button--submit-normal')
-                )
-            )
+            submit_button = waits.until('submit_clickable', EC.element_to_be_clickable(
+                (By.CSS_SELECTOR, 'button.form__button--submit.form__button--submit-normal')
+            ), timeout=15)
 
             
             if not submit_button.is_displayed():
@@ -246,16 +406,17 @@ class ParLoginSpider(scrapy.Spider):
 
             
             driver.execute_script("arguments[0].scrollIntoView(true);", submit_button)
-            time.sleep(1)  # Allow for scroll completion
+            try:
+                waits.until('scroll', in_viewport(submit_button), timeout=2)  # Allow for scroll completion
+            except TimeoutException:
+                self.logger.warning("Submit button not fully in view, clicking anyway")
             submit_button.click()
             self.logger.info(f"Form submitted for: {row['Title']}, be alert final check is incoming!!")
 
             
-            WebDriverWait(driver, 20).until(
-                EC.visibility_of_element_located(
-                    (By.XPATH, '//*[contains(text(), "Your request has been sent")]')
-                )
-            )
+            waits.until('confirmation', EC.visibility_of_element_located(
+                (By.XPATH, '//*[contains(text(), "Your request has been sent")]')
+            ), timeout=20)
             self.logger.info("Submission confirmation received")
 
         except TimeoutException:
@@ -267,11 +428,10 @@ class ParLoginSpider(scrapy.Spider):
         finally:
             # 6. Reset browser state
             driver.refresh()  # Refresh the current page
-            time.sleep(3)  # Cleanup pause
-
-            # Store successful submission
-            self.processed_rows.append(row['Title'])
-            self.logger.info(f"Submitted form for listing {row['Title']}")
+            try:
+                waits.until('refresh', document_ready, timeout=3)
+            except TimeoutException:
+                self.logger.warning("Page not ready after refresh")
 
     def closed(self, reason):
         """Final cleanup"""
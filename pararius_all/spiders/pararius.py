@@ -1,10 +1,52 @@
 import logging
+import re
 import scrapy
 from scrapy import Request
 from scrapy.loader import ItemLoader
+from pararius_all.extractors import definition_terms, term_values
 from pararius_all.items import ParariusItem
-import pandas as pd
-import os
+from pararius_all.pagination import EarlyStopPolicy, PageFanOut, last_page_link, page_link
+from pararius_all.url_index import SEEN_URL_INDEX_FILE, load_seen_urls
+
+# Page number in the path of a results page URL
+PAGE_NUMBER = r'/page-(\d+)'
+
+# Parts of a listing-features <dd>
+MAIN = 'span.listing-features__main-description::text'
+MAIN_LIST = 'ul.listing-features__main-description li::text'
+SUB_LIST = 'ul.listing-features__sub-description li::text'
+
+# Field -> text contained in the <dt> label (every matching row is read), part of its <dd>, regex
+FEATURE_FIELDS = [
+    ('Rent_Price', 'Rental price', MAIN, re.compile(r'€\s*([\d.,]+)')),
+    ('Offered_Since', 'Offered since', MAIN, re.compile(r'(\d{2}-\d{2}-\d{4})')),
+    ('Status', 'Status', MAIN, None),
+    ('Available_From', 'Available', MAIN, re.compile(r'(?:From\s*)?(\d{2}-\d{2}-\d{4}|Immediately)')),
+    ('Contract_Type', 'Rental agreement', MAIN, None),
+    ('Deposit', 'Deposit', MAIN, re.compile(r'€\s*([\d.,]+)')),
+    ('Interior', 'Interior', MAIN, None),
+    ('Upkeep', 'Upkeep', MAIN, None),
+    ('Service_Costs', 'Rental price', SUB_LIST, re.compile(r'(Includes|Excludes):\s*(.*)')),
+    ('Living_Area', 'Living area', MAIN, re.compile(r'(\d+)\s*m²')),
+    ('House_Type', 'Type of house', MAIN, None),
+    ('Construction_Type', 'Type of construction', MAIN, None),
+    ('Construction_Year', 'Year of construction', MAIN, re.compile(r'(\d{4})')),
+    ('Location', 'Location', MAIN_LIST, None),
+    ('Number_of_Rooms', 'Number of rooms', MAIN, None),
+    ('Number_of_Bathrooms', 'Number of bathrooms', MAIN, None),
+    ('Number_of_Floors', 'Number of floors', MAIN, None),
+    ('Facilities', 'Facilities', MAIN_LIST, None),
+    ('Balcony', 'Balcony', MAIN, None),
+    ('Garden', 'Garden', MAIN, None),
+    ('Energy_Rating', 'Energy rating', MAIN, None),
+    ('Shed_Storeroom', 'Shed/Storeroom', MAIN, None),
+    # "Present" is listed under both Parking and Garage, both fields get every row
+    ('Parking_Present', 'Present', MAIN, None),
+    ('Parking_Type', 'Type of parking', MAIN, None),
+    ('Garage_Present', 'Present', MAIN, None),
+    ('Smoking_Allowed', 'Smoking allowed', MAIN, None),
+    ('Pets_Allowed', 'Pets allowed', MAIN, None),
+]
 
 class ParariusSpider(scrapy.Spider):
     name = "pararius"
@@ -19,22 +61,20 @@ class ParariusSpider(scrapy.Spider):
 
     def __init__(self, *args, **kwargs):
         super(ParariusSpider, self).__init__(*args, **kwargs)
-        self.existing_urls = self.load_existing_urls()
         self.max_pages = 50
         self.page_count = 0
-        self.logger.info(f"Loaded {len(self.existing_urls)} existing URLs from CSV")
 
     def load_existing_urls(self):
-        csv_file = 'pararius_listings.csv'
-        if os.path.exists(csv_file):
-            urls = set()
-            for chunk in pd.read_csv(csv_file, chunksize=1000, usecols=['URL']):
-                chunk['URL'] = chunk['URL'].apply(clean_entry)
-                urls.update(chunk['URL'].dropna().tolist())
-            return urls
-        return set()
+        index_path = self.settings.get('SEEN_URL_INDEX', SEEN_URL_INDEX_FILE)
+        return load_seen_urls(self.name, index_path)
 
     def start_requests(self):
+        self.existing_urls = self.load_existing_urls()
+        self.logger.info(f"Loaded {len(self.existing_urls)} existing URLs from the seen-URL index")
+        # Pages of known listings can end the crawl early if EARLY_STOP_PAGES is set
+        self.pagination = EarlyStopPolicy.from_spider(self, self.max_pages)
+        self.fanout = None
+        self.last_page_link = None
         headers = {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
@@ -44,23 +84,45 @@ class ParariusSpider(scrapy.Spider):
             yield Request(url, headers=headers, callback=self.parse)
 
     
-    def parse(self, response):
+    def parse(self, response, page=1):
         self.page_count += 1
-        if self.page_count > self.max_pages:
-            self.logger.info(f"Reached maximum page limit: {self.max_pages}")
-            return
 
         # Extract listings
         listings = response.css('a.listing-search-item__link--depiction::attr(href)').getall()
         self.logger.info(f"Found {len(listings)} listings on page {self.page_count}")
 
+        unseen = 0
         for listing in listings:
             url = listing.strip()
             if url:
                 full_url = response.urljoin(url)
                 if full_url not in self.existing_urls:
+                    unseen += 1
                     yield Request(full_url, callback=self.parse_listing)
 
+        # Request the following pages ahead when the first one tells how many there are
+        if page == 1:
+            page_links = [response.urljoin(href) for href in response.css('a.pagination__link::attr(href)').getall()]
+            last_page, self.last_page_link = last_page_link(page_links, PAGE_NUMBER)
+            if last_page:
+                self.fanout = PageFanOut.from_spider(self, self.pagination, last_page)
+        if self.fanout:
+            stopped = self.fanout.stopped
+            for next_page in self.fanout.page_parsed(page, unseen):
+                next_url = page_link(self.last_page_link, PAGE_NUMBER, next_page)
+                self.logger.info(f"Requesting page {next_page}: {next_url}")
+                yield Request(next_url, callback=self.parse, cb_kwargs={'page': next_page})
+            if self.fanout.stopped and not stopped:
+                self.logger.info(self.pagination.stop_reason())
+            return
+
+        # Otherwise follow the next links one page at a time
+        self.pagination.record_page(unseen)
+        stop_reason = self.pagination.stop_reason()
+        if stop_reason:
+            self.logger.info(stop_reason)
+            return
+
         # Extract next page
         next_page = response.css('li.pagination__item--next a.pagination__link--next::attr(href)').get()
         if next_page:
@@ -84,47 +146,10 @@ class ParariusSpider(scrapy.Spider):
         loader.add_css('Latitude', 'wc-detail-map::attr(data-latitude)')
         loader.add_css('Longitude', 'wc-detail-map::attr(data-longitude)')
 
-                # Extract additional details
-        # Existing rules with modifications
-        loader.add_css('Rent_Price', 'dt:contains("Rental price") + dd span.listing-features__main-description::text', re=r'€\s*([\d.,]+)')
-        loader.add_css('Offered_Since', 'dt:contains("Offered since") + dd span.listing-features__main-description::text', re=r'(\d{2}-\d{2}-\d{4})')
-        loader.add_css('Status', 'dt:contains("Status") + dd span.listing-features__main-description::text')
-        loader.add_css('Available_From', 'dt:contains("Available") + dd span.listing-features__main-description::text', re=r'(?:From\s*)?(\d{2}-\d{2}-\d{4}|Immediately)')
-        loader.add_css('Contract_Type', 'dt:contains("Rental agreement") + dd span.listing-features__main-description::text')
-        loader.add_css('Deposit', 'dt:contains("Deposit") + dd span.listing-features__main-description::text', re=r'€\s*([\d.,]+)')
-        loader.add_css('Interior', 'dt:contains("Interior") + dd span.listing-features__main-description::text')
-        # New additions for updated structure
-        loader.add_css('Upkeep', 'dt:contains("Upkeep") + dd span.listing-features__main-description::text')
-        loader.add_css('Service_Costs', 'dt:contains("Rental price") + dd ul.listing-features__sub-description li::text', re=r'(Includes|Excludes):\s*(.*)')
-        loader.add_css('Living_Area', 'dt:contains("Living area") + dd span.listing-features__main-description::text', re=r'(\d+)\s*m²')
-        # Extract Type of House
-        loader.add_css('House_Type', 'dt:contains("Type of house") + dd span.listing-features__main-description::text')
-        # Extract Type of Construction
-        loader.add_css('Construction_Type', 'dt:contains("Type of construction") + dd span.listing-features__main-description::text')
-        # Extract Year of Construction
-        loader.add_css('Construction_Year', 'dt:contains("Year of construction") + dd span.listing-features__main-description::text', re=r'(\d{4})')
-        # Extract Location (multiple items)
-        loader.add_css('Location', 'dt:contains("Location") + dd ul.listing-features__main-description li::text')
-        # Extract Number of Rooms
-        loader.add_css('Number_of_Rooms', 'dt:contains("Number of rooms") + dd span.listing-features__main-description::text')
-        # Extract Number of Bathrooms
-        loader.add_css('Number_of_Bathrooms', 'dt:contains("Number of bathrooms") + dd span.listing-features__main-description::text')
-        # Extract Number of Floors
-        loader.add_css('Number_of_Floors', 'dt:contains("Number of floors") + dd span.listing-features__main-description::text')
-        # Extract Facilities (multiple items)
-        loader.add_css('Facilities', 'dt:contains("Facilities") + dd ul.listing-features__main-description li::text')
-        # Extract Balcony information
-        loader.add_css('Balcony', 'dt:contains("Balcony") + dd span.listing-features__main-description::text')
-        # Extract Garden information
-        loader.add_css('Garden', 'dt:contains("Garden") + dd span.listing-features__main-description::text')
-        # Extract Energy Rating
-        loader.add_css('Energy_Rating', 'dt:contains("Energy rating") + dd span.listing-features__main-description::text')
-        loader.add_css('Shed_Storeroom', 'dt:contains("Shed/Storeroom") + dd span.listing-features__main-description::text')
-        loader.add_css('Parking_Present', 'dt:contains("Present") + dd span.listing-features__main-description::text')
-        loader.add_css('Parking_Type', 'dt:contains("Type of parking") + dd span.listing-features__main-description::text')	
-        loader.add_css('Garage_Present', 'dt:contains("Present") + dd span.listing-features__main-description::text')
-        loader.add_css('Smoking_Allowed', 'dt:contains("Smoking allowed") + dd span.listing-features__main-description::text')
-        loader.add_css('Pets_Allowed', 'dt:contains("Pets allowed") + dd span.listing-features__main-description::text')
+        # Extract additional details from the listing-features definition lists in one pass
+        terms = definition_terms(response)
+        for field, label, part, regex in FEATURE_FIELDS:
+            loader.add_value(field, term_values(terms, label, part), re=regex)
         # Load and validate item
         item = loader.load_item()
         
@@ -135,11 +160,3 @@ class ParariusSpider(scrapy.Spider):
                 raise ValueError(f"Missing required field: {field}")
         
         yield item
-
-
-
-
-def clean_entry(entry):
-    if isinstance(entry, str):
-        return entry.strip("[]'")  # Remove the square brackets and single quotes
-    return entry  # If it's not a string, return it as is
\ No newline at end of file
@@ -2,10 +2,40 @@ import logging
 import scrapy
 from scrapy import Request
 from scrapy.loader import ItemLoader
+from pararius_all.extractors import properties_table, regex_converter, table_text, text_converter
 from pararius_all.items import RotsvastItem
-import pandas as pd
-import os
-import re
+from pararius_all.pagination import EarlyStopPolicy, PageFanOut, last_page_link, page_link
+from pararius_all.url_index import SEEN_URL_INDEX_FILE, load_seen_urls
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# Page number in the query of a results page URL
+PAGE_NUMBER = r'[?&]page=(\d+)'
+
+to_euro = regex_converter(r'€\s*([\d.,]*\d)')
+to_date = regex_converter(r'(\d{2}-\d{2}-\d{4})')
+to_int = regex_converter(r'\b(\d+)\b')
+to_energy_label = regex_converter(r'\b([A-G])\b')
+to_yes_no = regex_converter(r'\b(Yes|No)\b')
+
+# RotsvastItem field -> label in the #properties block, elements of the value
+# holding the text (None for the whole value), value converter
+PROPERTY_FIELDS = [
+    ('Start_Date', 'Start date', None, to_date),
+    ('Total_Rent', 'Total rent', None, to_euro),
+    ('Service_Costs', 'Service costs', None, to_euro),
+    ('Utilities', 'Utilities', None, to_euro),
+    ('Deposit', 'Deposit', None, to_euro),
+    ('Other_Costs', 'Other costs', None, to_euro),
+    ('Transfer_Costs', 'Transfer costs', None, to_euro),
+    ('Energy_Label', 'Energy label', './/span[@class="energyLabel"]', to_energy_label),
+    ('Type', 'Type', None, text_converter),
+    ('Interior', 'Interior', None, text_converter),
+    ('Rooms', 'Rooms', None, to_int),
+    ('Bedrooms', 'Bedrooms', None, to_int),
+    ('Floor_Area', 'Floor area', None, to_int),
+    ('Smoking', 'Smoking', None, to_yes_no),
+    ('Pets', 'Pets', None, text_converter),
+]
 
 
 class RotsvastSpider(scrapy.Spider):
@@ -22,22 +52,19 @@ class RotsvastSpider(scrapy.Spider):
 
     def __init__(self, *args, **kwargs):
         super(RotsvastSpider, self).__init__(*args, **kwargs)
-        self.existing_urls = self.load_existing_urls()
         self.max_pages = 50
         self.page_count = 0
-        self.logger.info(f"Loaded {len(self.existing_urls)} existing URLs from CSV")
 
     def load_existing_urls(self):
-        csv_file = 'rotsvast_listings.csv'
-        if os.path.exists(csv_file):
-            urls = set()
-            for chunk in pd.read_csv(csv_file, chunksize=1000, usecols=['URL']):
-                chunk['URL'] = chunk['URL'].apply(clean_entry)
-                urls.update(chunk['URL'].dropna().tolist())
-            return urls
-        return set()
+        index_path = self.settings.get('SEEN_URL_INDEX', SEEN_URL_INDEX_FILE)
+        return load_seen_urls(self.name, index_path)
 
     def start_requests(self):
+        self.existing_urls = self.load_existing_urls()
+        self.logger.info(f"Loaded {len(self.existing_urls)} existing URLs from the seen-URL index")
+        self.pagination = EarlyStopPolicy.from_spider(self, self.max_pages)
+        self.fanout = None
+        self.last_page_link = None
         headers = {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
@@ -47,36 +74,61 @@ class RotsvastSpider(scrapy.Spider):
             yield Request(url, headers=headers, callback=self.parse)
 
     
-    def parse(self, response):
+    def parse(self, response, page=1):
+        self.page_count += 1
 
         # Extract listings
         listings = response.css('div.residence-gallery.clickable-parent.col-md-4 a::attr(href)').getall()
         self.logger.info(f"Found {len(listings)} listings on page {self.page_count}")
 
+        unseen = 0
         for listing in listings:
             url = listing.strip()
             if url:
                 full_url = response.urljoin(url)
                 if full_url not in self.existing_urls:
+                    unseen += 1
                     yield Request(full_url, callback=self.parse_listing)
-        
-        base_url = self.start_urls[0]
+
+        # Request the following pages ahead when the first one tells how many there are
+        if page == 1:
+            page_links = [self.results_url(response, href) for href in response.css('div.multipage a::attr(href)').getall()]
+            last_page, self.last_page_link = last_page_link(page_links, PAGE_NUMBER)
+            if last_page:
+                self.fanout = PageFanOut.from_spider(self, self.pagination, last_page)
+        if self.fanout:
+            stopped = self.fanout.stopped
+            for next_page in self.fanout.page_parsed(page, unseen):
+                next_url = page_link(self.last_page_link, PAGE_NUMBER, next_page)
+                self.logger.info(f"Requesting page {next_page}: {next_url}")
+                yield Request(next_url, callback=self.parse, cb_kwargs={'page': next_page})
+            if self.fanout.stopped and not stopped:
+                self.logger.info(self.pagination.stop_reason())
+            return
+
+        # Otherwise follow the next links one page at a time
+        self.pagination.record_page(unseen)
+        stop_reason = self.pagination.stop_reason()
+        if stop_reason:
+            self.logger.info(stop_reason)
+            return
+
         # Extract next page
         next_page_button = response.css('div.multipage a.next::attr(href)').get()
         if next_page_button:
-            if "page=" in base_url:
-                # Replace existing page parameter
-                next_url = re.sub(r"page=\d+", next_page_button.lstrip("?"), next_url)
-            else:
-                # Add page parameter
-                separator = "&" if "?" in base_url else "?"
-                next_url = f"{base_url}{separator}{next_page_button.lstrip('?')}"
+            next_url = self.results_url(response, next_page_button)
             self.logger.info(f"Following next page: {next_url}")
             yield Request(next_url, callback=self.parse)
         else:
             self.logger.info("No more pages found")
 
-    
+    def results_url(self, response, href):
+        # The pagination links may only carry the page parameter, keep the search filters of the page
+        url = urlparse(response.urljoin(href))
+        query = dict(parse_qsl(urlparse(response.url).query))
+        query.update(parse_qsl(url.query))
+        return url._replace(query=urlencode(query)).geturl()
+
     def parse_listing(self, response):
         
         loader = ItemLoader(item=RotsvastItem(), response=response)  # Use ParariusItem instead of DynamicItem
@@ -92,125 +144,10 @@ class RotsvastSpider(scrapy.Spider):
 
         # Extract additional details
         loader.add_css('Rent_Price', 'div#info-price::text', re=r'€\s*([\d.,]+)\s*per month')
-        # Extract Start Date
-        start_date_xpath = '//div[@id="properties"]//div[contains(text(), "Start date")]/following-sibling::div[last()]//text()'
-        start_date = response.xpath(start_date_xpath).get()
-        if start_date:
-            start_date = re.search(r'(\d{2}-\d{2}-\d{4})', start_date).group(1)
-        loader.add_value('Start_Date', start_date)
-
-        # Extract Total Rent
-        total_rent_xpath = '//div[@id="properties"]//div[contains(text(), "Total rent")]/following-sibling::div[last()]//text()'
-        total_rent = response.xpath(total_rent_xpath).get()
-        total_rent = re.search(r'\b(\d+)\b', total_rent).group(1)
-        loader.add_value('Total_Rent', total_rent)
-
-        # Extract Service Costs
-        service_cost_xpath = '//div[@id="properties"]//div[contains(text(), "Service costs")]/following-sibling::div[last()]//text()'
-        service_cost = response.xpath(service_cost_xpath).get()
-
-        if service_cost:
-            match = re.search(r'€\s*(\d+)', service_cost)
-            service_cost = match.group(1) if match else None
-
-        loader.add_value('Service_Costs', service_cost)
-
-        # Extract Utilities
-        utilities_xpath = '//div[@id="properties"]//div[contains(text(), "Utilities")]/following-sibling::div[last()]//text()'
-        utilities = response.xpath(utilities_xpath).get()
-        if utilities:
-            try:
-                utilities = re.search(r'€\s*(\d+)', utilities).group(1)
-            except AttributeError:
-                utilities = None
-        loader.add_value('Utilities', utilities)
-
-        # Extract Deposit
-        deposit_xpath = '//div[@id="properties"]//div[contains(text(), "Deposit")]/following-sibling::div[last()]//text()'
-        deposit = response.xpath(deposit_xpath).get()
-        if deposit:
-            try:
-                deposit = re.search(r'€\s*(\d+)', deposit).group(1)
-            except AttributeError:
-                deposit = None
-        loader.add_value('Deposit', deposit)
-
-        # Extract Service Cost
-        service_cost_xpath = '//div[@id="properties"]//div[contains(text(), "Service costs")]/following-sibling::div[last()]//text()'
-        service_cost = response.xpath(service_cost_xpath).get()
-        if service_cost:
-            try:
-                service_cost = re.search(r'€\s*(\d+)', service_cost).group(1)
-            except AttributeError:
-                service_cost = None
-        loader.add_value('Service_Costs', service_cost)
-
-        # Extract Other Costs
-        other_costs_xpath = '//div[@id="properties"]//div[contains(text(), "Other costs")]/following-sibling::div[last()]//text()'
-        other_costs = response.xpath(other_costs_xpath).get()
-        if other_costs:
-            try:
-                other_costs = re.search(r'€\s*(\d+)', other_costs).group(1)
-            except AttributeError:
-                other_costs = None
-        loader.add_value('Other_Costs', other_costs)
-
-        #Extract Transfer Costs
-        transfer_costs_xpath = '//div[@id="properties"]//div[contains(text(), "Transfer costs")]/following-sibling::div[last()]//text()'
-        transfer_costs = response.xpath(transfer_costs_xpath).get()
-        if transfer_costs:
-            try:
-                transfer_costs = re.search(r'€\s*(\d+)', transfer_costs).group(1)
-            except AttributeError:
-                transfer_costs = None
-        loader.add_value('Transfer_Costs', transfer_costs)
-
-        # Extract Energy Label
-        energy_label_xpath = '//div[@id="properties"]//div[contains(text(), "Energy label")]/following-sibling::div[last()]//span[@class="energyLabel"]//text()'
-        energy_label = response.xpath(energy_label_xpath).get()
-        if energy_label:
-            try:
-                energy_label = re.search(r'\b([A-G])\b', energy_label).group(1)
-            except AttributeError:
-                energy_label = None
-        loader.add_value('Energy_Label', energy_label)
-
-        # Extract Type
-        type_xpath = '//div[@id="properties"]//div[contains(text(), "Type")]/following-sibling::div[last()]//text()'
-        loader.add_xpath('Type', type_xpath)
-
-        # Extract Interior
-        interior_xpath = '//div[@id="properties"]//div[contains(text(), "Interior")]/following-sibling::div[last()]//text()'
-        loader.add_xpath('Interior', interior_xpath)
-
-        # Extract Rooms
-        rooms_xpath = '//div[@id="properties"]//div[contains(text(), "Rooms")]/following-sibling::div[last()]//text()'
-        rooms = response.xpath(rooms_xpath).get()
-        if rooms:
-            rooms = re.search(r'\b(\d+)\b', rooms).group(1)
-            loader.add_xpath('Rooms', rooms)
-
-        # Extract Bedrooms
-        bedrooms_xpath = '//div[@id="properties"]//div[contains(text(), "Bedrooms")]/following-sibling::div[last()]//text()'
-        bedrooms = response.xpath(bedrooms_xpath).get()
-        if bedrooms:
-            bedrooms = re.search(r'\b(\d+)\b', bedrooms).group(1)
-        loader.add_xpath('Bedrooms', bedrooms)
-
-        # Extract Floor Area
-        floor_area_xpath = '//div[@id="properties"]//div[contains(text(), "Floor area")]/following-sibling::div[last()]//text()'
-        floor_area = response.xpath(floor_area_xpath).get()
-        if floor_area:
-            floor_area = re.search(r'\b(\d+)\b', floor_area).group(1)
-        loader.add_value('Floor_Area', floor_area)
-
-        # Extract Smoking
-        smoking_xpath = '//div[@id="properties"]//div[contains(text(), "Smoking")]/following-sibling::div[last()]//text()'
-        loader.add_xpath('Smoking', smoking_xpath, re=r'\b(Yes|No)\b')
-
-        # Extract Pets
-        pets_xpath = '//div[@id="properties"]//div[contains(text(), "Pets")]/following-sibling::div[last()]//text()'
-        loader.add_xpath('Pets', pets_xpath)
+        # Parse the #properties block once and fill the fields from PROPERTY_FIELDS
+        table = properties_table(response.xpath('//div[@id="properties"]'))
+        for field, label, part, convert in PROPERTY_FIELDS:
+            loader.add_value(field, convert(table_text(table, label, part)))
 
         # Load and validate item
         item = loader.load_item()
@@ -226,10 +163,3 @@ class RotsvastSpider(scrapy.Spider):
 
 
 
-def clean_entry(entry):
-    if isinstance(entry, str):
-        return entry.strip("[]'")  # Remove the square brackets and single quotes
-    return entry  # If it's not a string, return it as is
-
-
-
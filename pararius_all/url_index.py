@@ -0,0 +1,130 @@
+import argparse
+import os
+import sqlite3
+
+import pandas as pd
+
+'''
+Shared on-disk index of the listing URLs every spider has already scraped.
+Spiders query it in O(1) per URL, SeenUrlPipeline keeps it up to date as
+items are written, and import_csv() seeds it once from the old *_listings.csv.
+'''
+
+SEEN_URL_INDEX_FILE = 'seen_urls.db'
+
+# Column holding the listing URL in each spider's CSV export
+URL_COLUMNS = {
+    'pararius': 'URL',
+    'rotsvast': 'URL',
+    'friendlyhousing': 'URL',
+    'hunting': 'url',
+}
+
+_connections = {}
+
+
+def clean_entry(entry):
+    if isinstance(entry, str):
+        return entry.strip("[]'")  # Remove the square brackets and single quotes
+    return entry  # If it's not a string, return it as is
+
+
+def get_connection(path=SEEN_URL_INDEX_FILE):
+    """Return the (cached) connection to the index, creating the schema if needed."""
+    conn = _connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path)
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS seen_urls ('
+            ' spider TEXT NOT NULL,'
+            ' url TEXT NOT NULL,'
+            ' PRIMARY KEY (spider, url))'
+        )
+        conn.execute('CREATE TABLE IF NOT EXISTS imported (spider TEXT PRIMARY KEY)')
+        conn.commit()
+        _connections[path] = conn
+    return conn
+
+
+def last_rowid(path=SEEN_URL_INDEX_FILE):
+    """Watermark of the index: URLs recorded later get a higher rowid."""
+    return get_connection(path).execute('SELECT COALESCE(MAX(rowid), 0) FROM seen_urls').fetchone()[0]
+
+
+class SeenUrlIndex:
+    """Set-like view of the URLs already scraped by one spider."""
+
+    def __init__(self, spider, path=SEEN_URL_INDEX_FILE):
+        self.spider = spider
+        self.path = path
+        self.conn = get_connection(path)
+
+    def __contains__(self, url):
+        row = self.conn.execute(
+            'SELECT 1 FROM seen_urls WHERE spider = ? AND url = ?', (self.spider, url)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM seen_urls WHERE spider = ?', (self.spider,)
+        ).fetchone()[0]
+
+    def add(self, url):
+        self.add_many([url])
+
+    def add_many(self, urls):
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO seen_urls (spider, url) VALUES (?, ?)',
+            ((self.spider, url) for url in urls if isinstance(url, str) and url)
+        )
+        self.conn.commit()
+
+    def added_since(self, rowid):
+        """URLs first recorded after the given last_rowid() watermark."""
+        rows = self.conn.execute(
+            'SELECT url FROM seen_urls WHERE spider = ? AND rowid > ?', (self.spider, rowid)
+        ).fetchall()
+        return {url for (url,) in rows}
+
+    def is_imported(self):
+        row = self.conn.execute('SELECT 1 FROM imported WHERE spider = ?', (self.spider,)).fetchone()
+        return row is not None
+
+    def import_csv(self, csv_file, url_column):
+        """One-shot import of the URLs of an existing *_listings.csv."""
+        if os.path.exists(csv_file):
+            for chunk in pd.read_csv(csv_file, chunksize=1000, usecols=[url_column]):
+                urls = chunk[url_column].map(clean_entry).dropna()
+                # Repeated header rows from appended runs are not URLs
+                self.add_many(urls[urls != url_column].tolist())
+        self.conn.execute('INSERT OR IGNORE INTO imported (spider) VALUES (?)', (self.spider,))
+        self.conn.commit()
+
+
+def load_seen_urls(spider, path=SEEN_URL_INDEX_FILE):
+    """Open the index of a spider, importing its CSV history the first time."""
+    index = SeenUrlIndex(spider, path)
+    if not index.is_imported() and spider in URL_COLUMNS:
+        index.import_csv(f'{spider}_listings.csv', URL_COLUMNS[spider])
+    return index
+
+
+def item_url(adapter, spider):
+    """Get the listing URL of an item, whatever the loader made of it."""
+    url = adapter.get(URL_COLUMNS.get(spider, 'URL'))
+    if isinstance(url, (list, tuple)):
+        url = url[0] if url else None
+    return clean_entry(url)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import the existing listing CSVs into the seen-URL index.")
+    parser.add_argument('--index', default=SEEN_URL_INDEX_FILE, help='Path of the SQLite index')
+    parser.add_argument('spiders', nargs='*', default=list(URL_COLUMNS), help='Spiders to import')
+    args = parser.parse_args()
+
+    for spider in args.spiders:
+        index = SeenUrlIndex(spider, args.index)
+        index.import_csv(f'{spider}_listings.csv', URL_COLUMNS[spider])
+        print(f'{spider}: {len(index)} URLs indexed')
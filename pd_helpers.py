@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from pararius_all.matching import MIN_LIVING_AREA, MIN_LIVING_AREA_PARARIUS, is_match
+
 '''
 Pandas cleaning related helpers functions to support pipeline.py
 '''
@@ -162,28 +164,21 @@ agency_data = {
 }
 
 
+def normalize_listing_csv(csv_file):
+    """One-shot rewrite of a CSV written before AppendingCsvItemExporter:
+    drops the header rows repeated by every appending run and strips the
+    "['...']" list formatting from the values."""
+    df = pd.read_csv(csv_file, dtype=str)
+    mask = df.isin(df.columns).any(axis=1)
+    df = df[~mask].map(clean_entry)
+    df.to_csv(csv_file, index=False)
+    return len(df)
+
 def clean_data_par(df):
-    bug_columns = [
-        'Agency_Link', 'Available_From', 'Balcony', 'Construction_Type', 'Construction_Year',
-        'Contract_Type', 'Deposit', 'Description', 'Energy_Rating', 'Facilities', 'Form_link', 'Garage_Present',
-        'Garden', 'House_Type', 'Interior', 'Latitude', 'Living_Area', 'Location', 'Longitude',
-        'Number_of_Bathrooms', 'Number_of_Floors', 'Number_of_Rooms', 'Offered_Since',
-        'Parking_Present', 'Parking_Type', 'Pets_Allowed', 'Rent_Price', 'Service_Costs',
-        'Shed_Storeroom', 'Smoking_Allowed', 'Status', 'Title', 'URL', 'Upkeep'
-    ]
-    mask = df.isin(bug_columns).any(axis=1)
-    df = df[~mask]
-    # Reset index to avoid alignment issues
+    # Amounts, dates and coordinates come typed from the listing store
+    # (see SCHEMAS in pararius_all/parquet_store.py)
     df = df.reset_index(drop=True)
-    df = df.map(clean_entry)
-    df['Available_From'] = pd.to_datetime(df['Available_From'], errors='coerce')
-    df['Construction_Year'] = pd.to_numeric(df['Construction_Year'], errors='coerce')
-    df['Deposit'] = df['Deposit'].replace('NaN', None).str.replace(',', '').astype(float)
     df['Energy_Rating'] = df['Energy_Rating'].astype('category')
-    df['Rent_Price'] = df['Rent_Price'].replace('NaN', None).str.replace(',', '').astype(float)
-    df['Living_Area'] = df['Living_Area'].replace('NaN', None).str.replace(',', '').astype(float)
-    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
-    df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce')
     df['Title'] = df['Title'].str.replace('For rent:', '', regex=False).str.strip()
     df['Agency_Name'] = df['Agency_Link'].str.extract(r'([^/]+)$')
     df['Agency_Email'] = df['Agency_Name'].apply(lambda x: agency_data.get(x, {}).get('email', None))
@@ -220,13 +215,6 @@ def clean_data_light(df):
 
 def clean_data_hunting(df):
 
-    bug_columns = ['available_from', 'bathrooms', 'bedrooms', 'deposit', 'description', 'energy_label', 'gas_water_electricity_included', 'interior', 'location',
-                   'minimal_rent_period', 'minimum_income', 'pets', 'price', 'roof_terrace', 'rooms', 'scraped_at', 'service_costs', 'smoking', 'surface', 'title',
-                   'toilets', 'url']
-    
-    mask = df.isin(bug_columns).any(axis=1)
-    df = df[~mask]
-
     df.rename(columns={'price': 'Rent_Price', 'surface': 'Living_Area', 'title': 'Title', 'url': 'URL', 'rooms': 'Number_of_Rooms'}, inplace=True)
     df['Agency_Name'] = 'househunting-eindhoven'
     df['Agency_Email'] = 'eindhoven@househunting.nl'
@@ -236,13 +224,6 @@ def clean_data_hunting(df):
 
 def clean_data_friend(df):
 
-    bug_columns = ['Available_from', 'Base_rent', 'City', 'Deposit', 'Description', 'Dwelling_type', 'Energy_label', 'Furnished', 'Income_requirement', 'Location', 'Maximum_occupancy',
-                   'Minimum_rental_period', 'Number_of_bedrooms', 'Number_of_rooms', 'Postal_code', 'Price', 'Price_including_GWL', 'Service_costs', 'Surface_area',
-                   'Title', 'Total_rent', 'URL', 'Utilities_included']
-    
-    mask = df.isin(bug_columns).any(axis=1)
-    df = df[~mask]
-    df = df.map(clean_entry)
     df.rename(columns={'Price': 'Rent_Price', 'Surface_area': 'Living_Area', 'Number_of_rooms':'Number_of_Rooms'}, inplace=True)
     df['Agency_Name'] = 'friendly-housing'
     df['Agency_Email'] = 'info@friendlyhousing.nl'
@@ -252,12 +233,6 @@ def clean_data_friend(df):
 
 def clean_data_rot(df):
 
-    bug_columns = ['Agency_Link', 'Bedrooms', 'Deposit', 'Description', 'Energy_Label', 'Floor_Area', 'Interior', 'Latitude', 'Location', 'Longitude', 'Other_Costs', 'Pets',
-                   'Rent_Price', 'Rooms', 'Service_Costs', 'Smoking', 'Start_Date', 'Title', 'Total_Rent', 'Transfer_Costs', 'Type', 'URL', 'Utilities']
-    
-    mask = df.isin(bug_columns).any(axis=1)
-    df = df[~mask]
-    df = df.map(clean_entry)
     df.rename(columns={'Floor_Area': 'Living_Area', 'Rooms': 'Number_of_Rooms'}, inplace=True)
     df['Title'] = df['Title'].str.replace('?', '', regex=False).str.strip()
     df['Agency_Name'] = 'rotsvast-eindhoven'
@@ -268,29 +243,19 @@ def clean_data_rot(df):
 
 def filter_listings(df):
 
-# Function to clean and convert the Rent_Price column
-    df['Rent_Price'] = (
-        df['Rent_Price']
-        .astype(str)  # Convert to string to safely use .str.replace()
-        .str.replace('.', '', regex=False)  # Remove thousand separators (dots)
-        .str.replace(',', '.', regex=False)  # Replace comma with dot for decimal
-        .replace('nan', np.nan)  # Replace string 'nan' with actual NaN
-        .astype(float)  # Convert to float first to handle decimals
-        .astype('Int64')  # Convert to nullable integer type (handles NaN)
-    )
-
-    df['Living_Area'] = df['Living_Area'].fillna(0).astype(int)
-
-    price_mask = df['Rent_Price'] <= 700
-    surface_mask = df['Living_Area'] >= 15
+    # Rent_Price and Living_Area are numbers already (typed listing store), whole euros in the emails
+    df['Rent_Price'] = pd.to_numeric(df['Rent_Price'], errors='coerce').round().astype('Int64')
+    df['Living_Area'] = pd.to_numeric(df['Living_Area'], errors='coerce').fillna(0).astype(int)
 
-    return df[price_mask & surface_mask]
+    return matching_rows(df, MIN_LIVING_AREA)
     
 def filter_listings_par(df):
 
-    price_mask = df['Rent_Price'] <= 700
-    surface_mask = df['Living_Area'] >= 11
+    return matching_rows(df, MIN_LIVING_AREA_PARARIUS)
 
-    return df[price_mask & surface_mask]
+def matching_rows(df, min_living_area):
+    # The criteria NewListingPipeline checks on every item while crawling
+    mask = [is_match(rent, area, min_living_area) for rent, area in zip(df['Rent_Price'], df['Living_Area'])]
+    return df[pd.Series(mask, index=df.index, dtype=bool)]
     
     
\ No newline at end of file
@@ -134,6 +134,35 @@ def run_until_connected():
         print("Retrying in 5 seconds...")
         time.sleep(5)
 
+# Function returning the seconds to wait before the next pipeline cycle
+def cycle_interval():
+    if is_time_between(dt_time(8, 0), dt_time(18, 0)):
+        return 300  # 5 minutes (8 AM - 6 PM)
+    return 900  # 15 minutes (other hours)
+
+# Function to rotate and wait for the VPN before a cycle
+def prepare_vpn():
+    run_dynamic_scripts()
+    run_until_connected()
+
+# Daemon mode: one long-running process instead of a new interpreter per cycle
+def main_daemon(debug_mode):
+    # Imported here because importing email_pipeline installs the reactor
+    from email_pipeline import run_daemon
+
+    print("Starting the email pipeline daemon... \n")
+    run_daemon(debug_mode, next_delay=cycle_interval, before_cycle=prepare_vpn)
+
+# Adaptive mode: each source is polled according to its observed arrival rate
+def main_adaptive(debug_mode, hourly_crawl_budget):
+    # Imported here because importing email_pipeline installs the reactor
+    from email_pipeline import SOURCES, run_adaptive_daemon
+    from scheduler import AdaptiveScheduler
+
+    print("Starting the adaptive email pipeline daemon... \n")
+    scheduler = AdaptiveScheduler(SOURCES, hourly_crawl_budget=hourly_crawl_budget)
+    run_adaptive_daemon(debug_mode, scheduler, before_cycle=prepare_vpn)
+
 # Main function
 def main(debug_mode):
     while True:
@@ -157,7 +186,15 @@ if __name__ == "__main__":
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Run email_pipeline.py with optional debug mode.")
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--daemon', action='store_true', help='Keep the crawler warm in one process instead of spawning email_pipeline.py every cycle')
+    parser.add_argument('--adaptive', action='store_true', help='Daemon mode polling each source according to its observed listing arrival rate')
+    parser.add_argument('--hourly-crawl-budget', type=int, default=30, help='Maximum number of source crawls (not requests) per hour in adaptive mode')
     args = parser.parse_args()
 
     # Start the main loop
-    main(args.debug)
\ No newline at end of file
+    if args.adaptive:
+        main_adaptive(args.debug, args.hourly_crawl_budget)
+    elif args.daemon:
+        main_daemon(args.debug)
+    else:
+        main(args.debug)
\ No newline at end of file
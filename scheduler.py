@@ -0,0 +1,91 @@
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+'''
+Adaptive polling scheduler for the daemon mode of the pipeline.
+Keeps per-source statistics of new-listing arrivals by hour of day, polls the
+busy sources more often than the quiet ones and never exceeds a global budget
+of crawls per rolling hour. Until an hour of day has been observed for a source,
+it is polled at least as often as the fixed cadence of the plain daemon.
+'''
+
+SCHEDULER_STATS_FILE = 'scheduler_stats.json'
+
+
+class AdaptiveScheduler:
+    def __init__(self, sources, min_interval=300, max_interval=3600, baseline_interval=300,
+                 hourly_crawl_budget=30, target_per_poll=0.5, decay=0.98, stats_file=SCHEDULER_STATS_FILE):
+        self.sources = list(sources)
+        self.min_interval = min_interval  # seconds
+        self.max_interval = max_interval  # seconds
+        self.baseline_interval = baseline_interval  # seconds, the fixed cadence used without statistics
+        self.hourly_crawl_budget = hourly_crawl_budget  # crawls (not requests) of any source per rolling hour
+        self.target_per_poll = target_per_poll  # new listings we accept to find per poll
+        self.decay = decay  # weight kept by older observations at each update
+        self.stats_file = stats_file
+        self.stats = self.load_stats()
+        self.last_poll = {}
+        self.next_due = {source: 0.0 for source in self.sources}
+        self.recent_polls = deque()
+
+    def load_stats(self):
+        """Per source and hour of day: decayed [new listings, observed hours]."""
+        stats = {}
+        if os.path.exists(self.stats_file):
+            with open(self.stats_file, 'r') as f:
+                stats = json.load(f)
+        for source in self.sources:
+            stats.setdefault(source, {})
+            for hour in range(24):
+                stats[source].setdefault(str(hour), [0.0, 0.0])
+        return stats
+
+    def save_stats(self):
+        with open(self.stats_file, 'w') as f:
+            json.dump(self.stats, f)
+
+    def prior_rate(self):
+        """Arrival rate for which the baseline interval meets the target per poll."""
+        return 3600 * self.target_per_poll / self.baseline_interval
+
+    def arrival_rate(self, source, hour=None):
+        """Expected new listings per hour, starting from the prior worth one observed hour."""
+        hour = datetime.now().hour if hour is None else hour
+        arrivals, hours = self.stats[source][str(hour)]
+        return (arrivals + self.prior_rate()) / (hours + 1.0)
+
+    def interval(self, source, hour=None):
+        hour = datetime.now().hour if hour is None else hour
+        seconds = 3600 * self.target_per_poll / self.arrival_rate(source, hour)
+        # Cold hour: never poll less often than the plain daemon would
+        if self.stats[source][str(hour)][1] < 1.0:
+            seconds = min(seconds, self.baseline_interval)
+        return max(self.min_interval, min(self.max_interval, seconds))
+
+    def due_sources(self, now=None):
+        """Sources to crawl now, busiest first, limited by the remaining hourly budget."""
+        now = time.time() if now is None else now
+        while self.recent_polls and now - self.recent_polls[0] > 3600:
+            self.recent_polls.popleft()
+        budget = self.hourly_crawl_budget - len(self.recent_polls)
+        due = [source for source in self.sources if self.next_due[source] <= now]
+        due.sort(key=self.arrival_rate, reverse=True)
+        return due[:max(budget, 0)]
+
+    def record(self, new_listings, now=None):
+        """Update the statistics after a crawl with the new listings found per source."""
+        now = time.time() if now is None else now
+        hour = str(datetime.fromtimestamp(now).hour)
+        for source, count in new_listings.items():
+            # The first crawl of a process is counted over the baseline interval
+            since = self.last_poll.get(source, now - self.baseline_interval)
+            observed = (now - since) / 3600
+            arrivals, hours = self.stats[source][hour]
+            self.stats[source][hour] = [arrivals * self.decay + count, hours * self.decay + observed]
+            self.last_poll[source] = now
+            self.next_due[source] = now + self.interval(source, int(hour))
+            self.recent_polls.append(now)
+        self.save_stats()
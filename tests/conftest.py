@@ -0,0 +1,3 @@
+# email_pipeline installs the asyncio reactor when imported; import it before
+# any test module makes Twisted install its default reactor
+import email_pipeline  # noqa: F401
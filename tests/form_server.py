@@ -0,0 +1,129 @@
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from scrapy.crawler import CrawlerProcess
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pararius_all.form_submit import FORM_PREFIX, MOTIVATION_FIELD
+from pararius_all.spiders.par_login import EXPECTED_PROFILE, ParLoginSpider
+
+'''
+Stand-in for the Pararius contact forms, used by tests/test_form_submit.py.
+Run as a script in an empty directory, it serves the forms below on a local
+port, crawls them with the HTTP submitter of par_login and prints the POSTs the
+server received and the crawl stats as JSON.
+
+    /form/ok           correct profile, the POST is confirmed
+    /form/wrong        a prefilled profile field differs, must not be posted
+    /form/unconfirmed  the POST is answered without confirmation
+    /form/flaky        the POST is answered with a 503
+    /form/logged-out   no session cookie: the login page, the browser takes over
+'''
+
+SESSION_COOKIE = 'pararius_session=stand-in'
+CONFIRMATION = '<p>Your request has been sent to the agent.</p>'
+
+
+def csrf_token(path):
+    return 'csrf-' + path.rsplit('/', 1)[-1]
+
+
+def form_page(path):
+    profile = dict(EXPECTED_PROFILE)
+    if path == '/form/wrong':
+        profile['phone_number'] = '0612345678'
+    fields = ''.join(f'<input type="text" name="{FORM_PREFIX}[{name}]" value="{value}">'
+                     for name, value in profile.items() if name != 'salutation')
+    return f'''<html><body>
+<form method="post" action="{path}" name="{FORM_PREFIX}">
+<select name="{FORM_PREFIX}[salutation]"><option value="">-</option><option value="x" selected>{profile['salutation']}</option></select>
+{fields}
+<textarea name="{MOTIVATION_FIELD}"></textarea>
+<input type="hidden" name="{FORM_PREFIX}[_token]" value="{csrf_token(path)}">
+<button type="submit" class="form__button--submit form__button--submit-normal">Send</button>
+</form></body></html>'''
+
+
+LOGIN_PAGE = '<html><body><form method="post" action="/login"><input name="email"><input name="password"></form></body></html>'
+
+
+class FormHandler(BaseHTTPRequestHandler):
+    posts = {}
+
+    def do_GET(self):
+        if SESSION_COOKIE not in self.headers.get('Cookie', '') or self.path == '/form/logged-out':
+            self.reply(200, LOGIN_PAGE)
+        else:
+            self.reply(200, form_page(self.path))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        self.posts.setdefault(self.path, []).append(parse_qs(body))
+        if self.path == '/form/flaky':
+            self.reply(503, 'Service unavailable')
+        elif self.path == '/form/unconfirmed':
+            self.reply(200, form_page(self.path))
+        else:
+            self.reply(200, CONFIRMATION)
+
+    def reply(self, status, html):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(html.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInSpider(ParLoginSpider):
+    """The HTTP submitter of par_login, without the browser login in front of it."""
+    name = 'par_login_stand_in'
+    allowed_domains = ['127.0.0.1']
+    custom_settings = {
+        **ParLoginSpider.custom_settings,
+        'DOWNLOADER_MIDDLEWARES': {"pararius_all.middlewares.TokenBucketMiddleware": 700},
+        'FORM_SUBMIT_RATE': 6000,
+    }
+
+    def start_requests(self):
+        self.priorities = {row['Form_link']: len(self.rows) - rank for rank, row in enumerate(self.rows)}
+        for row in self.rows:
+            yield self.form_http_request(row, [{'name': 'pararius_session', 'value': 'stand-in'}])
+
+    def fall_back_to_browser(self, row):
+        # Recorded instead of started, there is no browser here
+        self.crawler.stats.inc_value('par_login/browser_fallbacks')
+        self.crawler.stats.set_value(f'stand_in/fallback{row["Form_link"].split("/form", 1)[1]}', True)
+        return []
+
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FormHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    rows = [{'Title': name, 'Form_link': f'{base}/form/{name}'}
+            for name in ('ok', 'wrong', 'unconfirmed', 'flaky', 'logged-out')]
+
+    Path('Your_Motivation_Template.txt').write_text('Beginning of your motivation text; I am interested in {Title}.')
+    process = CrawlerProcess({'LOG_LEVEL': 'ERROR', 'TELNETCONSOLE_ENABLED': False})
+    crawler = process.create_crawler(StandInSpider)
+    process.crawl(crawler, rows=rows)
+    process.start()
+    server.shutdown()
+
+    print(json.dumps({
+        'posts': FormHandler.posts,
+        'processed': crawler.spider.processed_rows,
+        'stats': {key: value for key, value in crawler.stats.get_stats().items()
+                  if key.startswith(('par_login/', 'stand_in/', 'retry/'))},
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import pytest
+from twisted.internet import defer
+
+from pararius_all import browser_pool
+from pararius_all.browser_pool import BrowserPool, PooledBrowser
+
+'''
+Pool slot accounting with fake drivers that fail the way a dead chromedriver
+does (socket and urllib3 errors rather than WebDriverException).
+'''
+
+
+class FakeDriver:
+    service = None
+
+    def __init__(self, error=None):
+        self.error = error
+        self.quitted = False
+
+    def execute_script(self, script):
+        if self.error:
+            raise self.error
+        return 1
+
+    def get(self, url):
+        if self.error:
+            raise self.error
+
+    def execute_cdp_cmd(self, *args):
+        pass
+
+    def quit(self):
+        self.quitted = True
+        if self.error:
+            raise OSError('chromedriver is gone')
+
+
+class FakePool(BrowserPool):
+    def __init__(self, start_error=None, **kwargs):
+        super().__init__(**kwargs)
+        self.start_error = start_error
+
+    def _new_browser(self):
+        if self.start_error:
+            raise self.start_error
+        return PooledBrowser(FakeDriver())
+
+
+@pytest.fixture(autouse=True)
+def synchronous_threads(monkeypatch):
+    # Run the "browser thread" calls inline, the Deferreds fire right away
+    monkeypatch.setattr(browser_pool, 'run_in_browser_thread', defer.maybeDeferred)
+
+
+def result(d):
+    results = []
+    d.addBoth(results.append)
+    assert results, 'Deferred did not fire'
+    return results[0]
+
+
+def close(pool):
+    for browser in pool.idle:
+        browser.expiry.cancel()
+
+
+def test_dead_browser_on_release_frees_its_slot():
+    pool = FakePool(size=1)
+    browser = result(pool.acquire())
+    browser.driver.error = ConnectionRefusedError()
+    assert result(pool.release(browser)) is None
+    assert pool.leased == 0 and pool.counters['recycled'] == 1
+    # The only slot is usable again
+    assert isinstance(result(pool.acquire()), PooledBrowser)
+
+
+def test_failing_reset_hands_a_new_browser_to_the_waiter():
+    pool = FakePool(size=1)
+    browser = result(pool.acquire())
+    waiter = pool.acquire()
+    assert not waiter.called
+    browser.driver.error = TimeoutError()
+    pool.release(browser)
+    replacement = result(waiter)
+    assert replacement is not browser and pool.leased == 1
+
+
+def test_unhealthy_idle_browser_is_replaced():
+    pool = FakePool(size=1)
+    browser = result(pool.acquire())
+    pool.release(browser)
+    browser.driver.error = OSError('connection reset')
+    replacement = result(pool.acquire())
+    assert replacement is not browser and browser.driver.quitted
+    assert pool.leased == 1 and pool.counters['unhealthy'] == 1
+
+
+def test_start_failure_does_not_leave_waiters_hanging():
+    pool = FakePool(size=1)
+    browser = result(pool.acquire())
+    waiter = pool.acquire()
+    pool.start_error = RuntimeError('no chrome')
+    browser.uses = pool.max_uses  # recycled, so a new browser is started for the waiter
+    pool.release(browser)
+    assert result(waiter).check(RuntimeError)
+    assert pool.leased == 0 and not pool.waiting
+
+
+def test_reset_of_a_healthy_browser_keeps_it_warm():
+    pool = FakePool(size=1)
+    browser = result(pool.acquire())
+    pool.release(browser)
+    assert pool.idle == [browser] and pool.leased == 0
+    close(pool)
@@ -0,0 +1,55 @@
+import csv
+import logging
+
+import scrapy
+
+from pararius_all.exporters import AppendingCsvItemExporter
+
+'''
+The appending CSV exporter keeps the columns of the existing header and logs
+the fields it cannot write.
+'''
+
+
+class ListingItem(scrapy.Item):
+    # Like FriendlyHousingItem: any specification of the page becomes a field
+    URL = scrapy.Field()
+    Price = scrapy.Field()
+
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            self.fields[key] = scrapy.Field()
+        super().__setitem__(key, value)
+
+
+def export(path, items):
+    with open(path, 'ab') as f:
+        exporter = AppendingCsvItemExporter(f)
+        exporter.start_exporting()
+        for item in items:
+            exporter.export_item(item)
+        exporter.finish_exporting()
+
+
+def rows(path):
+    with open(path, newline='', encoding='utf8') as f:
+        return list(csv.reader(f))
+
+
+def test_header_written_once_and_reused(tmp_path):
+    path = tmp_path / 'friendlyhousing_listings.csv'
+    export(path, [ListingItem(URL='https://a', Price='700')])
+    export(path, [ListingItem(URL='https://b', Price='650')])
+    assert rows(path) == [['Price', 'URL'], ['700', 'https://a'], ['650', 'https://b']]
+
+
+def test_later_fields_are_logged_once(tmp_path, caplog):
+    path = tmp_path / 'friendlyhousing_listings.csv'
+    export(path, [ListingItem(URL='https://a', Price='700')])
+    later = ListingItem(URL='https://b', Price='650')
+    later['Balcony'] = 'Yes'
+    with caplog.at_level(logging.WARNING, logger='pararius_all.exporters'):
+        export(path, [later, later])
+    assert rows(path)[-1] == ['650', 'https://b']
+    warnings = [r.getMessage() for r in caplog.records if 'Balcony' in r.getMessage()]
+    assert len(warnings) == 1 and str(path) in warnings[0]
@@ -0,0 +1,95 @@
+import random
+import re
+
+import pytest
+
+from pararius_all.extractors import FRIENDLYHOUSING_DESCRIPTION, HUNTING_DESCRIPTION
+
+'''
+The precompiled description extractors must give the same results as the
+per-rule re.search() the spiders used before, in particular when the anchor
+of one rule starts inside the anchor of another.
+'''
+
+# The previous HousehuntingSpider.parse_description rules
+HUNTING_RULES = {
+    'gas_water_electricity_included': (
+        r'(gas/water/electricity|g/w/e|utilities|GWE)\s*(?:are|is)?\s*(not\s+included|excluding|excluded)?',
+        lambda m: not m.group(2)),
+    'service_costs': (
+        r'(?:service\s*costs?|monthly\s+prepayment\s+service\s+cost)[\s:]*€\s*([\d,.]+)',
+        lambda m: int(float(m.group(1).replace(',', '')))),
+    'minimum_income': (
+        r'(?:income|salary).*?(?:requires?|requirement).*?(\d+)\s*(?:times|months?)',
+        lambda m: int(m.group(1))),
+    'minimal_rent_period': (r'rental period minimal (\d+) months?', lambda m: int(m.group(1))),
+    'pets': (r'no pets allowed', lambda m: False),
+    'smoking': (r'no smoking allowed', lambda m: False),
+}
+
+# The previous FriendlyhousingSpider description rules
+FRIENDLYHOUSING_RULES = {
+    'minimum_rental_period': (
+        r'(?:minimum|min)(?: rental)? period(?: is)?\s*(\d+)\s*(?:calendar\s*)?months?', lambda m: int(m.group(1))),
+    'utilities_included': (r'(?:utilities|gas|water|electricity).*(?:included|includes|including)', lambda m: True),
+    'furnished': (r'\b(furnished|unfurnished)\b', lambda m: 'unfurnished' not in m.group(1).lower()),
+    'base_rent': (r'base rent(?: is)?\s*[€\$]\s*([\d,.]+)', lambda m: m.group(1)),
+    'service_costs': (r'service costs?(?: is)?\s*[€\$]\s*([\d,.]+)', lambda m: m.group(1)),
+    'total_rent': (r'total(?: monthly)? rent(?: is)?\s*[€\$]\s*([\d,.]+)', lambda m: m.group(1)),
+    'energy_label': (r'energy label(?: is)?\s*([A-G][+-]?)', lambda m: m.group(1).upper()),
+    'income_requirement': (r'income (?:of|needs to be) at least\s*(\d+)x?\s*the rent', lambda m: int(m.group(1))),
+    'maximum_occupancy': (r'occupancy (?:of)?\s*by maximum\s*(\d+)\s*people', lambda m: int(m.group(1))),
+}
+
+
+def per_rule_search(rules, text):
+    results = {}
+    for key, (pattern, convert) in rules.items():
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            results[key] = convert(match)
+    return results
+
+
+OVERLAPPING = [
+    'Monthly prepayment service costs € 50,00. GWE not included.',
+    'Monthly prepayment service cost € 75 and service costs € 20',
+    'Service costs: € 120. Utilities are excluded. Income requirement 3 times the rent.',
+    'Salary requirement: 4 times, income requires 3 months. Rental period minimal 12 months.',
+    'Minimum period 6 months, min rental period is 12 months. Unfurnished, furnished on request.',
+    'Total monthly rent € 1.250,00, base rent € 1.100, service costs € 150. Energy label is a+.',
+    'Gas, water and electricity included. Income of at least 3x the rent. Occupancy of by maximum 2 people.',
+    'No pets allowed, no smoking allowed. G/W/E is not included.',
+]
+
+KEYWORDS = [
+    'monthly prepayment service cost', 'service costs', 'service cost', 'utilities', 'gwe', 'g/w/e',
+    'gas/water/electricity', 'are', 'is', 'not included', 'excluded', 'income', 'salary', 'requires',
+    'requirement', 'times', 'months', 'rental period minimal', 'no pets allowed', 'no smoking allowed',
+    'minimum', 'min', 'rental', 'period', 'unfurnished', 'furnished', 'base rent', 'total monthly rent',
+    'total rent', 'energy label', 'income of at least', 'the rent', 'occupancy', 'by maximum', 'people',
+    'gas', 'water', 'included', '€', '$', ':', '12', '3x', '1.250,00', 'a+', 'B', '\n', 'Lorem ipsum',
+]
+
+
+def random_texts(count, seed=14):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ' '.join(rng.choice(KEYWORDS) for _ in range(rng.randint(1, 30)))
+
+
+@pytest.mark.parametrize('text', OVERLAPPING)
+def test_overlapping_anchors(text):
+    assert HUNTING_DESCRIPTION.extract(text) == per_rule_search(HUNTING_RULES, text)
+    assert FRIENDLYHOUSING_DESCRIPTION.extract(text) == per_rule_search(FRIENDLYHOUSING_RULES, text)
+
+
+def test_service_costs_inside_prepayment_anchor():
+    text = 'Monthly prepayment service costs € 50,00. GWE not included.'
+    assert HUNTING_DESCRIPTION.extract(text) == {'gas_water_electricity_included': False, 'service_costs': 5000}
+
+
+def test_random_keyword_texts():
+    for text in random_texts(5000):
+        assert HUNTING_DESCRIPTION.extract(text) == per_rule_search(HUNTING_RULES, text), text
+        assert FRIENDLYHOUSING_DESCRIPTION.extract(text) == per_rule_search(FRIENDLYHOUSING_RULES, text), text
@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from pararius_all.form_submit import FORM_PREFIX, MOTIVATION_FIELD
+
+'''
+HTTP submission of the contact forms against the stand-in server of
+tests/form_server.py. The crawl runs in its own process (the reactor cannot
+be restarted).
+'''
+
+
+@pytest.fixture(scope='module')
+def crawl(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('form_server')
+    result = subprocess.run([sys.executable, str(Path(__file__).parent / 'form_server.py')],
+                            cwd=workdir, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_confirmed_post_keeps_the_csrf_token(crawl):
+    [post] = crawl['posts']['/form/ok']
+    assert post[f'{FORM_PREFIX}[_token]'] == ['csrf-ok']
+    assert post[MOTIVATION_FIELD] == ['Beginning of your motivation text; I am interested in ok.']
+    assert post[f'{FORM_PREFIX}[phone_number]'] == ['9999999']
+    assert crawl['processed'] == ['ok']
+    assert crawl['stats']['par_login/http_submissions'] == 1
+
+
+def test_wrong_profile_is_not_posted(crawl):
+    assert '/form/wrong' not in crawl['posts']
+
+
+def test_unconfirmed_post_is_not_retried_nor_sent_to_the_browser(crawl):
+    assert len(crawl['posts']['/form/unconfirmed']) == 1
+    assert len(crawl['posts']['/form/flaky']) == 1
+    assert crawl['stats']['par_login/http_unconfirmed'] == 2
+    assert not any(key.startswith('retry/') for key in crawl['stats'])
+
+
+def test_only_the_page_without_form_goes_to_the_browser(crawl):
+    assert crawl['stats']['par_login/browser_fallbacks'] == 1
+    assert crawl['stats']['stand_in/fallback/logged-out']
@@ -0,0 +1,81 @@
+from pathlib import Path
+
+from scrapy.http import HtmlResponse, Request, TextResponse
+
+from pararius_all.spiders.hunting import (HousehuntingSpider, fragment_selector, listing_detail_urls,
+                                          load_more_endpoint, next_page_formdata)
+
+'''
+Plain HTTP discovery of the hunting spider against a saved results page and
+the load-more response of its second page (tests/fixtures/hunting). To refresh
+them, save the start URL and the admin-ajax POST the 'Show more' button sends,
+as seen in the network tab of the browser.
+'''
+
+FIXTURES = Path(__file__).parent / 'fixtures' / 'hunting'
+START_URL = 'https://househunting.nl/en/housing-offer/?type=for-rent&filter_location=Eindhoven'
+AJAX_URL = 'https://househunting.nl/wp-admin/admin-ajax.php'
+
+
+def results_page():
+    return HtmlResponse(START_URL, body=(FIXTURES / 'results_page.html').read_bytes(), encoding='utf-8')
+
+
+def load_more_page():
+    return TextResponse(AJAX_URL, body=(FIXTURES / 'load_more_page2.json').read_bytes(), encoding='utf-8',
+                        request=Request(AJAX_URL, method='POST'))
+
+
+def test_results_page_endpoint():
+    endpoint = load_more_endpoint(results_page(), START_URL)
+    assert endpoint == {
+        'url': AJAX_URL,
+        'formdata': {'action': 'load_more_locations', 'page': '1', 'type': 'for-rent',
+                     'filter_location': 'Eindhoven', 'km': '10'},
+    }
+    assert next_page_formdata(endpoint['formdata'], 2)['page'] == '2'
+
+
+def test_results_page_listing_urls():
+    hrefs = results_page().css('li.location a::attr(href)').getall()
+    assert listing_detail_urls(hrefs) == [
+        'https://househunting.nl/woningaanbod/h10482-eindhoven-kruisstraat/',
+        'https://househunting.nl/woningaanbod/h10479-eindhoven-stratumseind/',
+        'https://househunting.nl/woningaanbod/h10471-veldhoven-burgemeester-van-hoofflaan/',
+    ]
+
+
+def test_load_more_fragment():
+    selector = fragment_selector(load_more_page())
+    hrefs = selector.css('li.location a::attr(href)').getall()
+    assert listing_detail_urls(hrefs) == [
+        'https://househunting.nl/woningaanbod/h10466-eindhoven-woenselse-markt/',
+        'https://househunting.nl/woningaanbod/h10482-eindhoven-kruisstraat/',
+    ]
+    # No button in the fragment, the next page is asked to the same handler
+    assert load_more_endpoint(selector, AJAX_URL) is None
+
+
+def test_unknown_ajax_handler_is_not_guessed():
+    page = results_page()
+    body = page.text.replace('ajax_url', 'rest_root')
+    assert load_more_endpoint(page.replace(body=body.encode('utf-8')), START_URL) is None
+
+
+def test_spider_follows_the_load_more_backend():
+    spider = HousehuntingSpider()
+    spider.existing_urls = {'https://househunting.nl/woningaanbod/h10479-eindhoven-stratumseind/'}
+    spider.discovered = set()
+
+    requests = list(spider.parse_http(results_page()))
+    assert [r.url for r in requests[:-1]] == [
+        'https://househunting.nl/woningaanbod/h10482-eindhoven-kruisstraat/',
+        'https://househunting.nl/woningaanbod/h10471-veldhoven-burgemeester-van-hoofflaan/',
+    ]
+    load_more = requests[-1]
+    assert load_more.method == 'POST' and load_more.url == AJAX_URL
+    assert b'action=load_more_locations' in load_more.body and b'page=2' in load_more.body
+
+    requests = list(spider.parse_load_more(load_more_page(), **load_more.cb_kwargs))
+    assert requests[0].url == 'https://househunting.nl/woningaanbod/h10466-eindhoven-woenselse-markt/'
+    assert b'page=3' in requests[-1].body and len(requests) == 2
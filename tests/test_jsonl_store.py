@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from pararius_all import url_index
+from pararius_all.jsonl_store import JsonLinesStore
+from pararius_all.url_index import SeenUrlIndex, last_rowid
+
+'''
+JSON Lines archive of the extate/lightcity feeds: only new or changed records
+are appended, and only new URLs reach the seen-URL index as new.
+'''
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(url_index, '_connections', {})
+    return tmp_path
+
+
+def lines(path):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_json_history_is_imported_once(workdir):
+    history = [{'url': 'https://e/1', 'rentalsPrice': 700}, {'url': 'https://e/2', 'rentalsPrice': 800}]
+    (workdir / 'extate_listings.json').write_text(json.dumps(history, indent=4))
+    store = JsonLinesStore('extate')
+    assert lines('extate_listings.jsonl') == history
+    assert len(store.seen_urls) == 2
+
+    # The archive exists now, the JSON file is not read again
+    JsonLinesStore('extate')
+    assert lines('extate_listings.jsonl') == history
+    assert store.append(history) == []
+
+
+def test_changed_record_is_appended_but_not_new():
+    store = JsonLinesStore('extate')
+    store.append([{'url': 'https://e/1', 'rentalsPrice': 700}])
+    watermark = last_rowid()
+
+    changed = {'url': 'https://e/1', 'rentalsPrice': 650}
+    new = {'url': 'https://e/2', 'rentalsPrice': 800}
+    assert store.append([changed, new, new]) == [changed, new]
+    assert lines('extate_listings.jsonl')[1:] == [changed, new]
+    # The index only reports the URL it had never seen
+    assert SeenUrlIndex('extate').added_since(watermark) == {'https://e/2'}
+
+
+def test_stores_are_per_source():
+    entry = {'url': 'https://x/1', 'rentalsPrice': 700}
+    assert JsonLinesStore('extate').append([entry]) == [entry]
+    assert JsonLinesStore('lightcity').append([entry]) == [entry]
+    assert 'https://x/1' in SeenUrlIndex('lightcity')
+    assert len(SeenUrlIndex('extate')) == 1
+
+
+def test_records_without_url_are_keyed_by_id_or_content():
+    store = JsonLinesStore('lightcity')
+    by_id = {'id': 7, 'rentalsPrice': 700}
+    anonymous = {'rentalsPrice': 900}
+    assert store.append([by_id, anonymous]) == [by_id, anonymous]
+    assert store.append([by_id, anonymous]) == []
+    assert len(store.seen_urls) == 0
@@ -0,0 +1,90 @@
+from datetime import date
+
+import pytest
+
+from pararius_all.parquet_store import (ParquetListingStore, dataset_parts, import_history, read_listings,
+                                        read_new_parts, to_included)
+from pararius_all.pipelines import ParquetStorePipeline
+
+'''
+Typed Parquet listing store: what a crawl writes is read back, converted,
+by the email pipeline.
+'''
+
+
+class Spider:
+    name = 'pararius'
+
+
+def pararius_row(url, rent, **extra):
+    # As FormatCSVPipeline leaves the items: strings, NaN for missing values
+    row = {'URL': url, 'Title': 'For rent: Flat', 'Rent_Price': rent, 'Living_Area': '45',
+           'Offered_Since': '12-10-2026', 'Number_of_Rooms': '2', 'Deposit': float('nan'),
+           'Service_Costs': 'Includes, service costs, Excludes, gas, water and electricity'}
+    row.update(extra)
+    return row
+
+
+def crawl(root, rows):
+    pipeline = ParquetStorePipeline(str(root), batch_size=2)
+    pipeline.open_spider(Spider())
+    for row in rows:
+        pipeline.process_item(row, Spider())
+    pipeline.close_spider(Spider())
+
+
+def test_new_parts_are_read_typed(tmp_path):
+    crawl(tmp_path, [pararius_row('https://p/1', '1,495')])
+    before = dataset_parts('pararius', str(tmp_path))
+    crawl(tmp_path, [pararius_row('https://p/2', '650'), pararius_row('https://p/3', '1.100,00')])
+
+    df = read_new_parts('pararius', before, {'https://p/1', 'https://p/2'},
+                        columns=['URL', 'Rent_Price', 'Offered_Since', 'Service_Costs', 'Deposit'],
+                        root=str(tmp_path))
+    # p/1 is in an older part, p/3 was not newly seen
+    assert df.drop(columns='Deposit').to_dict('records') == [
+        {'URL': 'https://p/2', 'Rent_Price': 650.0, 'Offered_Since': date(2026, 10, 12), 'Service_Costs': True}]
+    assert df['Deposit'].isna().all()
+    assert len(read_listings('pararius', ['URL'], root=str(tmp_path))) == 3
+
+
+def test_last_version_of_a_listing_is_kept(tmp_path):
+    crawl(tmp_path, [pararius_row('https://p/1', '700'), pararius_row('https://p/1', '680')])
+    df = read_new_parts('pararius', set(), {'https://p/1'}, columns=['Rent_Price'], root=str(tmp_path))
+    assert df['Rent_Price'].tolist() == [680.0]
+
+
+def test_nothing_new(tmp_path):
+    assert read_new_parts('pararius', set(), {'https://p/1'}, columns=['URL'], root=str(tmp_path)).empty
+    crawl(tmp_path, [pararius_row('https://p/1', '700')])
+    assert read_new_parts('pararius', set(), set(), root=str(tmp_path)).empty
+
+
+def test_unfinished_parts_are_not_read(tmp_path):
+    store = ParquetListingStore('pararius', str(tmp_path), batch_size=1)
+    store.add(pararius_row('https://p/1', '700'))  # flushed to a '_part-...' file, not closed
+    assert dataset_parts('pararius', str(tmp_path)) == set()
+    store.close()
+    assert len(dataset_parts('pararius', str(tmp_path))) == 1
+
+
+@pytest.mark.parametrize('text, included', [
+    ('Includes, service costs, Excludes, gas, water and electricity', True),
+    ('Includes: gas, water and electricity, Excludes: service costs', False),
+    ('Excludes, service costs', False),
+    ('Includes, gas', None),
+    (float('nan'), None),
+])
+def test_service_costs_inclusion(text, included):
+    assert to_included(text) is included
+
+
+def test_history_is_imported_into_an_empty_dataset_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'pararius_listings.csv').write_text('URL,Rent_Price\nhttps://p/1,"1,495"\n')
+    assert import_history('pararius') == 1
+    parts = dataset_parts('pararius')
+    assert import_history('pararius') == 0
+    (tmp_path / 'pararius_listings.csv').unlink()
+    assert import_history('pararius') == 0
+    assert dataset_parts('pararius') == parts
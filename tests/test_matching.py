@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from pararius_all import pipelines, url_index
+from pararius_all.matching import is_match, record_matches
+from pararius_all.pipelines import NewListingPipeline
+from pd_helpers import filter_listings, filter_listings_par
+
+'''
+Filter criteria, checked per item while crawling and per row on the frames
+read back from the listing store.
+'''
+
+
+@pytest.mark.parametrize('rent, area, matches', [
+    (700, 15, True),
+    (700.0, 40.0, True),
+    (701, 40, False),
+    (650, 14, False),
+    (None, 40, False),
+    (650, float('nan'), False),
+    (pd.NA, 40, False),
+])
+def test_is_match(rent, area, matches):
+    assert is_match(rent, area) is matches
+
+
+def test_pararius_accepts_smaller_listings():
+    assert record_matches('pararius', {'Rent_Price': 650.0, 'Living_Area': 12})
+    assert not record_matches('rotsvast', {'Rent_Price': 650.0, 'Floor_Area': 12})
+    assert record_matches('hunting', {'price': 650, 'surface': 20})
+
+
+def test_frame_filters_apply_the_same_criteria():
+    df = pd.DataFrame({'URL': ['a', 'b', 'c', 'd'], 'Rent_Price': [650.0, 650.0, 750.0, None],
+                       'Living_Area': [12.0, 20.0, 30.0, 30.0]})
+    assert filter_listings_par(df.copy())['URL'].tolist() == ['a', 'b']
+    assert filter_listings(df.copy())['URL'].tolist() == ['b']
+    assert filter_listings(df.iloc[:0].copy()).empty
+
+
+def test_pipeline_queues_unseen_matching_items(tmp_path, monkeypatch):
+    monkeypatch.setattr(url_index, '_connections', {})
+    queue = []
+    monkeypatch.setattr(pipelines.new_listings, 'put', queue.append)
+    index_path = str(tmp_path / 'seen_urls.db')
+    url_index.SeenUrlIndex('rotsvast', index_path).add('https://r/seen')
+
+    spider = SimpleNamespace(name='rotsvast')
+    pipeline = NewListingPipeline(index_path)
+    pipeline.open_spider(spider)
+    # As FormatCSVPipeline leaves the items
+    for url, rent in [('https://r/seen', '€ 500,00'), ('https://r/cheap', '€ 650,00'), ('https://r/dear', '€ 1.100,00')]:
+        item = {'URL': url, 'Title': 'Kruisstraat 12?', 'Rent_Price': rent, 'Floor_Area': '40'}
+        assert pipeline.process_item(item, spider) is item
+
+    [(name, url, record)] = queue
+    assert (name, url) == ('rotsvast', 'https://r/cheap')
+    assert record['Rent_Price'] == 650.0 and record['Floor_Area'] == 40.0
+
+
+def test_pipeline_ignores_spiders_without_criteria(tmp_path):
+    pipeline = NewListingPipeline(str(tmp_path / 'seen_urls.db'))
+    pipeline.open_spider(SimpleNamespace(name='par_login'))
+    item = {'URL': 'https://p/1'}
+    assert pipeline.process_item(item, SimpleNamespace(name='par_login')) is item
@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+
+import pytest
+from twisted.internet.defer import succeed
+
+import email_pipeline
+from email_pipeline import notify_new_listing, read_new_listings, run_cycle, take_watermarks
+from pararius_all import url_index
+from pararius_all.parquet_store import ParquetListingStore
+from pararius_all.pipelines import ParquetStorePipeline, SeenUrlPipeline
+
+'''
+New listings of a crawl: the rows it wrote to the listing store whose URL the
+seen-URL index recorded for the first time after the watermarks.
+'''
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(url_index, '_connections', {})
+    monkeypatch.setattr(email_pipeline, 'notified_urls', {})
+    return tmp_path
+
+
+def listing(url, rent='€ 650,00', area='40'):
+    # As FormatCSVPipeline leaves the items
+    return {'URL': url, 'Title': 'Kruisstraat 12?', 'Rent_Price': rent, 'Floor_Area': area, 'Rooms': '2'}
+
+
+def crawl(items, name='rotsvast'):
+    spider = SimpleNamespace(name=name)
+    pipelines = [ParquetStorePipeline('listings', 100), SeenUrlPipeline('seen_urls.db')]
+    for pipeline in pipelines:
+        pipeline.open_spider(spider)
+    for item in items:
+        for pipeline in pipelines:
+            pipeline.process_item(item, spider)
+    pipelines[0].close_spider(spider)
+
+
+def urls(df):
+    return sorted(df['URL'])
+
+
+def test_first_crawl_of_a_source():
+    watermarks = take_watermarks()
+    crawl([listing('https://r/1'), listing('https://r/2', rent='€ 1.100,00')])
+    df = read_new_listings('rotsvast', watermarks)
+    assert urls(df) == ['https://r/1', 'https://r/2']
+    assert df.set_index('URL')['Rent_Price'].to_dict() == {'https://r/1': 650.0, 'https://r/2': 1100.0}
+    assert set(df.columns) >= {'Title', 'Living_Area', 'Number_of_Rooms', 'Agency_Email'}
+
+
+def test_listings_seen_in_earlier_crawls_are_not_new():
+    crawl([listing('https://r/1')])
+    watermarks = take_watermarks()
+    # https://r/1 is scraped again, e.g. with a new price
+    crawl([listing('https://r/1', rent='€ 600,00'), listing('https://r/2')])
+    assert urls(read_new_listings('rotsvast', watermarks)) == ['https://r/2']
+
+
+def test_legacy_csv_history_is_not_new(workdir):
+    (workdir / 'rotsvast_listings.csv').write_text('URL,Title\nhttps://r/1,Old\nURL,Title\n')
+    watermarks = take_watermarks()
+    crawl([listing('https://r/1'), listing('https://r/2')])
+    assert urls(read_new_listings('rotsvast', watermarks)) == ['https://r/2']
+
+
+def test_crawl_without_listings():
+    crawl([listing('https://r/1')])
+    watermarks = take_watermarks()
+    crawl([])
+    assert read_new_listings('rotsvast', watermarks).empty
+
+
+def test_unfinished_part_is_not_read():
+    watermarks = take_watermarks()
+    # A crawl that died before closing its part
+    store = ParquetListingStore('rotsvast', 'listings', batch_size=1)
+    store.add(listing('https://r/1'))
+    url_index.SeenUrlIndex('rotsvast').add('https://r/1')
+    assert read_new_listings('rotsvast', watermarks).empty
+
+
+class Runner:
+    """CrawlerRunner whose crawls are done at once, after writing the given listings."""
+
+    def __init__(self, items):
+        self.items = items
+        self.crawls = []
+
+    def crawl(self, name, **kwargs):
+        self.crawls.append(name)
+        if name in self.items:
+            crawl(self.items[name], name)
+        return succeed(None)
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr(email_pipeline, 'send_emails', lambda listings, **kwargs: sent.extend(listings['URL']))
+    monkeypatch.setattr(email_pipeline.threads, 'deferToThread', lambda *args, **kwargs: succeed(None))
+    return sent
+
+
+def test_listings_emailed_during_the_crawl_are_not_sent_again(sent):
+    notify_new_listing(('rotsvast', 'https://r/1', listing('https://r/1')))
+    counts = []
+    run_cycle(Runner({'rotsvast': [listing('https://r/1'), listing('https://r/2')]}), sources=['rotsvast']).addCallback(counts.append)
+    assert counts == [{'rotsvast': 2}]
+    assert sent == ['https://r/2']
+    assert email_pipeline.notified_urls == {}
+
+
+def test_notified_urls_are_forgotten_when_nothing_is_read_back(sent):
+    # Emailed during the crawl, but not in the store, e.g. the crawl failed to write it
+    notify_new_listing(('rotsvast', 'https://r/1', listing('https://r/1')))
+    notify_new_listing(('hunting', 'https://h/1', {'url': 'https://h/1'}))
+    run_cycle(Runner({}), sources=['rotsvast'])
+    assert email_pipeline.notified_urls == {'hunting': {'https://h/1'}}
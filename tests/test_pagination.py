@@ -0,0 +1,102 @@
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from pararius_all.pagination import EarlyStopPolicy, PageFanOut, last_page_link, page_link
+from pararius_all.spiders.pararius import ParariusSpider
+from pararius_all.spiders.rotsvast import RotsvastSpider
+
+'''
+Result page fan-out: pages requested ahead within a window, fed to the
+early-stop policy in page order, and their URLs built from the pagination
+links of the first page.
+'''
+
+
+def test_pages_are_requested_ahead_within_the_window():
+    fanout = PageFanOut(EarlyStopPolicy(), last_page=6, window=2)
+    assert fanout.page_parsed(1, 3) == [2, 3]
+    assert fanout.page_parsed(2, 3) == [4]
+    assert fanout.page_parsed(4, 3) == []  # parsed ahead of page 3
+    assert fanout.page_parsed(3, 3) == [5, 6]
+    assert fanout.page_parsed(5, 3) == fanout.page_parsed(6, 3) == []
+    assert not fanout.stopped
+
+
+def test_pages_parsed_out_of_order_stop_in_page_order():
+    policy = EarlyStopPolicy(patience=2)
+    fanout = PageFanOut(policy, last_page=10, window=3)
+    assert fanout.page_parsed(1, 5) == [2, 3, 4]
+    # Pages 3 and 4 only have known listings, but page 2 is not parsed yet
+    assert fanout.page_parsed(4, 0) == []
+    assert fanout.page_parsed(3, 0) == []
+    assert not fanout.stopped
+    # Page 2 has new listings, the streak is pages 3 and 4
+    assert fanout.page_parsed(2, 1) == []
+    assert fanout.stopped
+    assert policy.pages == 4
+    assert policy.stop_reason() == 'Stopping early: 2 consecutive pages without new listings'
+
+
+def test_max_pages_caps_the_fanout():
+    policy = EarlyStopPolicy(max_pages=3)
+    fanout = PageFanOut(policy, last_page=20, window=4)
+    assert fanout.last_page == 3
+    assert fanout.page_parsed(1, 1) == [2, 3]
+    assert fanout.page_parsed(2, 1) == []
+    assert fanout.page_parsed(3, 1) == []
+    assert fanout.stopped
+    assert policy.stop_reason() == 'Reached maximum page limit: 3'
+
+
+def test_page_links():
+    links = ['https://p/eindhoven/page-2', 'https://p/eindhoven/page-12', 'https://p/eindhoven/page-3']
+    assert last_page_link(links, r'/page-(\d+)') == (12, 'https://p/eindhoven/page-12')
+    assert last_page_link(['https://p/eindhoven'], r'/page-(\d+)') == (None, None)
+    assert page_link('https://r/?type=2&page=7&city=Eindhoven', r'[?&]page=(\d+)', 4) == 'https://r/?type=2&page=4&city=Eindhoven'
+
+
+def spider_for(spidercls):
+    spider = spidercls.from_crawler(get_crawler(spidercls))
+    spider.load_existing_urls = set
+    [request] = spider.start_requests()
+    return spider, request
+
+
+def results_page(url, links):
+    body = ''.join(links).encode()
+    return HtmlResponse(url, body=b'<html><body>' + body + b'</body></html>', request=Request(url))
+
+
+def test_pararius_page_urls_come_from_the_pagination_links():
+    spider, request = spider_for(ParariusSpider)
+    page = results_page(request.url, [
+        '<a class="pagination__link" href="/apartments/eindhoven/600-1500/page-2">2</a>',
+        '<a class="pagination__link" href="/apartments/eindhoven/600-1500/page-3">3</a>',
+    ])
+    requests = list(spider.parse(page))
+    assert [r.url for r in requests] == ['https://www.pararius.com/apartments/eindhoven/600-1500/page-2',
+                                         'https://www.pararius.com/apartments/eindhoven/600-1500/page-3']
+    assert [r.cb_kwargs for r in requests] == [{'page': 2}, {'page': 3}]
+
+
+def test_rotsvast_page_urls_keep_the_filters_and_one_page_parameter():
+    spider, request = spider_for(RotsvastSpider)
+    url = request.url + '&page=1'
+    page = results_page(url, ['<div class="multipage"><a href="?page=2">2</a><a href="?page=3">3</a></div>'])
+    requests = list(spider.parse(page))
+    assert [r.url for r in requests] == [
+        'https://www.rotsvast.nl/en/property-listings/?type=2&city=Eindhoven&distance=10&office=0&page=2',
+        'https://www.rotsvast.nl/en/property-listings/?type=2&city=Eindhoven&distance=10&office=0&page=3',
+    ]
+
+
+def test_next_link_is_followed_without_page_numbers():
+    spider, request = spider_for(ParariusSpider)
+    page = results_page(request.url, [
+        '<ul><li class="pagination__item--next">'
+        '<a class="pagination__link--next" href="/apartments/eindhoven/600-1500?cursor=abc">Next</a></li></ul>',
+    ])
+    [next_request] = spider.parse(page)
+    assert spider.fanout is None
+    assert next_request.url == 'https://www.pararius.com/apartments/eindhoven/600-1500?cursor=abc'
+    assert next_request.cb_kwargs == {}
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from scrapy.http import HtmlResponse, Request
+
+from benchmark_parsers import differences, pararius_selectors, pararius_single_pass
+from pararius_all.spiders.pararius import ParariusSpider
+
+'''
+The single-pass dt/dd extraction of the Pararius spider must read the same
+values as the dt:contains() selectors it replaced: labels with extra words,
+and the two "Present" rows read by both Parking_Present and Garage_Present.
+'''
+
+URL = 'https://www.pararius.com/apartment-for-rent/eindhoven/1234/kruisstraat'
+
+
+def listing_page():
+    body = (Path(__file__).parent / 'fixtures' / 'pararius' / 'listing_features.html').read_bytes()
+    return HtmlResponse(URL, body=body, encoding='utf-8', request=Request(URL))
+
+
+def test_same_values_as_the_selectors():
+    page = listing_page()
+    assert differences(pararius_selectors, pararius_single_pass, [page]) == []
+
+
+def test_listing_item():
+    [item] = ParariusSpider().parse_listing(listing_page())
+    assert item['Rent_Price'] == ['1,495']
+    assert item['Deposit'] == ['2,990']
+    assert item['Available_From'] == ['01-11-2026']
+    assert item['Service_Costs'] == ['Includes', 'service costs', 'Excludes', 'gas, water and electricity']
+    assert item['Energy_Rating'] == ['C']
+    assert item['Parking_Present'] == item['Garage_Present'] == ['Yes', 'No']
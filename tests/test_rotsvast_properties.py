@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from scrapy.http import HtmlResponse, Request
+
+from benchmark_parsers import differences, rotsvast_single_pass, rotsvast_xpaths
+from pararius_all.spiders.rotsvast import RotsvastSpider
+
+'''
+The single-pass #properties extraction of the Rotsvast spider must read the
+same values as one XPath query per field: the energy label from its span
+only, whole euro amounts and missing labels left out.
+'''
+
+URL = 'https://www.rotsvast.nl/en/property/eindhoven-kruisstraat-12/'
+
+
+def listing_page():
+    body = (Path(__file__).parent / 'fixtures' / 'rotsvast' / 'listing_properties.html').read_bytes()
+    return HtmlResponse(URL, body=body, encoding='utf-8', request=Request(URL))
+
+
+def test_same_values_as_the_xpaths():
+    page = listing_page()
+    assert differences(rotsvast_xpaths, rotsvast_single_pass, [page]) == []
+
+
+def test_listing_item():
+    [item] = RotsvastSpider().parse_listing(listing_page())
+    assert item['Rent_Price'] == ['1.050,00']
+    assert item['Start_Date'] == ['01-11-2026']
+    # Amounts keep their thousands and decimal parts, the store parses both
+    assert item['Total_Rent'] == ['1.100,00']
+    assert item['Service_Costs'] == ['50,00']
+    assert item['Deposit'] == ['2.100']
+    assert 'Utilities' not in item
+    assert 'Other_Costs' not in item and 'Transfer_Costs' not in item
+    # Not the letters of the scale next to the label
+    assert item['Energy_Label'] == ['B']
+    assert item['Type'] == ['Apartment']
+    assert item['Interior'] == ['Upholstered']
+    assert item['Rooms'] == ['3']
+    assert item['Bedrooms'] == ['2']
+    assert item['Floor_Area'] == ['85']
+    assert item['Smoking'] == ['No']
+    assert item['Pets'] == ['In consultation']
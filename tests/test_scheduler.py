@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from scheduler import AdaptiveScheduler
+
+'''
+Cold start and arrival accounting of the adaptive scheduler.
+'''
+
+NOON = datetime(2026, 10, 19, 12, 5).timestamp()
+
+
+def make_scheduler(tmp_path, **kwargs):
+    return AdaptiveScheduler(['pararius', 'rotsvast'], stats_file=str(tmp_path / 'stats.json'), **kwargs)
+
+
+def test_cold_sources_are_polled_at_the_baseline_interval(tmp_path):
+    scheduler = make_scheduler(tmp_path, baseline_interval=300)
+    assert scheduler.interval('pararius', 12) == 300
+    scheduler = make_scheduler(tmp_path, baseline_interval=900)
+    assert scheduler.interval('pararius', 12) == 900
+
+
+def test_first_poll_is_counted(tmp_path):
+    scheduler = make_scheduler(tmp_path, baseline_interval=300)
+    scheduler.record({'pararius': 2, 'rotsvast': 0}, now=NOON)
+    assert scheduler.stats['pararius']['12'] == [2.0, 300 / 3600]
+    assert scheduler.arrival_rate('pararius', 12) > scheduler.arrival_rate('rotsvast', 12)
+
+
+def test_quiet_source_backs_off_once_observed(tmp_path):
+    scheduler = make_scheduler(tmp_path, baseline_interval=300)
+    scheduler.stats['pararius']['12'] = [0.0, 5.0]  # five quiet hours observed
+    assert scheduler.interval('pararius', 12) > 300
+
+
+def test_crawl_budget_limits_due_sources(tmp_path):
+    scheduler = make_scheduler(tmp_path, hourly_crawl_budget=1)
+    assert len(scheduler.due_sources(now=NOON)) == 1
+    scheduler.record({'pararius': 0}, now=NOON)
+    assert scheduler.due_sources(now=NOON + 1) == []
@@ -0,0 +1,84 @@
+import smtplib
+
+import pytest
+
+from email_sender import DataTrackingSMTP, SMTPSession
+
+'''
+SMTPSession resends a message on a new connection only when the server
+dropped the connection before the message was handed over.
+'''
+
+
+class FakeServer(DataTrackingSMTP):
+    """Answers every command, and drops the connection at `drop_at`: a command
+    name, or 'message' while the message itself is sent."""
+
+    def __init__(self, log, drop_at=None):
+        super().__init__()
+        self.log = log
+        self.drop_at = drop_at
+        self.last = None
+
+    def putcmd(self, cmd, args=''):
+        if cmd == self.drop_at:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.last = cmd
+        self.log.append(cmd)
+
+    def getreply(self):
+        return (354, b'Go ahead') if self.last == 'data' else (250, b'OK')
+
+    def send(self, s):
+        if self.drop_at == 'message':
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.last = None
+        self.log.append('message')
+
+
+class FakeSession(SMTPSession):
+    def __init__(self, drops, check_after=30):
+        super().__init__(config={}, check_after=check_after)
+        self.drops = list(drops)  # drop_at of every connection in turn
+        self.log = []
+
+    def connect(self):
+        self.log.append('connect')
+        self.server = FakeServer(self.log, self.drops.pop(0) if self.drops else None)
+
+
+def send(session):
+    session.sendmail(from_addr='me@example.com', to_addrs=['agency@example.com'], msg='Hello')
+
+
+def test_messages_share_the_connection():
+    session = FakeSession([])
+    send(session)
+    send(session)
+    assert session.log.count('connect') == 1
+    assert session.log.count('message') == 2
+
+
+def test_connection_dropped_before_the_message_is_sent_again():
+    session = FakeSession(['mail'])
+    send(session)
+    assert session.log == ['connect', 'ehlo', 'quit', 'connect', 'ehlo', 'mail', 'rcpt', 'data', 'message']
+
+
+def test_connection_dropped_during_the_message_is_not_sent_again():
+    session = FakeSession(['message'])
+    with pytest.raises(smtplib.SMTPServerDisconnected, match='not sent again'):
+        send(session)
+    assert session.log.count('connect') == 1
+    assert session.server is None
+    # The next message goes over a new connection
+    send(session)
+    assert session.log.count('connect') == 2 and session.log.count('message') == 1
+
+
+def test_idle_connection_is_checked_before_sending():
+    session = FakeSession(['noop'], check_after=0)
+    send(session)
+    send(session)
+    assert session.log.count('connect') == 2
+    assert session.log.count('message') == 2
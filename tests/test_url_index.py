@@ -0,0 +1,56 @@
+import pytest
+
+from pararius_all import url_index
+from pararius_all.url_index import SeenUrlIndex, item_url, last_rowid, load_seen_urls
+
+'''
+Seen-URL index: one SQLite table of the URLs every spider already scraped,
+seeded once from the old CSV exports.
+'''
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(url_index, '_connections', {})
+    return tmp_path
+
+
+def test_csv_history_is_imported_once(workdir):
+    # Header rows repeated by appending runs and the old "['...']" formatting
+    (workdir / 'rotsvast_listings.csv').write_text("URL,Title\n['https://r/1'],A\nURL,Title\nhttps://r/2,B\n")
+    index = load_seen_urls('rotsvast')
+    assert len(index) == 2
+    assert 'https://r/1' in index and 'https://r/2' in index and 'URL' not in index
+
+    (workdir / 'rotsvast_listings.csv').write_text('URL,Title\nhttps://r/3,C\n')
+    assert len(load_seen_urls('rotsvast')) == 2
+
+
+def test_missing_csv_is_imported_as_empty():
+    assert len(load_seen_urls('hunting')) == 0
+    assert SeenUrlIndex('hunting').is_imported()
+
+
+def test_views_are_per_spider():
+    SeenUrlIndex('pararius').add_many(['https://x/1', 'https://x/2'])
+    SeenUrlIndex('rotsvast').add('https://x/1')
+    assert len(SeenUrlIndex('pararius')) == 2
+    assert len(SeenUrlIndex('rotsvast')) == 1
+    assert 'https://x/2' not in SeenUrlIndex('rotsvast')
+
+
+def test_added_since_reports_first_sightings_only():
+    pararius, rotsvast = SeenUrlIndex('pararius'), SeenUrlIndex('rotsvast')
+    pararius.add('https://x/1')
+    watermark = last_rowid()
+    pararius.add_many(['https://x/1', 'https://x/2', None, ''])
+    rotsvast.add('https://x/3')
+    assert pararius.added_since(watermark) == {'https://x/2'}
+    assert rotsvast.added_since(watermark) == {'https://x/3'}
+
+
+def test_item_url():
+    assert item_url({'URL': ["['https://p/1']"]}, 'pararius') == 'https://p/1'
+    assert item_url({'url': 'https://h/1'}, 'hunting') == 'https://h/1'
+    assert item_url({'URL': []}, 'rotsvast') is None